@@ -4,17 +4,86 @@ import numpy as np
 import uuid
 import json
 from typing import Optional
-from xatkitnlu.core.prediction import predict
+from xatkitnlu.core.jobs import TrainingJobScheduler, TrainingJob
+from xatkitnlu.core.model_store import ModelStore
+from xatkitnlu.core.ner.ner import base_entity_ner_stats
+from xatkitnlu.core.prediction import predict, predict_batch, prediction_cache, inference_scheduler
+from xatkitnlu.core.residency import ResidencyManager
+from xatkitnlu.core.server_configuration import ServerConfiguration, server_configuration_from_env
+from xatkitnlu.core.text_preprocessing import preprocessing_cache, stem_cache
 from xatkitnlu.core.training import train
+from xatkitnlu.core.warmup import WarmUp
 from xatkitnlu.dsl.dsl import Bot, NLUContext, PredictResult, CustomEntity
 from xatkitnlu.dto.dto import BotDTO, BotRequestDTO, ConfigurationDTO, configurationdto_to_configuration, \
-    PredictRequestDTO, PredictResultDTO, ClassificationDTO, MatchedParameterDTO
+    PredictRequestDTO, PredictResultDTO, PredictBatchRequestDTO, PredictBatchResultDTO, \
+    predict_result_to_predict_resultdto
 from xatkitnlu.dto.dto import botdto_to_bot
 
 bots: dict[str, Bot] = {}
 
+server_configuration: ServerConfiguration = server_configuration_from_env()
+
+model_store: Optional[ModelStore] = None
+if server_configuration.model_store_path is not None:
+    model_store = ModelStore(server_configuration.model_store_path)
+
+residency: ResidencyManager = ResidencyManager(server_configuration.memory_budget_mb * 1024 * 1024,
+                                               server_configuration.eviction_path)
+
+prediction_cache.configure(server_configuration.prediction_cache_size, server_configuration.prediction_cache_ttl,
+                           server_configuration.prediction_cache_datetime_ttl)
+inference_scheduler.configure(server_configuration.inference_batch_max_size,
+                              server_configuration.inference_batch_max_wait_ms)
+preprocessing_cache.configure(server_configuration.preprocessing_cache_size)
+stem_cache.configure(server_configuration.stem_cache_size)
+
+
+def run_training_job(job: TrainingJob):
+    if job.bot_name not in bots:
+        raise ValueError("Bot does not exist")
+    bot: Bot = bots[job.bot_name]
+    # Evicted contexts are reloaded, so their models can be reused if they have not changed. The job configuration only
+    # becomes the configuration of the bot once training succeeds, predictions keep using the previous one until then
+    try:
+        with residency.use(list(bot.trained_contexts.values())):
+            trained_contexts: dict[str, list[str]] = train(bot, job.configuration)
+            # Before the contexts can be evicted again. A bot replaced while it was being trained (see bot_add) is
+            # neither stored nor tracked again, the bot lock prevents it from being replaced in the meantime
+            with bot.lock:
+                if model_store is not None and bots.get(job.bot_name) is bot:
+                    model_store.save_bot(bot)
+    finally:
+        # Also when training fails, as it may have changed some of the contexts
+        with bot.lock:
+            if bots.get(job.bot_name) is bot:
+                residency.track(bot)
+    if bots.get(job.bot_name) is not bot:
+        raise ValueError("Bot was replaced while it was being trained")
+    return {"status:": "successful training for " + str(len(bot.contexts)) + " contexts", **trained_contexts}
+
+
+training_jobs: TrainingJobScheduler = TrainingJobScheduler(run_training_job)
+
+warmup: WarmUp = WarmUp()
+
 app = FastAPI()
 
+
+@app.on_event("startup")
+def warm_up_languages():
+    # In the background, so the server can answer health checks in the meantime (see /ready/)
+    warmup.start(server_configuration.warmup_languages)
+
+
+@app.on_event("startup")
+def load_stored_bots():
+    # Bots trained before the last restart are restored from disk instead of having to be sent and trained again
+    if model_store is not None:
+        bots.update(model_store.load_bots(server_configuration.model_store_load_workers))
+        for bot in bots.values():
+            residency.track(bot)
+
+
 # print(tf.__version__)
 
 
@@ -23,6 +92,14 @@ async def root():
     return {"Server running, using tensorflow version:": tf.__version__}
 
 
+@app.get("/ready/")
+def ready():
+    # The server should not take traffic until the configured languages are warmed up
+    if not warmup.is_ready():
+        raise HTTPException(status_code=503, detail=warmup.stats())
+    return warmup.stats()
+
+
 @app.get("/count/")
 async def get_bots():
     return {"Count:": len(bots)}
@@ -34,10 +111,16 @@ def bot_add(creation_request: BotRequestDTO):
         if not creation_request.force_overwrite:
             raise HTTPException(status_code=422, detail="Bot name already in use")
         else:
-            # We delete the previous bot with the same name and replace it with this new one
+            # We delete the previous bot with the same name and replace it with this new one. Its queued training job
+            # is cancelled, and the result of a running one is discarded (see run_training_job)
             bot_to_delete = bots[creation_request.name]
-            bots.pop(creation_request.name)
+            with bot_to_delete.lock:
+                bots.pop(creation_request.name)
+                if model_store is not None:
+                    model_store.delete_bot(creation_request.name)
+                residency.forget(creation_request.name)
             del bot_to_delete
+            training_jobs.cancel(creation_request.name)
     uuid_value: uuid = uuid.uuid4()
     bots[creation_request.name] = Bot(uuid_value, creation_request.name)
     return {"uuid": str(uuid_value)}
@@ -49,20 +132,45 @@ def bot_initialize(name: str, botdto: BotDTO):
         raise HTTPException(status_code=422, detail="Bot does not exist")
     bot: Bot = bots[name]
 
-    botdto_to_bot(botdto, bot)
+    # The previous trained contexts stay tracked (and reloadable if evicted) until the next training replaces them, so
+    # it can reuse the models of the contexts that have not changed. A training job running in the meantime keeps
+    # training the previous contexts, and they become the ones to be reused by the next training
+    with bot.lock:
+        botdto_to_bot(botdto, bot)
     return {"status:": "successful initialization with " + str(len(bot.contexts)) + " contexts"}
 
 
-@app.post("/bot/{name}/train/")
+@app.post("/bot/{name}/train/", status_code=202)
 def bot_train(name: str, configurationdto: ConfigurationDTO):
     if name not in bots:
         raise HTTPException(status_code=422, detail="Bot does not exist")
     bot: Bot = bots[name]
     if len(bot.contexts) == 0:
         raise HTTPException(status_code=422, detail="Bot is empty, nothing to train")
-    bot.configuration = configurationdto_to_configuration(configurationdto)
-    train(bot)
-    return {"status:": "successful training for " + str(len(bot.contexts)) + " contexts"}
+    # Training runs in the background, the returned job id can be used to follow its progress in /jobs/{job_id}/
+    job: TrainingJob = training_jobs.submit(name, configurationdto_to_configuration(configurationdto))
+    return {"job_id": job.job_id, "status": job.status}
+
+
+@app.get("/jobs/{job_id}/")
+def job_status(job_id: str):
+    job: TrainingJob = training_jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=422, detail="Job does not exist")
+    return job.to_dict()
+
+
+def get_context(bot: Bot, context_name: str) -> NLUContext:
+    context: Optional[NLUContext] = bot.get_context(context_name)
+    if context is None:
+        raise HTTPException(status_code=422, detail="Context not found in bot")
+    return context
+
+
+def check_context_is_trained(context: NLUContext):
+    # Must be called once the context is in use, as evicted contexts do not have a model until they are reloaded
+    if not context.is_trained():
+        raise HTTPException(status_code=422, detail="Cannot predict on a context that has not been trained")
 
 
 @app.post("/bot/{name}/predict/", response_model=PredictResultDTO)
@@ -72,32 +180,42 @@ def bot_predict(name: str, prediction_request: PredictRequestDTO):
     if len(prediction_request.utterance) == 0:
         raise HTTPException(status_code=422, detail="Utterance cannot be an empty string")
     bot: Bot = bots[name]
-    context: Optional[NLUContext] = None
-    i = 0
-    while i < len(bot.contexts):
-        if bot.contexts[i].name == prediction_request.context:
-            context = bot.contexts[i]
-            break
-        i += 1
-    if context is None:
-        raise HTTPException(status_code=422, detail="Context not found in bot")
-    if context.nlp_model is None:
-        raise HTTPException(status_code=422, detail="Cannot predict on a context that has not been trained")
+    context: NLUContext = get_context(bot, prediction_request.context)
 
-    prediction: PredictResult = predict(context, prediction_request.utterance, bot.configuration)
+    with residency.use([context]):
+        check_context_is_trained(context)
+        prediction: PredictResult = predict(context, prediction_request.utterance, bot.configuration)
+    return predict_result_to_predict_resultdto(prediction)
 
-    # order of prediction values (classifications) matches order of intents.
 
-    prediction_dto: PredictResultDTO = PredictResultDTO()
+@app.post("/bot/{name}/predict/batch/", response_model=PredictBatchResultDTO)
+def bot_predict_batch(name: str, batch_request: PredictBatchRequestDTO):
+    if name not in bots:
+        raise HTTPException(status_code=422, detail="Bot does not exist")
+    bot: Bot = bots[name]
+    requests: list[tuple[NLUContext, str]] = []
+    for prediction_request in batch_request.requests:
+        if len(prediction_request.utterance) == 0:
+            raise HTTPException(status_code=422, detail="Utterance cannot be an empty string")
+        requests.append((get_context(bot, prediction_request.context), prediction_request.utterance))
+
+    contexts: list[NLUContext] = list({context: None for context, _ in requests}.keys())
+    with residency.use(contexts):
+        for context in contexts:
+            check_context_is_trained(context)
+        predictions: list[PredictResult] = predict_batch(requests, bot.configuration)
+    return PredictBatchResultDTO(results=[predict_result_to_predict_resultdto(prediction) for prediction in predictions])
 
-    for classification in prediction.classifications:
-        classification_dto: ClassificationDTO = ClassificationDTO(intent=classification.intent.name,
-                                                                  score=classification.score,
-                                                                  matched_utterance=classification.matched_utterance,
-                                                                  matched_parameters=[MatchedParameterDTO(name=mp.name, value=mp.value, info=mp.info) for mp in classification.matched_parameters])
-        prediction_dto.classifications.append(classification_dto)
 
-    return prediction_dto
+@app.get("/metrics/")
+def metrics():
+    return {'residency': residency.stats(),
+            'prediction_cache': prediction_cache.stats(),
+            'inference_batching': inference_scheduler.stats(),
+            'preprocessing_cache': preprocessing_cache.stats(),
+            'stem_cache': stem_cache.stats(),
+            'base_entity_ner': base_entity_ner_stats.stats(),
+            'warmup': warmup.stats()}
 
 
 @app.get("/hello/{name}/")
@@ -136,5 +254,10 @@ def bot_status(name: str):
         for intent_ref in context.intent_refs:
             intent_refs.append(intent_ref.intent.name)
         contexts[context.name] = {'intent_refs': intent_refs}
+        if context.training_epochs is not None:
+            contexts[context.name]['training'] = {'epochs': context.training_epochs, 'time': context.training_time,
+                                                  'samples_per_second': context.training_samples_per_second}
+        if context.quantization_report is not None:
+            contexts[context.name]['quantization'] = context.quantization_report
     result['contexts'] = contexts
     return result
@@ -6,7 +6,10 @@ import uuid
 
 from tests.utils.intents_and_entities import intent_birthday_en, intent_greetings_en, entity_date
 from tests.utils.ner_utils import check_ner_result
-from xatkitnlu.core.ner.base.datetime import ner_datetime
+from xatkitnlu.core.ner.base.base_entities import BaseEntityType
+from xatkitnlu.core.ner.base.datetime import ner_datetime, given_datetime_components, datetime_aux_applies, \
+    search_datetimes, search_settings, relative_time_parser
+from xatkitnlu.core.ner.ner import base_entity_ner
 from xatkitnlu.core.prediction import predict
 from xatkitnlu.core.training import train
 from xatkitnlu.core.nlp_configuration import NlpConfiguration
@@ -151,3 +154,35 @@ def test_prediction_with_ner():
         'second': False
     }
     assert (prediction.get_classification(intent_birthday_en).matched_parameters[0].info == expected_datetime_info)
+
+
+def test_ner_datetime_reuses_parses():
+    configuration = NlpConfiguration(timezone='Europe/Madrid')
+    configuration.country = 'en'
+    given_datetime_components.cache_clear()
+    first_result = ner_datetime('My birthday is in May 4th', configuration)
+    second_result = ner_datetime('My birthday is in May 4th', configuration)
+    assert first_result == second_result
+    assert first_result[2] == {'year': False, 'month': True, 'day': True, 'hour': False, 'minute': False,
+                               'second': False, 'frag': 'in May 4th'}
+    # The components given in the sentence are only worked out once
+    assert given_datetime_components.cache_info().hits == 1
+
+    assert datetime_aux_applies('in 2 years and three months', configuration)
+    assert not datetime_aux_applies('in 2 years', configuration)
+    assert base_entity_ner('I want two pizzas', BaseEntityType.DATETIME, configuration) == (None, None, None)
+
+
+def test_search_settings_share_static_settings():
+    base_1 = datetime(year=2001, month=1, day=1, hour=1, minute=1, second=1)
+    base_2 = datetime(year=2002, month=2, day=2, hour=2, minute=2, second=2)
+    settings_1 = search_settings('en', base_1, tuple(relative_time_parser))
+    settings_2 = search_settings('en', base_2, tuple(relative_time_parser))
+    assert settings_1.RELATIVE_BASE == base_1
+    assert settings_2.RELATIVE_BASE == base_2
+    # A new relative base (e.g. every second for the current time) does not build new settings for dateparser
+    assert settings_1.registry_key == settings_2.registry_key
+    assert search_settings('es', base_1, tuple(relative_time_parser)).DATE_ORDER == 'DMY'
+
+    assert search_datetimes('see you tomorrow', base_1, 'en', relative_time_parser)[0][1].day == 2
+    assert search_datetimes('see you tomorrow', base_2, 'en', relative_time_parser)[0][1].day == 3
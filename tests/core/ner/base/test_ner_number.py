@@ -3,10 +3,11 @@ import uuid
 from tests.utils.intents_and_entities import intent_temperature_en, intent_greetings_en, entity_number
 from tests.utils.ner_utils import check_ner_result
 from xatkitnlu.core.ner.base.number import ner_number
+from xatkitnlu.core.ner.ner import ner_matching, base_entity_ner_stats
 from xatkitnlu.core.prediction import predict
 from xatkitnlu.core.training import train
 from xatkitnlu.core.nlp_configuration import NlpConfiguration
-from xatkitnlu.dsl.dsl import Bot, NLUContext, PredictResult, IntentReference
+from xatkitnlu.dsl.dsl import Bot, NLUContext, PredictResult, IntentReference, Intent, IntentParameter
 
 
 def test_ner_number():
@@ -103,3 +104,21 @@ def test_prediction_with_ner():
     assert (prediction.get_classification(intent_temperature_en).matched_parameters[0].name == 'temperature')
     assert (prediction.get_classification(intent_temperature_en).matched_parameters[0].value == '-3.5')
     assert (prediction.get_classification(intent_temperature_en).matched_parameters[0].info == {})
+
+
+def test_base_entity_ner_shared_by_intents():
+    intent_price: Intent = Intent('intent_price', ['it costs NUMBER euros'])
+    intent_price.add_parameter(IntentParameter('price', 'NUMBER', entity_number))
+    context: NLUContext = NLUContext('context')
+    context.add_intent_ref(IntentReference(intent_temperature_en.name, intent_temperature_en))
+    context.add_intent_ref(IntentReference(intent_price.name, intent_price))
+    context.add_intent_ref(IntentReference(intent_greetings_en.name, intent_greetings_en))
+    configuration: NlpConfiguration = NlpConfiguration(country='en')
+    configuration.stemmer = False
+
+    saved_parses: int = base_entity_ner_stats.stats()['saved_parses']
+    result = ner_matching(context, 'it is 25 outside', configuration)
+    assert result[intent_temperature_en][0] == result[intent_price][0] == 'it is @SYS.NUMBER outside'
+    assert result[intent_temperature_en][1][0].value == result[intent_price][1][0].value == '25'
+    # The number is only parsed for the first intent
+    assert base_entity_ner_stats.stats()['saved_parses'] == saved_parses + 1
@@ -0,0 +1,71 @@
+import tests.utils.intents_and_entities as intents_and_entities
+from xatkitnlu.core.ner.base.base_entities import BaseEntityType
+from xatkitnlu.core.ner.base.datetime import ner_datetime
+from xatkitnlu.core.ner.base.number import ner_number
+from xatkitnlu.core.ner.base.prefilters import number_candidate, datetime_candidate
+from xatkitnlu.core.ner.ner import base_entity_ner, base_entity_ner_stats
+from xatkitnlu.core.nlp_configuration import NlpConfiguration
+from xatkitnlu.dsl.dsl import Intent
+
+
+def ner_corpus() -> dict[str, list[str]]:
+    # The training sentences of the test intents, the sentences of the NER tests and a few more utterances
+    corpus: dict[str, list[str]] = {'en': [], 'ca': [], 'es': []}
+    for intent in vars(intents_and_entities).values():
+        if isinstance(intent, Intent):
+            language: str = intent.name[-2:] if intent.name.endswith(('_ca', '_es')) else 'en'
+            corpus[language] += intent.training_sentences
+    corpus['en'] += ['My birthday is in May 4th', 'My birthday is tomorrow', 'I am going to move in 2 years and three months',
+                     'the temperature is three point five and it is cold', 'the temperature is minus three point five',
+                     'see you at noon', 'see you at five pm', 'I am free at ten am', 'see you on mon', 'in an hour',
+                     'two days ago', 'the fourth one', 'hello', 'I want a pizza', 'I am hungry', 'from now on']
+    corpus['ca'] += ['El meu aniversari és el 4 de maig', 'El meu aniversari és demà', "Em mudaré d'aquí a 2 anys i tres mesos",
+                     'la temperatura és de tres coma cinc i fa fred', 'la temperatura és de menys tres coma cinc',
+                     'vull vint-i-una pizzes', 'ens veiem dilluns', 'hola', 'vull una pizza']
+    corpus['es'] += ['Mi cumpleaños es el 4 de mayo', 'Mi cumpleaños es mañana', 'Me mudaré en 2 años y tres meses',
+                     'la temperatura es de tres coma cinco y hace frío', 'la temperatura es de menos tres coma cinco',
+                     'nos vemos el lunes', 'hace una semana', 'hola', 'quiero una pizza']
+    return corpus
+
+
+def test_prefilters_have_no_false_negatives():
+    for language, sentences in ner_corpus().items():
+        configuration: NlpConfiguration = NlpConfiguration(country=language)
+        for parser, candidate in [(ner_number, number_candidate), (ner_datetime, datetime_candidate)]:
+            false_negatives: int = 0
+            skipped: int = 0
+            for sentence in sentences:
+                if not candidate(sentence, language):
+                    skipped += 1
+                    if parser(sentence, configuration) != (None, None, None):
+                        false_negatives += 1
+                        print(f'False negative of {candidate.__name__} ({language}): {sentence}')
+            print(f'{candidate.__name__} ({language}): {false_negatives} false negatives, '
+                  f'{skipped}/{len(sentences)} sentences skipped')
+            assert false_negatives == 0
+
+
+def test_prefilters_skip_parsers():
+    assert not number_candidate('hello, I want a pizza', 'en')
+    assert number_candidate('I want twenty-one pizzas', 'en')
+    assert number_candidate('the fourth one', 'en')
+    assert number_candidate('it is -3.5 outside', 'en')
+    assert not datetime_candidate('hello, I want a pizza', 'en')
+    assert not datetime_candidate('I am hungry', 'en')
+    assert datetime_candidate('see you at noon', 'en')
+    assert datetime_candidate('see you at five pm', 'en')
+    assert datetime_candidate('see you on 4/5', 'en')
+    assert not datetime_candidate('quiero una pizza', 'es')
+    assert datetime_candidate('nos vemos el lunes', 'es')
+    # Languages without number words or a dateparser locale are always parsed
+    assert number_candidate('hello', 'xx')
+    assert datetime_candidate('hello', 'xx')
+
+    configuration: NlpConfiguration = NlpConfiguration()
+    prefiltered: int = base_entity_ner_stats.stats()['prefiltered']
+    assert base_entity_ner('hello, I want a pizza', BaseEntityType.DATETIME, configuration) == (None, None, None)
+    assert base_entity_ner_stats.stats()['prefiltered'] == prefiltered + 1
+    assert base_entity_ner('my birthday is tomorrow', BaseEntityType.DATETIME, configuration)[1] is not None
+    configuration.ner_prefilters = False
+    assert base_entity_ner('hello, I want a pizza', BaseEntityType.DATETIME, configuration) == (None, None, None)
+    assert base_entity_ner_stats.stats()['prefiltered'] == prefiltered + 1
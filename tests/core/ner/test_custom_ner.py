@@ -1,3 +1,4 @@
+import random
 import uuid
 
 import numpy as np
@@ -7,8 +8,11 @@ from tests.utils.intents_and_entities import intent_weather_ner, bot1_intents, i
 from xatkitnlu.core.prediction import predict
 from xatkitnlu.core.training import train
 from xatkitnlu.core.nlp_configuration import NlpConfiguration
-from xatkitnlu.dsl.dsl import Bot, NLUContext, PredictResult, MatchedParameter, IntentReference
+from xatkitnlu.core.ner.ner import ner_matching
+from xatkitnlu.dsl.dsl import Bot, NLUContext, PredictResult, MatchedParameter, IntentReference, Intent, IntentParameter
 from tests.utils.sample_bots import create_bot_one_context_several_intents
+from xatkitnlu.utils.utils import value_in_sentence, replace_value_in_sentence
+from xatkitnlu.utils.value_matcher import ValueMatcher
 
 
 def test_training_with_ner():
@@ -155,3 +159,75 @@ def test_ner_matching():
 
     # sometimes it fails for a tiny difference
     # assert (scores_ner[3] > scores[3])
+
+
+def test_entity_value_table():
+    bot: Bot = create_bot_one_context_several_intents(bot1_intents)
+    bot.add_entity(entity_museum)
+    bot.add_intent(intent_museum_ner)
+    context1: NLUContext = bot.contexts[0]
+    context1.add_intent_ref(IntentReference(intent_museum_ner.name, intent_museum_ner))
+    bot.configuration.num_epochs = 5
+    bot.configuration.stemmer = False
+    train(bot)
+
+    # Built at training time, longest values first
+    table = intent_museum_ner.entity_value_tables[False]
+    assert [value for value, _ in table] == ['Louvre in Paris', 'Louvre', 'Gaudí', 'Louv']
+    assert table[0][1][1] == 'Louvre'
+    assert intent_museum_ner.get_entity_value_table(False) is table
+    prediction: PredictResult = predict(context1, 'I want to visit the Louvre in Paris', bot.configuration)
+    assert prediction.get_classification(intent_museum_ner).matched_parameters[0].value == 'Louvre'
+
+    # Initializing the bot again discards the tables of its previous intents
+    bot.clear()
+    assert intent_museum_ner.entity_value_tables == {}
+
+
+def test_value_matcher_parity_with_regex():
+    values: list[str] = ['Louvre in Paris', 'new york city', 'New York', 'york', 'Paris', 'C++', 'U.S.', '-5', 'san',
+                         'san francisco', 'ny', 'é', 'café', 'x-ray', 'in']
+    values.sort(key=lambda value: (len(value), value.casefold()), reverse=True)
+    matcher: ValueMatcher = ValueMatcher(values)
+    words: list[str] = ['louvre', 'in', 'Paris', 'new', 'York', 'city', 'C++', 'U.S.', '-5', 'san', 'Francisco', 'NY',
+                        'café', 'é', 'x-ray', 'ray', 'the', ',', '!', 'sanny', '5', 'a-5', 'paris.', "(new"]
+    rng: random.Random = random.Random(0)
+    for _ in range(3000):
+        sentence: str = ' '.join(rng.choice(words) for _ in range(rng.randint(1, 8)))
+        if rng.random() < 0.1:
+            sentence = rng.choice(values).upper()
+        # Values checked and replaced one by one, as NER did before the matcher
+        expected: str = sentence
+        temp_count: int = 1
+        for value in values:
+            if value_in_sentence(value, expected):
+                expected = replace_value_in_sentence(expected, value, f'/temp{temp_count}/')
+                temp_count += 1
+        matched: str = sentence
+        matches: list[tuple[int, int, int]] = matcher.match(sentence)
+        for temp_number, (start, end, _) in sorted(enumerate(matches, 1), key=lambda x: x[1][0], reverse=True):
+            matched = matched[:start] + f'/temp{temp_number}/' + matched[end:]
+        assert matched == expected, sentence
+
+
+def test_ner_matching_repeated_values():
+    intent_trip: Intent = Intent('intent_trip', ['I go from origincity to destinationcity'])
+    intent_trip.add_parameter(IntentParameter('origin', 'origincity', entity_city))
+    intent_trip.add_parameter(IntentParameter('destination', 'destinationcity', entity_city))
+    context: NLUContext = NLUContext('context')
+    context.add_intent_ref(IntentReference(intent_trip.name, intent_trip))
+    context.add_intent_ref(IntentReference(intent_weather_ner.name, intent_weather_ner))
+    configuration: NlpConfiguration = NlpConfiguration()
+    configuration.stemmer = False
+
+    result = ner_matching(context, 'I go from BCN to Madrid', configuration)
+    assert result[intent_trip][0] == 'I go from ENTITY_CITY to ENTITY_CITY'
+    assert [(mp.name, mp.value) for mp in result[intent_trip][1]] == [('origin', 'Barcelona'), ('destination', 'Madrid')]
+
+    # The same value can be matched twice
+    result = ner_matching(context, 'I go from Madrid to madrid', configuration)
+    assert result[intent_trip][0] == 'I go from ENTITY_CITY to ENTITY_CITY'
+    assert [(mp.name, mp.value) for mp in result[intent_trip][1]] == [('origin', 'Madrid'), ('destination', 'Madrid')]
+    # Unless there is no parameter left for it
+    assert result[intent_weather_ner][0] == 'I go from ENTITY_CITY to madrid'
+    assert [(mp.name, mp.value) for mp in result[intent_weather_ner][1]] == [('city', 'Madrid')]
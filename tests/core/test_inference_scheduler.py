@@ -0,0 +1,146 @@
+import threading
+
+import numpy as np
+
+from tests.utils.intents_and_entities import bot1_intents
+from tests.utils.sample_bots import create_bot_one_context_several_intents
+from xatkitnlu.core.inference_scheduler import InferenceScheduler, Histogram
+from xatkitnlu.core.nlp_configuration import NlpConfiguration
+from xatkitnlu.core.prediction import predict, inference_scheduler
+from xatkitnlu.core.training import train
+from xatkitnlu.dsl.dsl import Bot, NLUContext, PredictResult
+
+
+def test_inference_scheduler_batches_concurrent_rows():
+    scheduler: InferenceScheduler = InferenceScheduler(max_batch_size=8, max_wait_ms=200)
+    batches: list[int] = []
+
+    def run_model(rows: np.ndarray) -> np.ndarray:
+        batches.append(len(rows))
+        return rows * 10
+
+    results: dict[int, np.ndarray] = {}
+
+    def predict(i: int):
+        results[i] = scheduler.run('context', np.array([[i, i]]), run_model)
+
+    threads: list[threading.Thread] = [threading.Thread(target=predict, args=(i,)) for i in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print(batches)
+    for i in range(20):
+        assert np.array_equal(results[i], np.array([[10 * i, 10 * i]]))
+    assert sum(batches) == 20
+    assert max(batches) <= 8
+    assert len(batches) < 20
+    stats: dict = scheduler.stats()
+    print(stats)
+    assert stats['batch_size']['count'] == len(batches)
+    assert stats['queue_wait_ms']['count'] == 20
+    assert scheduler.queues == {}
+
+
+def test_inference_scheduler_errors_and_disabled():
+    scheduler: InferenceScheduler = InferenceScheduler(max_batch_size=4, max_wait_ms=1)
+
+    def fail(rows: np.ndarray) -> np.ndarray:
+        raise ValueError('model failed')
+
+    try:
+        scheduler.run('context', np.zeros((1, 2)), fail)
+        assert False
+    except ValueError as e:
+        assert str(e) == 'model failed'
+
+    # Rows above the max batch size are run on their own
+    assert np.array_equal(scheduler.run('context', np.ones((6, 2)), lambda rows: rows), np.ones((6, 2)))
+
+    scheduler.configure(1, 0)
+    assert np.array_equal(scheduler.run('context', np.ones((1, 2)), lambda rows: rows + 1), np.full((1, 2), 2))
+    assert scheduler.stats()['batch_size']['buckets']['1'] == 1
+
+
+def test_inference_scheduler_interrupted_leader():
+    scheduler: InferenceScheduler = InferenceScheduler(max_batch_size=8, max_wait_ms=200)
+
+    class Interrupted(BaseException):
+        pass
+
+    def interrupt(rows: np.ndarray) -> np.ndarray:
+        raise Interrupted()
+
+    errors: dict[int, BaseException] = {}
+
+    def predict(i: int):
+        try:
+            scheduler.run('context', np.array([[i, i]]), interrupt)
+        except BaseException as e:
+            errors[i] = e
+
+    threads: list[threading.Thread] = [threading.Thread(target=predict, args=(i,), daemon=True) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+        assert not thread.is_alive()
+    # The leader gets its own error, the other callers are released with an error instead of waiting forever
+    assert len(errors) == 4
+    assert sum(isinstance(error, Interrupted) for error in errors.values()) >= 1
+    assert all(isinstance(error, (Interrupted, RuntimeError)) for error in errors.values())
+
+
+def test_concurrent_predictions_with_batching():
+    bot: Bot = create_bot_one_context_several_intents(bot1_intents)
+    bot.configuration.input_max_num_tokens = 7
+    bot.configuration.num_epochs = 50
+    bot.configuration.inference_backend = 'numpy'
+    train(bot)
+    context1: NLUContext = bot.contexts[0]
+    texts: list[str] = ['I love dogs', 'hi there', 'two more pizzas', 'dogs and pizzas'] * 4
+    expected_scores: list[list[float]] = [[c.score for c in predict(context1, text, bot.configuration).classifications]
+                                          for text in texts]
+
+    inference_scheduler.configure(16, 100)
+    try:
+        predictions: dict[int, PredictResult] = {}
+
+        def run_predict(i: int):
+            predictions[i] = predict(context1, texts[i], bot.configuration)
+
+        threads: list[threading.Thread] = [threading.Thread(target=run_predict, args=(i,)) for i in range(len(texts))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for i in range(len(texts)):
+            assert np.allclose([c.score for c in predictions[i].classifications], expected_scores[i])
+        assert inference_scheduler.stats()['batch_size']['count'] < len(texts)
+
+        # Predictions padded to different widths are never run in the same batch
+        configuration: NlpConfiguration = NlpConfiguration(input_max_num_tokens=9, inference_backend='numpy')
+        wide_expected_scores: list[list[float]] = [[c.score for c in predict(context1, text, configuration).classifications]
+                                                   for text in texts]
+
+        def run_predict_width(i: int):
+            predictions[i] = predict(context1, texts[i], configuration if i % 2 == 0 else bot.configuration)
+
+        threads = [threading.Thread(target=run_predict_width, args=(i,)) for i in range(len(texts))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for i in range(len(texts)):
+            expected: list[float] = wide_expected_scores[i] if i % 2 == 0 else expected_scores[i]
+            assert np.allclose([c.score for c in predictions[i].classifications], expected)
+    finally:
+        inference_scheduler.configure(1, 0)
+
+
+def test_histogram():
+    histogram: Histogram = Histogram([1, 10])
+    for value in [0.5, 1, 5, 20]:
+        histogram.observe(value)
+    assert histogram.to_dict() == {'buckets': {'1': 2, '10': 1, 'inf': 1}, 'count': 4, 'avg': 6.625}
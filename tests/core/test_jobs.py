@@ -0,0 +1,92 @@
+import threading
+
+from xatkitnlu.core.jobs import TrainingJobScheduler, TrainingJob, JobStatus
+from xatkitnlu.core.nlp_configuration import NlpConfiguration
+
+
+def test_training_jobs():
+    release_first_job: threading.Event = threading.Event()
+    trained: list[tuple[str, int]] = []
+
+    def run_job(job: TrainingJob):
+        if job.bot_name == 'blocking bot':
+            release_first_job.wait()
+        trained.append((job.bot_name, job.configuration.num_epochs))
+        if job.bot_name == 'failing bot':
+            raise ValueError('Bot does not exist')
+        return {'trained': job.bot_name}
+
+    scheduler: TrainingJobScheduler = TrainingJobScheduler(run_job)
+    blocking_job: TrainingJob = scheduler.submit('blocking bot', NlpConfiguration())
+
+    # While the worker is busy, repeated requests for the same bot are merged into a single queued job
+    job1: TrainingJob = scheduler.submit('bot', NlpConfiguration(num_epochs=10))
+    job2: TrainingJob = scheduler.submit('bot', NlpConfiguration(num_epochs=20))
+    failing_job: TrainingJob = scheduler.submit('failing bot', NlpConfiguration())
+    assert job1 is job2
+    assert job1.requests == 2
+    assert job1.status == JobStatus.QUEUED
+    assert scheduler.get_job(job1.job_id).to_dict()['started_at'] is None
+
+    release_first_job.set()
+    assert failing_job.finished.wait(timeout=10)
+    assert blocking_job.status == JobStatus.DONE
+    assert job1.status == JobStatus.DONE
+    assert job1.result == {'trained': 'bot'}
+    assert failing_job.status == JobStatus.FAILED
+    assert failing_job.error == 'Bot does not exist'
+    # The merged job is run once, with the configuration of the last request
+    assert trained == [('blocking bot', 300), ('bot', 20), ('failing bot', 300)]
+
+    job_dict: dict = job1.to_dict()
+    assert job_dict['queue_time'] >= 0
+    assert job_dict['run_time'] >= 0
+
+    # Once the job is running, a new request creates a new job
+    job3: TrainingJob = scheduler.submit('bot', NlpConfiguration(num_epochs=30))
+    assert job3 is not job1
+    assert job3.finished.wait(timeout=10)
+    assert scheduler.get_job('unknown') is None
+
+
+def test_cancel_training_job():
+    first_job_started, release_first_job = threading.Event(), threading.Event()
+    trained: list[str] = []
+
+    def run_job(job: TrainingJob):
+        first_job_started.set()
+        release_first_job.wait()
+        trained.append(job.bot_name)
+
+    scheduler: TrainingJobScheduler = TrainingJobScheduler(run_job)
+    running_job: TrainingJob = scheduler.submit('bot', NlpConfiguration())
+    assert first_job_started.wait(timeout=10)
+    queued_job: TrainingJob = scheduler.submit('bot', NlpConfiguration())
+    other_job: TrainingJob = scheduler.submit('other bot', NlpConfiguration())
+    assert running_job is not queued_job
+
+    # Only the queued job is cancelled, the running one cannot be interrupted
+    assert scheduler.cancel('bot') is queued_job
+    assert scheduler.cancel('bot') is None
+    assert queued_job.status == JobStatus.CANCELLED
+    assert queued_job.finished.is_set()
+    release_first_job.set()
+    assert other_job.finished.wait(timeout=10)
+    assert running_job.status == JobStatus.DONE
+    assert trained == ['bot', 'other bot']
+
+
+def test_training_job_exiting():
+    def run_job(job: TrainingJob):
+        if job.bot_name == 'exiting bot':
+            raise SystemExit()
+        return {'trained': job.bot_name}
+
+    scheduler: TrainingJobScheduler = TrainingJobScheduler(run_job)
+    exiting_job: TrainingJob = scheduler.submit('exiting bot', NlpConfiguration())
+    assert exiting_job.finished.wait(timeout=10)
+    assert exiting_job.status == JobStatus.FAILED
+    # The worker keeps running the next jobs
+    job: TrainingJob = scheduler.submit('bot', NlpConfiguration())
+    assert job.finished.wait(timeout=10)
+    assert job.status == JobStatus.DONE
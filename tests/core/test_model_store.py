@@ -0,0 +1,57 @@
+import numpy as np
+
+from tests.utils.intents_and_entities import bot1_intents
+from tests.utils.sample_bots import create_bot_one_context_several_intent_with_one_custom_city_intent_with_ner
+from xatkitnlu.core.model_store import ModelStore
+from xatkitnlu.core.prediction import predict
+from xatkitnlu.core.training import train
+from xatkitnlu.dsl.dsl import Bot, NLUContext, PredictResult, CustomEntity
+
+
+def test_save_and_load_bot(tmp_path):
+    bot: Bot = create_bot_one_context_several_intent_with_one_custom_city_intent_with_ner(bot1_intents)
+    bot.name = 'test/bot.1'
+    bot.configuration.input_max_num_tokens = 10
+    bot.configuration.num_epochs = 50
+    bot.add_context(NLUContext('empty context'))
+    train(bot)
+
+    store: ModelStore = ModelStore(str(tmp_path))
+    store.save_bot(bot)
+    # Saving again replaces the previous version
+    store.save_bot(bot)
+    assert store.get_bot_names() == ['test/bot.1']
+
+    loaded_bot: Bot = store.load_bots()['test/bot.1']
+    assert loaded_bot.bot_id == bot.bot_id
+    assert loaded_bot.configuration.__dict__ == bot.configuration.__dict__
+    assert [context.name for context in loaded_bot.contexts] == ['context1', 'empty context']
+    assert [intent.name for intent in loaded_bot.intents] == [intent.name for intent in bot.intents]
+    assert loaded_bot.contexts[1].nlp_model is None
+    city_entity: CustomEntity = loaded_bot.get_entity('cityentity')
+    assert city_entity.entries[0].synonyms == ['BCN']
+    assert city_entity.entries[0].preprocessed_value is not None
+
+    context: NLUContext = bot.contexts[0]
+    loaded_context: NLUContext = loaded_bot.contexts[0]
+    assert loaded_context.tokenizer.word_index == context.tokenizer.word_index
+    assert loaded_context.training_sentences == context.training_sentences
+    assert loaded_context.training_labels == context.training_labels
+    assert np.array_equal(loaded_context.training_sequences, context.training_sequences)
+    assert loaded_context.exact_match_index == context.exact_match_index
+    assert loaded_context.fingerprint == context.fingerprint
+    assert loaded_bot.trained_contexts == {'context1': loaded_context}
+
+    for sentence in ['I love your dogs', 'is it sunny in BCN?', 'xsx dfasklj adfa', 'I love your cats']:
+        prediction: PredictResult = predict(context, sentence, bot.configuration)
+        loaded_prediction: PredictResult = predict(loaded_context, sentence, loaded_bot.configuration)
+        scores: list[float] = [classification.score for classification in prediction.classifications]
+        loaded_scores: list[float] = [classification.score for classification in loaded_prediction.classifications]
+        print(f'Prediction for {sentence} is {scores}, after loading the bot is {loaded_scores}')
+        assert np.allclose(scores, loaded_scores)
+        assert [(mp.name, mp.value) for c in prediction.classifications for mp in c.matched_parameters] == \
+               [(mp.name, mp.value) for c in loaded_prediction.classifications for mp in c.matched_parameters]
+
+    store.delete_bot('test/bot.1')
+    assert store.get_bot_names() == []
+    assert store.load_bots() == {}
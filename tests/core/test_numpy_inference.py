@@ -0,0 +1,80 @@
+import numpy as np
+
+from tests.utils.intents_and_entities import bot1_intents
+from tests.utils.sample_bots import create_bot_one_context_several_intents
+from xatkitnlu.core.numpy_inference import NumpyModel, quantization_report
+from xatkitnlu.core.prediction import predict_batch
+from xatkitnlu.core.training import train
+from xatkitnlu.dsl.dsl import Bot, NLUContext, PredictResult
+
+
+def test_numpy_model_parity_with_keras():
+    bot: Bot = create_bot_one_context_several_intents(bot1_intents)
+    bot.configuration.input_max_num_tokens = 7
+    bot.configuration.num_epochs = 50
+    train(bot)
+    context1: NLUContext = bot.contexts[0]
+    numpy_model: NumpyModel = NumpyModel.from_keras(context1.nlp_model, bot.configuration)
+
+    sequences: np.ndarray = np.random.default_rng(0).integers(0, bot.configuration.num_words,
+                                                              size=(32, bot.configuration.input_max_num_tokens))
+    keras_scores: np.ndarray = context1.nlp_model.predict(sequences)
+    numpy_scores: np.ndarray = numpy_model.predict(sequences)
+    assert numpy_scores.shape == keras_scores.shape
+    assert np.allclose(numpy_scores, keras_scores, atol=1e-5)
+
+    # Both backends give the same predictions
+    texts: list[str] = ['I love your dogs', 'hello!', 'can I have two more pizzas?', 'dogs and pizzas']
+    keras_results: list[PredictResult] = predict_batch([(context1, text) for text in texts], bot.configuration)
+    bot.configuration.inference_backend = 'numpy'
+    numpy_results: list[PredictResult] = predict_batch([(context1, text) for text in texts], bot.configuration)
+    for numpy_result, keras_result in zip(numpy_results, keras_results):
+        numpy_result_scores: list[float] = [c.score for c in numpy_result.classifications]
+        keras_result_scores: list[float] = [c.score for c in keras_result.classifications]
+        print(f'{numpy_result_scores} vs {keras_result_scores}')
+        assert np.allclose(numpy_result_scores, keras_result_scores, atol=1e-5)
+
+
+def test_numpy_model_activations():
+    bot: Bot = create_bot_one_context_several_intents(bot1_intents)
+    bot.configuration.input_max_num_tokens = 7
+    bot.configuration.num_epochs = 5
+    bot.configuration.activation_hidden_layers = 'relu'
+    bot.configuration.activation_last_layer = 'softmax'
+    train(bot)
+    context1: NLUContext = bot.contexts[0]
+    assert context1.numpy_model is None
+
+    numpy_model: NumpyModel = NumpyModel.from_keras(context1.nlp_model, bot.configuration)
+    sequences: np.ndarray = np.asarray(context1.training_sequences)
+    assert np.allclose(numpy_model.predict(sequences), context1.nlp_model.predict(sequences), atol=1e-5)
+
+
+def test_numpy_model_quantization():
+    bot: Bot = create_bot_one_context_several_intents(bot1_intents)
+    bot.configuration.input_max_num_tokens = 7
+    bot.configuration.num_epochs = 50
+    bot.configuration.inference_backend = 'numpy'
+    bot.configuration.model_quantization = 'int8'
+    train(bot)
+    context1: NLUContext = bot.contexts[0]
+    # Only the quantized model is kept in memory
+    assert context1.nlp_model is None
+    assert context1.numpy_model.embeddings.dtype == np.int8
+    print(context1.quantization_report)
+    assert context1.quantization_report['quantized_bytes'] < context1.quantization_report['float_bytes'] / 3
+    assert context1.quantization_report['accuracy_delta'] == 0
+
+    float_model: NumpyModel = NumpyModel.from_weights(context1.get_model_weights(), bot.configuration)
+    float16_model: NumpyModel = float_model.quantize('float16')
+    assert float16_model.embeddings.dtype == np.float16
+    sequences: np.ndarray = np.asarray(context1.training_sequences)
+    report: dict = quantization_report(float_model, float16_model, sequences, context1.training_labels)
+    assert report['max_score_delta'] < 1e-2
+
+    # The Keras model is created back if the backend is changed after training
+    bot.configuration.inference_backend = 'keras'
+    bot.configuration.check_exact_prediction_match = False
+    keras_results: list[PredictResult] = predict_batch([(context1, 'I love your dogs')], bot.configuration)
+    assert context1.nlp_model is not None
+    assert np.argmax([c.score for c in keras_results[0].classifications]) == 0
@@ -0,0 +1,50 @@
+import time
+
+from nltk import word_tokenize
+
+import tests.utils.intents_and_entities as intents_and_entities
+from tests.utils.intents_and_entities import bot1_intents
+from xatkitnlu.core.nlp_configuration import NlpConfiguration
+from xatkitnlu.core.pipelines import create_or_get_word_tokenizer, RegexWordTokenizer
+from xatkitnlu.core.text_preprocessing import stem_text
+from xatkitnlu.dsl.dsl import Intent
+
+
+def english_corpus() -> list[str]:
+    sentences: list[str] = [sentence for sentences in bot1_intents.values() for sentence in sentences]
+    sentences += [sentence for intent in vars(intents_and_entities).values() if isinstance(intent, Intent)
+                  and not intent.name.endswith(('_ca', '_es')) for sentence in intent.training_sentences]
+    sentences += ['My birthday is in May 4th', 'I am going to move in 2 years and three months',
+                  'the temperature outside is -3.5 degrees', "I don't know, can't you tell me?", 'It costs $1,000.50',
+                  'He said "hello" to me...', "I'm at 10:30, we'll see", 'I cannot wait', 'what about the e-mail?']
+    return sentences
+
+
+def test_regex_word_tokenizer_parity_with_nltk():
+    sentences: list[str] = english_corpus()
+    regex_tokenizer: RegexWordTokenizer = create_or_get_word_tokenizer('regex', 'english')
+    for sentence in sentences:
+        assert regex_tokenizer(sentence) == word_tokenize(sentence, language='english'), sentence
+
+    start: float = time.perf_counter()
+    for _ in range(20):
+        for sentence in sentences:
+            word_tokenize(sentence, language='english')
+    nltk_time: float = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(20):
+        for sentence in sentences:
+            regex_tokenizer(sentence)
+    regex_time: float = time.perf_counter() - start
+    print(f'{20 * len(sentences)} sentences tokenized in {nltk_time:.4f}s by nltk and {regex_time:.4f}s by regex')
+
+
+def test_regex_word_tokenizer_languages():
+    assert RegexWordTokenizer('french')("l'homme qu'il aime") == ["l'", 'homme', "qu'", 'il', 'aime']
+    assert RegexWordTokenizer('spanish')('¿Qué tal?') == ['¿', 'Qué', 'tal', '?']
+    assert RegexWordTokenizer('catalan')("l'aniversari és el 4 de maig") == ["l'", 'aniversari', 'és', 'el', '4', 'de',
+                                                                             'maig']
+
+    configuration: NlpConfiguration = NlpConfiguration()
+    configuration.word_tokenizer = 'regex'
+    assert stem_text('I love your dogs!', configuration) == stem_text('I love your dogs!', NlpConfiguration())
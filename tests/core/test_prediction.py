@@ -1,10 +1,14 @@
+import subprocess
+import sys
+
 import numpy as np
 
 from tests.utils.intents_and_entities import bot1_intents
-from xatkitnlu.core.prediction import predict
+from xatkitnlu.core.prediction import predict, predict_batch
 from xatkitnlu.core.training import train
 from xatkitnlu.dsl.dsl import Bot, NLUContext, PredictResult
-from tests.utils.sample_bots import create_bot_one_context_several_intents
+from tests.utils.sample_bots import create_bot_one_context_several_intents, \
+    create_bot_one_context_several_intent_with_one_custom_city_intent_with_ner
 
 
 def test_predict_without_stemmer():
@@ -118,3 +122,63 @@ def test_prediction_for_when_prediction_sentence_is_in_training_sentence():
     assert (np.argmax(scores) == 0)
     assert (scores[0] < 1)
 
+
+def test_predict_batch():
+    bot: Bot = create_bot_one_context_several_intent_with_one_custom_city_intent_with_ner(bot1_intents)
+    bot.configuration.input_max_num_tokens = 10
+    other_context: NLUContext = NLUContext('context2')
+    other_context.add_intent_ref(bot.contexts[0].intent_refs[0])
+    other_context.add_intent_ref(bot.contexts[0].intent_refs[1])
+    bot.add_context(other_context)
+    train(bot)
+    context1: NLUContext = bot.contexts[0]
+
+    requests: list[tuple[NLUContext, str]] = [(context1, 'I love your dogs'),
+                                              (other_context, 'hello!'),
+                                              (context1, 'can I have two more pizzas?'),
+                                              (context1, 'is it sunny in BCN?'),
+                                              (other_context, 'xsx dfasklj adfa'),
+                                              (context1, 'I love your cats')]
+    batch_predictions: list[PredictResult] = predict_batch(requests, bot.configuration)
+    assert len(batch_predictions) == len(requests)
+
+    for (context, sentence), batch_prediction in zip(requests, batch_predictions):
+        prediction: PredictResult = predict(context, sentence, bot.configuration)
+        batch_scores: list[float] = [classification.score for classification in batch_prediction.classifications]
+        scores: list[float] = [classification.score for classification in prediction.classifications]
+        print(f'Batch prediction for {sentence} is {batch_scores}')
+        assert np.allclose(batch_scores, scores, atol=1e-6)
+        for batch_classification, classification in zip(batch_prediction.classifications, prediction.classifications):
+            assert batch_classification.intent == classification.intent
+            assert batch_classification.matched_utterance == sentence
+            assert [(mp.name, mp.value) for mp in batch_classification.matched_parameters] == \
+                   [(mp.name, mp.value) for mp in classification.matched_parameters]
+
+
+def test_predict_exact_match_without_training_sequences():
+    bot: Bot = create_bot_one_context_several_intents(bot1_intents)
+    bot.configuration.input_max_num_tokens = 7
+    bot.configuration.num_epochs = 5
+    bot.configuration.keep_training_sequences = False
+    train(bot)
+    context1: NLUContext = bot.contexts[0]
+    assert len(context1.training_sequences) == 0
+    assert len(context1.exact_match_index) > 0
+
+    # Barely trained, so only the exact match gives full confidence
+    for intent_index, intent_ref in enumerate(context1.intent_refs):
+        text_to_predict: str = intent_ref.intent.training_sentences[0]
+        prediction: PredictResult = predict(context1, text_to_predict, bot.configuration)
+        scores: list[float] = [classification.score for classification in prediction.classifications]
+        print(f'Prediction for {text_to_predict} is {scores}')
+        expected_scores: np.ndarray = np.zeros(len(context1.intent_refs))
+        expected_scores[intent_index] = 1.0
+        assert np.array_equal(scores, expected_scores)
+
+
+def test_prediction_does_not_load_tensorflow():
+    # In a new interpreter, as the tests have already loaded TensorFlow
+    loaded = subprocess.run([sys.executable, '-c', 'import sys, xatkitnlu.core.prediction; '
+                                                   'print("tensorflow" in sys.modules, "matplotlib" in sys.modules)'],
+                            capture_output=True, text=True, check=True).stdout
+    assert loaded.split() == ['False', 'False']
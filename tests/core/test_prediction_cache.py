@@ -0,0 +1,83 @@
+import time
+
+from tests.utils.intents_and_entities import bot1_intents
+from tests.utils.sample_bots import create_bot_one_context_several_intents
+from xatkitnlu.core.ner.base.base_entities import BaseEntityType
+from xatkitnlu.core.nlp_configuration import NlpConfiguration
+from xatkitnlu.core.prediction import predict, prediction_cache
+from xatkitnlu.core.prediction_cache import PredictionCache
+from xatkitnlu.core.training import train
+from xatkitnlu.dsl.dsl import Bot, NLUContext, PredictResult, Intent, IntentParameter, IntentReference, BaseEntity, \
+    MatchedParameter
+
+
+def test_prediction_cache():
+    bot: Bot = create_bot_one_context_several_intents(bot1_intents)
+    bot.configuration.input_max_num_tokens = 7
+    bot.configuration.num_epochs = 50
+    train(bot)
+    context1: NLUContext = bot.contexts[0]
+
+    prediction_cache.configure(100, 0, 0)
+    try:
+        prediction1: PredictResult = predict(context1, 'I love your dogs', bot.configuration)
+        scores: list[float] = [c.score for c in prediction1.classifications]
+        # Callers can modify their results without changing the cached one
+        prediction1.classifications[0].score = -1
+        prediction1.classifications[0].matched_parameters.append(MatchedParameter('p', 'v', {}))
+        prediction2: PredictResult = predict(context1, 'I love your dogs', bot.configuration)
+        assert prediction1 is not prediction2
+        assert [c.score for c in prediction2.classifications] == scores
+        assert prediction2.classifications[0].matched_parameters == []
+        assert prediction2.get_classification(prediction2.classifications[0].intent) is prediction2.classifications[0]
+        assert prediction_cache.stats()['hits'] == 1
+
+        # A different configuration is a different key
+        bot.configuration.check_exact_prediction_match = not bot.configuration.check_exact_prediction_match
+        assert predict(context1, 'I love your dogs', bot.configuration) is not prediction1
+        bot.configuration.check_exact_prediction_match = not bot.configuration.check_exact_prediction_match
+
+        # Retraining the context discards the results of the previous model
+        context1.intent_refs[0].intent.add_training_sentence('dogs are the best')
+        train(bot)
+        assert predict(context1, 'I love your dogs', bot.configuration) is not prediction1
+        stats: dict = prediction_cache.stats()
+        print(stats)
+        assert stats['hits'] == 1
+        assert stats['misses'] == 3
+    finally:
+        prediction_cache.configure(0, 0, 0)
+
+
+def test_prediction_cache_eviction_and_expiration():
+    cache: PredictionCache = PredictionCache(max_size=2, ttl=0.1)
+    context: NLUContext = NLUContext('context')
+    for key in ['a', 'b', 'c']:
+        cache.put(key, PredictResult(context))
+    # 'a' is the least recently used one
+    assert cache.get('a') is None
+    assert cache.get('b') is not None
+    assert cache.stats()['size'] == 2
+    time.sleep(0.2)
+    assert cache.get('c') is None
+
+
+def test_prediction_cache_datetime_results():
+    context: NLUContext = NLUContext('context')
+    intent: Intent = Intent('intent', ['see you DATE'])
+    intent.add_parameter(IntentParameter('date', 'DATE', BaseEntity(BaseEntityType.DATETIME)))
+    context.add_intent_ref(IntentReference('intent', intent))
+    predict_result: PredictResult = PredictResult(context)
+    predict_result.get_classification(intent).matched_parameters = [MatchedParameter('date', '2022-02-22', {})]
+
+    # Relative dates depend on when the prediction is done, so they are not cached unless a datetime TTL is set
+    cache: PredictionCache = PredictionCache(max_size=10)
+    cache.put('key', predict_result)
+    assert cache.get('key') is None
+    cache.configure(10, 0, 60)
+    cache.put('key', predict_result)
+    assert cache.get('key').get_classification(intent).matched_parameters[0].value == '2022-02-22'
+
+    # Keys are not even built while the cache is disabled
+    cache.configure(0, 0, 0)
+    assert cache.get_key(context, 'see you tomorrow', NlpConfiguration()) is None
@@ -0,0 +1,145 @@
+import threading
+import time
+
+import numpy as np
+
+from tests.utils.intents_and_entities import bot1_intents
+from tests.utils.sample_bots import create_bot_one_context_several_intents
+from xatkitnlu.core.nlp_configuration import NlpConfiguration
+from xatkitnlu.core.prediction import predict
+import xatkitnlu.core.residency as residency_module
+from xatkitnlu.core.model_store import load_context
+from xatkitnlu.core.residency import ResidencyManager, context_memory_size
+from xatkitnlu.core.training import train
+from xatkitnlu.dsl.dsl import Bot, NLUContext, PredictResult
+
+
+def test_residency_eviction_and_reload(tmp_path):
+    bot1: Bot = create_bot_one_context_several_intents(bot1_intents)
+    bot1.name = 'bot1'
+    bot2: Bot = create_bot_one_context_several_intents(bot1_intents)
+    bot2.name = 'bot2'
+    for bot in [bot1, bot2]:
+        bot.configuration.input_max_num_tokens = 7
+        bot.configuration.num_epochs = 50
+        train(bot)
+    context1: NLUContext = bot1.contexts[0]
+    context2: NLUContext = bot2.contexts[0]
+    expected_scores: list[float] = [c.score for c in predict(context1, 'I love your dogs', bot1.configuration).classifications]
+
+    # Only one of the contexts fits in the budget
+    residency: ResidencyManager = ResidencyManager(int(context_memory_size(context1) * 1.5), str(tmp_path))
+    residency.track(bot1)
+    residency.track(bot2)
+    # bot1 is the least recently used one, so it is evicted when bot2 is tracked
+    assert context1.nlp_model is None
+    assert context2.nlp_model is not None
+    assert residency.stats()['evictions'] == 1
+
+    with residency.use([context1]):
+        # A context being used is never evicted
+        assert context1.nlp_model is not None
+        assert context2.nlp_model is None
+        prediction: PredictResult = predict(context1, 'I love your dogs', bot1.configuration)
+        scores: list[float] = [c.score for c in prediction.classifications]
+        assert np.allclose(scores, expected_scores)
+
+    with residency.use([context1]):
+        assert context1.nlp_model is not None
+
+    with residency.use([context2]):
+        assert context2.nlp_model is not None
+        assert context1.nlp_model is None
+
+    stats: dict = residency.stats()
+    print(stats)
+    assert stats['hits'] == 1
+    assert stats['misses'] == 2
+    assert stats['evictions'] == 3
+    assert stats['resident_contexts'] == 1
+    assert stats['evicted_contexts'] == 1
+    assert stats['resident_memory'] <= stats['memory_budget']
+    assert stats['reload_time_avg_ms'] > 0
+
+    # Forgotten bots are not tracked anymore
+    residency.forget('bot1')
+    assert residency.stats()['evicted_contexts'] == 0
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_residency_reload_after_configuration_change(tmp_path):
+    bot1: Bot = create_bot_one_context_several_intents(bot1_intents)
+    bot1.name = 'bot1'
+    bot2: Bot = create_bot_one_context_several_intents(bot1_intents)
+    bot2.name = 'bot2'
+    for bot in [bot1, bot2]:
+        bot.configuration.input_max_num_tokens = 7
+        bot.configuration.num_epochs = 20
+        train(bot)
+    context1: NLUContext = bot1.contexts[0]
+    residency: ResidencyManager = ResidencyManager(int(context_memory_size(context1) * 1.5), str(tmp_path))
+    residency.track(bot1)
+    residency.track(bot2)
+    assert context1.nlp_model is None
+
+    # The evicted model is reloaded with the configuration it was trained with, not the current one of the bot
+    configuration: NlpConfiguration = NlpConfiguration(input_max_num_tokens=7, num_epochs=20, embedding_dim=256)
+    bot1.configuration = configuration
+    with residency.use([context1]):
+        assert context1.nlp_model.get_weights()[0].shape == (1000, 128)
+    with residency.use([bot2.contexts[0]]):
+        assert context1.nlp_model is None
+
+    # Retraining the evicted context with a new embedding_dim
+    with residency.use(list(bot1.trained_contexts.values())):
+        assert train(bot1, configuration)['retrained_contexts'] == ['context1']
+    residency.track(bot1)
+    assert context1.training_configuration is configuration
+    with residency.use([context1]):
+        assert context1.nlp_model.get_weights()[0].shape == (1000, 256)
+        assert len(predict(context1, 'I love your dogs', bot1.configuration).classifications) == len(bot1_intents)
+
+
+def test_residency_reload_does_not_block_other_contexts(tmp_path, monkeypatch):
+    bot1: Bot = create_bot_one_context_several_intents(bot1_intents)
+    bot1.name = 'bot1'
+    bot2: Bot = create_bot_one_context_several_intents(bot1_intents)
+    bot2.name = 'bot2'
+    for bot in [bot1, bot2]:
+        bot.configuration.input_max_num_tokens = 7
+        bot.configuration.num_epochs = 20
+        train(bot)
+    context1: NLUContext = bot1.contexts[0]
+    context2: NLUContext = bot2.contexts[0]
+    residency: ResidencyManager = ResidencyManager(int(context_memory_size(context1) * 1.5), str(tmp_path))
+    residency.track(bot1)
+    residency.track(bot2)
+    assert context1.nlp_model is None
+
+    # context1 takes a while to be read from disk
+    loading: threading.Event = threading.Event()
+    loaded: threading.Event = threading.Event()
+
+    def slow_load_context(*args):
+        loading.set()
+        loaded.wait(10)
+        load_context(*args)
+
+    monkeypatch.setattr(residency_module, 'load_context', slow_load_context)
+
+    def use_context1():
+        with residency.use([context1]):
+            assert context1.is_trained()
+
+    thread: threading.Thread = threading.Thread(target=use_context1)
+    thread.start()
+    assert loading.wait(10)
+    # Meanwhile, the resident context can be used
+    start: float = time.perf_counter()
+    with residency.use([context2]):
+        assert context2.is_trained()
+    assert time.perf_counter() - start < 1
+    assert residency.stats()['hits'] == 1
+    loaded.set()
+    thread.join()
+    assert context1.is_trained()
@@ -0,0 +1,25 @@
+from xatkitnlu.core.nlp_configuration import NlpConfiguration
+from xatkitnlu.core.text_preprocessing import preprocess_text, preprocessing_cache, stem_cache
+
+
+def test_stemming_caches():
+    configuration: NlpConfiguration = NlpConfiguration()
+    configuration.stemmer = True
+    preprocessing_cache.configure(10)
+    stem_cache.configure(100)
+    try:
+        assert preprocess_text('dogs love_dogs', configuration) == preprocess_text('dogs love_dogs', configuration)
+        assert preprocessing_cache.stats()['hits'] == 1
+        # 'dogs' is stemmed only once, the second time the sentence is preprocessed is a sentence cache hit
+        assert stem_cache.stats()['hits'] == 1
+        assert stem_cache.stats()['misses'] == 2
+
+        # Stemmed words depend on the language
+        configuration.country = 'es'
+        preprocess_text('dogs', configuration)
+        assert preprocessing_cache.stats()['misses'] == 2
+        assert stem_cache.stats()['misses'] == 3
+        print(stem_cache.stats())
+    finally:
+        preprocessing_cache.configure(0)
+        stem_cache.configure(0)
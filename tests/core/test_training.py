@@ -1,8 +1,14 @@
+import logging
+
+import numpy as np
+
 from xatkitnlu.core.prediction import predict
 from xatkitnlu.core.text_preprocessing import stem_text
 from xatkitnlu.core.training import train
 from xatkitnlu.core.nlp_configuration import NlpConfiguration
-from xatkitnlu.dsl.dsl import Bot, NLUContext, PredictResult
+from xatkitnlu.dsl.dsl import Bot, NLUContext, PredictResult, Intent, IntentReference
+from xatkitnlu.dto.dto import BotDTO, bot_to_botdto, botdto_to_bot
+from tests.utils.intents_and_entities import bot1_intents
 from tests.utils.sample_bots import create_bot_one_context_one_intent, create_bot_one_context_several_intents
 
 
@@ -78,3 +84,174 @@ def test_parameter_combinations():
     print(predictions)
 
 
+def test_train_contexts_in_parallel():
+    bot: Bot = create_bot_one_context_several_intents(
+        {'intent1': ['I love your dog', 'How cute are your dogs', 'dogs are amazing'],
+         'intent2': ['hello', 'how are you', 'greetings'],
+         'intent3': ['I prefer cats over dogs', 'I would prefer a cat', 'I love cats']})
+    context2: NLUContext = NLUContext('context2')
+    context2.add_intent_ref(bot.contexts[0].intent_refs[1])
+    context2.add_intent_ref(bot.contexts[0].intent_refs[2])
+    bot.add_context(context2)
+    bot.configuration.input_max_num_tokens = 7
+    bot.configuration.num_epochs = 100
+    bot.configuration.training_workers = 2
+    bot.configuration.training_intra_op_threads = 1
+    train(bot)
+
+    for context in bot.contexts:
+        assert context.nlp_model is not None
+        assert context.tokenizer is not None
+        assert len(context.training_sentences) == len(context.training_sequences)
+        assert len(context.training_sequences) == len(context.training_labels)
+        assert len(context.training_sequences[0]) == bot.configuration.input_max_num_tokens
+
+    prediction: PredictResult = predict(bot.contexts[0], 'hello!', bot.configuration)
+    scores: list[float] = [classification.score for classification in prediction.classifications]
+    print(f'Prediction for hello! is {scores}')
+    assert (np.argmax(scores) == 1)
+    prediction = predict(context2, 'I would love a cat', bot.configuration)
+    scores = [classification.score for classification in prediction.classifications]
+    print(f'Prediction for I would love a cat is {scores}')
+    assert (np.argmax(scores) == 1)
+
+
+def test_train_reuses_unchanged_contexts():
+    bot: Bot = create_bot_one_context_several_intents(
+        {'intent1': ['I love your dog', 'How cute are your dogs', 'dogs are amazing'],
+         'intent2': ['hello', 'how are you', 'greetings'],
+         'intent3': ['I prefer cats over dogs', 'I would prefer a cat', 'I love cats']})
+    context2: NLUContext = NLUContext('context2')
+    context2.add_intent_ref(bot.contexts[0].intent_refs[0])
+    context2.add_intent_ref(bot.contexts[0].intent_refs[1])
+    bot.add_context(context2)
+    bot.configuration.input_max_num_tokens = 7
+    bot.configuration.num_epochs = 20
+    assert train(bot) == {'retrained_contexts': ['context1', 'context2'], 'reused_contexts': []}
+    context2_model = context2.nlp_model
+
+    # The bot is initialized again with a new training sentence for an intent that is only in context1
+    botdto: BotDTO = bot_to_botdto(bot)
+    botdto.intents[2].training_sentences.append('cats are the best')
+    botdto_to_bot(botdto, bot)
+    assert train(bot) == {'retrained_contexts': ['context1'], 'reused_contexts': ['context2']}
+    assert bot.contexts[1] is not context2
+    assert bot.contexts[1].nlp_model is context2_model
+    prediction: PredictResult = predict(bot.contexts[1], 'hello!', bot.configuration)
+    assert [classification.intent for classification in prediction.classifications] == bot.contexts[1].get_intents()
+
+    # Prediction options do not require retraining, training ones do
+    bot.configuration.check_exact_prediction_match = False
+    assert train(bot) == {'retrained_contexts': [], 'reused_contexts': ['context1', 'context2']}
+    bot.configuration.num_epochs = 10
+    assert train(bot) == {'retrained_contexts': ['context1', 'context2'], 'reused_contexts': []}
+
+
+def test_incremental_training(caplog):
+    bot: Bot = create_bot_one_context_several_intents(
+        {'intent1': ['I love your dog', 'How cute are your dogs', 'dogs are amazing'],
+         'intent2': ['hello', 'how are you', 'greetings'],
+         'intent3': ['I prefer cats over dogs', 'I would prefer a cat', 'I love cats']})
+    bot.configuration.input_max_num_tokens = 7
+    bot.configuration.num_epochs = 200
+    train(bot)
+    context1: NLUContext = bot.contexts[0]
+    previous_word_index: dict[str, int] = dict(context1.tokenizer.word_index)
+
+    # A new intent (with new words) is added and the model is fine-tuned from the previous one
+    intent4: Intent = Intent('intent4', ['goodbye', 'see you later', 'bye bye'])
+    bot.add_intent(intent4)
+    context1.add_intent_ref(IntentReference('intent4', intent4))
+    bot.configuration.incremental_training = True
+    bot.configuration.incremental_epochs = 100
+    caplog.set_level(logging.INFO)
+    assert train(bot)['retrained_contexts'] == ['context1']
+    assert 'Training started from the previous model' in caplog.text
+
+    for word, index in previous_word_index.items():
+        assert context1.tokenizer.word_index[word] == index
+    new_words: set[str] = set(context1.tokenizer.word_index.keys()) - set(previous_word_index.keys())
+    assert len(new_words) > 0
+    assert all(context1.tokenizer.word_index[word] > len(previous_word_index) for word in new_words)
+    assert context1.trained_intent_names == ['intent1', 'intent2', 'intent3', 'intent4']
+    for sentence, intent_index in [('I love dogs', 0), ('hello!', 1), ('I love cats', 2), ('bye', 3)]:
+        prediction: PredictResult = predict(context1, sentence, bot.configuration)
+        scores: list[float] = [classification.score for classification in prediction.classifications]
+        print(f'Prediction for {sentence} is {scores}')
+        assert np.argmax(scores) == intent_index
+
+
+def test_early_stopping_and_time_budget():
+    bot: Bot = create_bot_one_context_several_intents(
+        {'intent1': ['I love your dog', 'How cute are your dogs', 'dogs are amazing'],
+         'intent2': ['hello', 'how are you', 'greetings'],
+         'intent3': ['I prefer cats over dogs', 'I would prefer a cat', 'I love cats']})
+    bot.configuration.input_max_num_tokens = 7
+    bot.configuration.num_epochs = 300
+    bot.configuration.early_stopping = True
+    bot.configuration.early_stopping_monitor = 'accuracy'
+    bot.configuration.early_stopping_patience = 5
+    train(bot)
+    context1: NLUContext = bot.contexts[0]
+    print(f'Early stopping after {context1.training_epochs} epochs and {context1.training_time} seconds')
+    assert context1.training_epochs < 300
+    prediction: PredictResult = predict(context1, 'hello!', bot.configuration)
+    assert np.argmax([classification.score for classification in prediction.classifications]) == 1
+
+    bot.configuration.early_stopping = False
+    bot.configuration.num_epochs = 100000
+    bot.configuration.training_time_budget = 1
+    train(bot)
+    print(f'Time budget reached after {context1.training_epochs} epochs and {context1.training_time} seconds')
+    assert context1.training_epochs < 100000
+    assert context1.training_time < 10
+
+
+def test_training_batches_and_prefetch():
+    bot: Bot = create_bot_one_context_several_intents(bot1_intents)
+    bot.configuration.input_max_num_tokens = 7
+    bot.configuration.num_epochs = 50
+    bot.configuration.training_batch_size = 4
+    train(bot)
+    context1: NLUContext = bot.contexts[0]
+    print(f'Batches of 4: {context1.training_samples_per_second} samples per second')
+    assert context1.training_samples_per_second > 0
+
+    bot.configuration.training_batch_size = 8
+    bot.configuration.training_prefetch = True
+    bot.configuration.training_data_threads = 2
+    train(bot)
+    print(f'Prefetched batches of 8: {context1.training_samples_per_second} samples per second')
+    assert context1.training_samples_per_second > 0
+    assert context1.training_epochs == 50
+    prediction: PredictResult = predict(context1, 'I love your dogs', bot.configuration)
+    assert np.argmax([classification.score for classification in prediction.classifications]) == 0
+
+
+def test_train_with_new_configuration():
+    bot: Bot = create_bot_one_context_several_intents(bot1_intents)
+    bot.configuration.input_max_num_tokens = 7
+    bot.configuration.num_epochs = 20
+    train(bot)
+    context1: NLUContext = bot.contexts[0]
+    previous_configuration: NlpConfiguration = bot.configuration
+    previous_model = context1.nlp_model
+
+    # A failed training keeps the previous configuration and models of the bot
+    configuration: NlpConfiguration = NlpConfiguration(input_max_num_tokens=9, embedding_dim=64, num_epochs=20)
+    configuration.activation_last_layer = 'not_an_activation'
+    try:
+        train(bot, configuration)
+        assert False
+    except ValueError:
+        pass
+    assert bot.configuration is previous_configuration
+    assert context1.nlp_model is previous_model
+    assert len(predict(context1, 'I love your dogs', bot.configuration).classifications) == len(bot1_intents)
+
+    # The configuration is only set once the contexts are trained with it
+    configuration.activation_last_layer = 'sigmoid'
+    assert train(bot, configuration)['retrained_contexts'] == ['context1']
+    assert bot.configuration is configuration
+    assert context1.nlp_model is not previous_model
+    assert context1.vectorizer.vectorize(['I love your dogs'], bot.configuration.input_max_num_tokens)[0].shape == (1, 9)
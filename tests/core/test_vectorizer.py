@@ -0,0 +1,40 @@
+import numpy as np
+import tensorflow as tf
+
+from tests.utils.intents_and_entities import bot1_intents
+from tests.utils.sample_bots import create_bot_one_context_several_intents
+from xatkitnlu.core.training import train
+from xatkitnlu.core.vectorizer import Vectorizer
+from xatkitnlu.dsl.dsl import Bot, NLUContext
+
+
+def keras_vectorize(tokenizer: tf.keras.preprocessing.text.Tokenizer, texts: list[str], maxlen: int):
+    sequences = tokenizer.texts_to_sequences(texts)
+    padded = tf.keras.preprocessing.sequence.pad_sequences(sequences, padding='post', maxlen=maxlen, truncating='post')
+    return padded, [all(i == 1 for i in sequence) for sequence in sequences]
+
+
+def test_vectorizer_parity_with_keras():
+    bot: Bot = create_bot_one_context_several_intents(bot1_intents)
+    bot.configuration.input_max_num_tokens = 7
+    bot.configuration.num_epochs = 5
+    train(bot)
+    context1: NLUContext = bot.contexts[0]
+    texts: list[str] = ['I love your dogs', 'HELLO, there!!', '', '  ', 'unknown words only', 'pizzas\tand\ndogs',
+                        'dogs dogs dogs dogs dogs dogs dogs dogs dogs unknown', 'unknown unknown unknown unknown unknown '
+                        'unknown unknown unknown dogs', "can't you #hash-tag", 'àccents ñ and émojis 🐶']
+    padded, oov_only = context1.vectorizer.vectorize(texts, bot.configuration.input_max_num_tokens)
+    keras_padded, keras_oov_only = keras_vectorize(context1.tokenizer, texts, bot.configuration.input_max_num_tokens)
+    print(padded)
+    assert padded.dtype == keras_padded.dtype
+    assert np.array_equal(padded, keras_padded)
+    assert oov_only.tolist() == keras_oov_only
+
+    # Words out of the num_words most frequent ones
+    tokenizer: tf.keras.preprocessing.text.Tokenizer = tf.keras.preprocessing.text.Tokenizer(num_words=3)
+    tokenizer.fit_on_texts(['a a a b b c', 'c d'])
+    padded, oov_only = Vectorizer.from_tokenizer(tokenizer).vectorize(['a b c d e', 'd'], 4)
+    keras_padded, keras_oov_only = keras_vectorize(tokenizer, ['a b c d e', 'd'], 4)
+    assert np.array_equal(padded, keras_padded)
+    assert oov_only.tolist() == keras_oov_only
+    assert Vectorizer.from_tokenizer(tokenizer).vectorize([], 4)[0].shape == (0, 4)
@@ -0,0 +1,13 @@
+from xatkitnlu.core.warmup import WarmUp
+
+
+def test_warmup():
+    warmup: WarmUp = WarmUp()
+    assert not warmup.is_ready()
+    warmup.start(['en', 'es', 'xx']).join()
+    stats: dict = warmup.stats()
+    print(stats)
+    assert warmup.is_ready()
+    assert set(stats['timings'].keys()) == {'en', 'es', 'xx'}
+    # Unknown languages do not prevent the server from being ready
+    assert list(stats['errors'].keys()) == ['xx']
@@ -1,4 +1,7 @@
-from xatkitnlu.dsl.dsl import NLUContext, Intent, CustomEntity, CustomEntityEntry, IntentParameter
+import uuid
+
+from xatkitnlu.dsl.dsl import NLUContext, Intent, CustomEntity, CustomEntityEntry, IntentParameter, Bot, \
+    IntentReference, PredictResult
 
 
 def test_nlucontext():
@@ -24,6 +27,37 @@ def test_intent_with_ner_initialization():
     assert intent.parameters[0].entity.entries[0].synonyms[0] == 'BCN'
 
 
+def test_bot_indexes():
+    bot: Bot = Bot(uuid.uuid4(), 'bot')
+    entity: CustomEntity = CustomEntity('city_entity', [CustomEntityEntry('Barcelona', ['BCN'])])
+    intent1: Intent = Intent('intent1', ['hello'])
+    intent2: Intent = Intent('intent2', ['bye'])
+    duplicated_intent: Intent = Intent('intent1', ['hi'])
+    context: NLUContext = NLUContext('context')
+    bot.add_entity(entity)
+    bot.add_intent(intent1)
+    bot.add_intent(intent2)
+    bot.add_intent(duplicated_intent)
+    context.add_intent_ref(IntentReference(intent2.name, intent2))
+    context.add_intent_ref(IntentReference(intent1.name, intent1))
+    bot.add_context(context)
+
+    assert bot.get_context('context') is context
+    assert bot.get_entity('city_entity') is entity
+    # The first element with a given name is returned, as when looking for it in the list
+    assert bot.get_intent('intent1') is intent1
+    assert bot.get_intent('intent3') is None
+    assert context.get_intent_index(intent2) == 0
+    assert context.get_intent_index(intent1) == 1
+    assert PredictResult(context).get_classification(intent1).intent is intent1
+
+    bot.clear()
+    assert len(bot.intents) == 0
+    assert bot.get_context('context') is None
+    assert bot.get_intent('intent1') is None
+    assert bot.get_entity('city_entity') is None
+
+
 # TODO: Test BaseEntity
 
 
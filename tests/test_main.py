@@ -1,8 +1,18 @@
+import threading
+import time
+
 from fastapi.testclient import TestClient
 
+from tests.utils.intents_and_entities import bot1_intents
+from tests.utils.sample_bots import create_bot_one_context_several_intents
+from xatkitnlu.core.jobs import TrainingJob
+from xatkitnlu.core.nlp_configuration import NlpConfiguration
+from xatkitnlu.dsl.dsl import Bot
 from xatkitnlu.dto.dto import BotDTO, NLUContextDTO, IntentDTO, ConfigurationDTO, PredictRequestDTO, EntityDTO, \
-    IntentParameterDTO, CustomEntityEntryDTO, IntentReferenceDTO
-from main import app, bots
+    IntentParameterDTO, CustomEntityEntryDTO, IntentReferenceDTO, PredictBatchRequestDTO, bot_to_botdto, \
+    BotRequestDTO
+import xatkitnlu.core.training as training
+from main import app, bots, residency, run_training_job, bot_initialize, bot_add
 
 client = TestClient(app)
 
@@ -10,7 +20,15 @@ cityentity: EntityDTO = EntityDTO(name="cityentity", entries=[CustomEntityEntryD
 
 intent1: IntentDTO = IntentDTO(name="intent1", training_sentences=['I love your dog', 'I love your cat', 'You really love my dog!'])
 intent2: IntentDTO = IntentDTO(name="intent2", training_sentences=['Hello', 'Hi'])
-intent3: IntentDTO = IntentDTO(name="intentcity", training_sentences=['Can I visit you in mycity', 'I would love to visit mycity'], parameters=[IntentParameterDTO(entity=cityentity, fragment="mycity", name="city")])
+intent3: IntentDTO = IntentDTO(name="intentcity", training_sentences=['Can I visit you in mycity', 'I would love to visit mycity'], parameters=[IntentParameterDTO(entity=cityentity.name, fragment="mycity", name="city")])
+
+
+def wait_for_job(job_id: str) -> dict:
+    response = client.get("/jobs/" + job_id + "/")
+    while response.json()['status'] in ['queued', 'running']:
+        time.sleep(0.1)
+        response = client.get("/jobs/" + job_id + "/")
+    return response.json()
 
 
 def test_server_up():
@@ -26,6 +44,11 @@ def test_hello_endpoint():
     assert response.json() == {"message": "Hello Jordi"}
 
 
+def test_job_not_found():
+    response = client.get("/jobs/nonexistentjob/")
+    assert response.status_code == 422
+
+
 def test_new_bot():
     bots.clear()
     assert "newbot" not in bots
@@ -46,8 +69,8 @@ def test_initialize_bot():
 
     initialization_data.intents.extend([intent1, intent2])
     context1: NLUContextDTO = NLUContextDTO(name="context1",
-                                            intent_refs=[IntentReferenceDTO(name=intent1.name, intent=intent1),
-                                                         IntentReferenceDTO(name=intent2.name, intent=intent2)])
+                                            intent_refs=[IntentReferenceDTO(name=intent1.name, intent=intent1.name),
+                                                         IntentReferenceDTO(name=intent2.name, intent=intent2.name)])
     initialization_data.contexts.append(context1)
     print(initialization_data)
     print(initialization_data.dict())
@@ -70,15 +93,18 @@ def test_train():
     initialization_data: BotDTO = BotDTO(name="newbot")
     initialization_data.intents.extend([intent1, intent2])
     context1: NLUContextDTO = NLUContextDTO(name="context1",
-                                            intent_refs=[IntentReferenceDTO(name=intent1.name, intent=intent1),
-                                                         IntentReferenceDTO(name=intent2.name, intent=intent2)])
+                                            intent_refs=[IntentReferenceDTO(name=intent1.name, intent=intent1.name),
+                                                         IntentReferenceDTO(name=intent2.name, intent=intent2.name)])
     initialization_data.contexts.append(context1)
 
     client.post("/bot/newbot/initialize/", initialization_data.json())
 
     configuration: ConfigurationDTO = ConfigurationDTO(input_max_num_tokens=10)
     response = client.post("/bot/newbot/train/", configuration.json())
-    assert response.status_code == 200
+    assert response.status_code == 202
+    job: dict = wait_for_job(response.json()['job_id'])
+    assert job['status'] == 'done'
+    assert job['run_time'] is not None
     assert bots["newbot"].configuration.input_max_num_tokens == 10
     assert bots["newbot"].configuration.oov_token == "<OOV>"
 
@@ -91,14 +117,15 @@ def test_predict():
     initialization_data: BotDTO = BotDTO(name="newbot")
     initialization_data.intents.extend([intent1, intent2])
     context1: NLUContextDTO = NLUContextDTO(name="context1",
-                                            intent_refs=[IntentReferenceDTO(name=intent1.name, intent=intent1),
-                                                         IntentReferenceDTO(name=intent2.name, intent=intent2)])
+                                            intent_refs=[IntentReferenceDTO(name=intent1.name, intent=intent1.name),
+                                                         IntentReferenceDTO(name=intent2.name, intent=intent2.name)])
     initialization_data.contexts.append(context1)
 
     client.post("/bot/newbot/initialize/", initialization_data.json())
 
     configuration: ConfigurationDTO = ConfigurationDTO(input_max_num_tokens=10, stemmer=True)
     response = client.post("/bot/newbot/train/", configuration.json())
+    wait_for_job(response.json()['job_id'])
 
     prediction_request: PredictRequestDTO = PredictRequestDTO(utterance="he loves dogs", context="context2")
     response = client.post("/bot/newbot/predict/", prediction_request.json())
@@ -117,20 +144,21 @@ def test_predict_with_ner():
     initialization_data.entities.extend([cityentity])
     initialization_data.intents.extend([intent1, intent2, intent3])
     context1: NLUContextDTO = NLUContextDTO(name="context1",
-                                            intent_refs=[IntentReferenceDTO(name=intent1.name, intent=intent1),
-                                                         IntentReferenceDTO(name=intent2.name, intent=intent2),
-                                                         IntentReferenceDTO(name=intent3.name, intent=intent3)])
+                                            intent_refs=[IntentReferenceDTO(name=intent1.name, intent=intent1.name),
+                                                         IntentReferenceDTO(name=intent2.name, intent=intent2.name),
+                                                         IntentReferenceDTO(name=intent3.name, intent=intent3.name)])
     initialization_data.contexts.append(context1)
 
     client.post("/bot/newbot/initialize/", initialization_data.json())
 
     configuration: ConfigurationDTO = ConfigurationDTO(input_max_num_tokens=10, stemmer=True)
     response = client.post("/bot/newbot/train/", configuration.json())
+    wait_for_job(response.json()['job_id'])
 
     prediction_request: PredictRequestDTO = PredictRequestDTO(utterance="I want to visit you in BCN", context="context1")
     response = client.post("/bot/newbot/predict/", prediction_request.json())
     assert response.status_code == 200
-    intent_index = [intent_ref.intent for intent_ref in context1.intent_refs].index(intent3)
+    intent_index = [intent_ref.intent for intent_ref in context1.intent_refs].index(intent3.name)
 
     assert len(response.json()['classifications'][0]['matched_parameters']) == 0
     assert len(response.json()['classifications'][1]['matched_parameters']) == 0
@@ -139,3 +167,158 @@ def test_predict_with_ner():
     assert response.json()['classifications'][intent_index]['matched_parameters'][0]['value'] == 'Barcelona'
 
     print(response.text)
+
+
+def test_predict_batch():
+    client.post("/bot/new/", json={"name": "newbot", "force_overwrite": "true"})
+
+    initialization_data: BotDTO = BotDTO(name="newbot")
+    initialization_data.entities.extend([cityentity])
+    initialization_data.intents.extend([intent1, intent2, intent3])
+    context1: NLUContextDTO = NLUContextDTO(name="context1",
+                                            intent_refs=[IntentReferenceDTO(name=intent1.name, intent=intent1.name),
+                                                         IntentReferenceDTO(name=intent2.name, intent=intent2.name),
+                                                         IntentReferenceDTO(name=intent3.name, intent=intent3.name)])
+    initialization_data.contexts.append(context1)
+
+    client.post("/bot/newbot/initialize/", initialization_data.json())
+
+    configuration: ConfigurationDTO = ConfigurationDTO(input_max_num_tokens=10, stemmer=True)
+    response = client.post("/bot/newbot/train/", configuration.json())
+    wait_for_job(response.json()['job_id'])
+
+    batch_request: PredictBatchRequestDTO = PredictBatchRequestDTO(
+        requests=[PredictRequestDTO(utterance="he loves dogs", context="context2")])
+    response = client.post("/bot/newbot/predict/batch/", batch_request.json())
+    assert response.status_code == 422
+
+    batch_request = PredictBatchRequestDTO(requests=[PredictRequestDTO(utterance="he loves dogs", context="context1"),
+                                                     PredictRequestDTO(utterance="I want to visit you in BCN", context="context1")])
+    response = client.post("/bot/newbot/predict/batch/", batch_request.json())
+    assert response.status_code == 200
+    results = response.json()['results']
+    assert len(results) == 2
+    for prediction_request, result in zip(batch_request.requests, results):
+        single_response = client.post("/bot/newbot/predict/", prediction_request.json())
+        assert [c['intent'] for c in single_response.json()['classifications']] == [c['intent'] for c in result['classifications']]
+    assert results[1]['classifications'][2]['matched_parameters'][0]['value'] == 'Barcelona'
+
+
+def test_initialize_and_train_reuses_evicted_contexts(tmp_path):
+    bot: Bot = create_bot_one_context_several_intents(bot1_intents)
+    bot.name = 'residencybot'
+    bot.configuration.input_max_num_tokens = 7
+    bot.configuration.num_epochs = 20
+    bots[bot.name] = bot
+    # Every context that is not in use is evicted
+    previous_budget, previous_path = residency.memory_budget, residency.eviction_path
+    residency.memory_budget, residency.eviction_path = 1, str(tmp_path)
+    try:
+        assert run_training_job(TrainingJob(bot.name, bot.configuration))['retrained_contexts'] == ['context1']
+        assert not bot.trained_contexts['context1'].is_trained()
+
+        # The bot is initialized again with the same data, so the evicted model is reloaded and reused
+        bot_initialize(bot.name, bot_to_botdto(bot))
+        result: dict = run_training_job(TrainingJob(bot.name, bot.configuration))
+        assert result['retrained_contexts'] == []
+        assert result['reused_contexts'] == ['context1']
+
+        # A failed training leaves the evicted contexts tracked, so they can still be reloaded
+        configuration: NlpConfiguration = NlpConfiguration(input_max_num_tokens=7, num_epochs=20, embedding_dim=64)
+        configuration.activation_last_layer = 'not_an_activation'
+        try:
+            run_training_job(TrainingJob(bot.name, configuration))
+            assert False
+        except ValueError:
+            pass
+        assert bot.configuration is not configuration
+        assert residency.stats()['evicted_contexts'] >= 1
+        with residency.use(bot.contexts):
+            assert bot.contexts[0].is_trained()
+    finally:
+        residency.forget(bot.name)
+        residency.memory_budget, residency.eviction_path = previous_budget, previous_path
+        bots.pop(bot.name)
+
+
+def test_initialize_while_training(monkeypatch):
+    bot: Bot = create_bot_one_context_several_intents(bot1_intents)
+    bot.name = 'initializedwhiletrainingbot'
+    bot.configuration.input_max_num_tokens = 7
+    bot.configuration.num_epochs = 20
+    bots[bot.name] = bot
+    training_started, initialized = threading.Event(), threading.Event()
+    fit_context_model = training.fit_context_model
+
+    def fit_context_model_after_initialization(*args, **kwargs):
+        training_started.set()
+        initialized.wait(timeout=60)
+        return fit_context_model(*args, **kwargs)
+
+    monkeypatch.setattr(training, 'fit_context_model', fit_context_model_after_initialization)
+    results: list[dict] = []
+    job_thread: threading.Thread = threading.Thread(
+        target=lambda: results.append(run_training_job(TrainingJob(bot.name, bot.configuration))))
+    try:
+        job_thread.start()
+        assert training_started.wait(timeout=60)
+        # The bot is initialized again with the same data while its previous contexts are being trained
+        bot_initialize(bot.name, bot_to_botdto(bot))
+        initialized.set()
+        job_thread.join()
+        assert results[0]['retrained_contexts'] == ['context1']
+        assert not bot.contexts[0].is_trained()
+        assert bot.trained_contexts['context1'] is not bot.contexts[0]
+        assert bot.trained_contexts['context1'].is_trained()
+
+        # The next training reuses the model trained for the previous contexts
+        result: dict = run_training_job(TrainingJob(bot.name, bot.configuration))
+        assert result['retrained_contexts'] == []
+        assert result['reused_contexts'] == ['context1']
+        assert bot.contexts[0].is_trained()
+    finally:
+        initialized.set()
+        job_thread.join()
+        residency.forget(bot.name)
+        bots.pop(bot.name)
+
+
+def test_overwrite_while_training(monkeypatch):
+    bot: Bot = create_bot_one_context_several_intents(bot1_intents)
+    bot.name = 'overwrittenwhiletrainingbot'
+    bot.configuration.input_max_num_tokens = 7
+    bot.configuration.num_epochs = 20
+    bots[bot.name] = bot
+    training_started, overwritten = threading.Event(), threading.Event()
+    fit_context_model = training.fit_context_model
+
+    def fit_context_model_after_overwrite(*args, **kwargs):
+        training_started.set()
+        overwritten.wait(timeout=60)
+        return fit_context_model(*args, **kwargs)
+
+    monkeypatch.setattr(training, 'fit_context_model', fit_context_model_after_overwrite)
+    errors: list[Exception] = []
+
+    def run_job():
+        try:
+            run_training_job(TrainingJob(bot.name, bot.configuration))
+        except ValueError as e:
+            errors.append(e)
+
+    job_thread: threading.Thread = threading.Thread(target=run_job)
+    try:
+        job_thread.start()
+        assert training_started.wait(timeout=60)
+        bot_add(BotRequestDTO(name=bot.name, force_overwrite=True))
+        overwritten.set()
+        job_thread.join()
+        # The result of the training is discarded, the replaced bot is not tracked again
+        assert str(errors[0]) == 'Bot was replaced while it was being trained'
+        assert bots[bot.name] is not bot
+        assert residency.bot_contexts.get(bot.name) is None
+    finally:
+        overwritten.set()
+        job_thread.join()
+        residency.forget(bot.name)
+        bots.pop(bot.name)
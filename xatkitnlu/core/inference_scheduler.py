@@ -0,0 +1,148 @@
+import threading
+import time
+from typing import Callable, Hashable
+
+import numpy as np
+
+
+class Histogram:
+    """Counts observed values in buckets, each bucket counting the values up to its bound (and above the previous one)"""
+
+    def __init__(self, bounds: list[float]):
+        self.bounds: list[float] = bounds
+        self.counts: list[int] = [0] * (len(bounds) + 1)  # the last bucket counts the values above the last bound
+        self.count: int = 0
+        self.sum: float = 0
+
+    def observe(self, value: float):
+        bucket: int = 0
+        while bucket < len(self.bounds) and value > self.bounds[bucket]:
+            bucket += 1
+        self.counts[bucket] += 1
+        self.count += 1
+        self.sum += value
+
+    def to_dict(self) -> dict[str, object]:
+        buckets: dict[str, int] = {f'{bound:g}': count for bound, count in zip(self.bounds, self.counts)}
+        buckets['inf'] = self.counts[-1]
+        return {'buckets': buckets, 'count': self.count, 'avg': self.sum / self.count if self.count > 0 else None}
+
+
+class _PendingRows:
+    """Rows waiting in a queue for a batched model invocation"""
+
+    def __init__(self, rows: np.ndarray):
+        self.rows: np.ndarray = rows
+        self.enqueued_at: float = time.monotonic()
+        self.result: np.ndarray = None
+        self.error: Exception = None
+        self.leader: bool = False  # whether the thread that enqueued the rows has to flush the queue
+        self.ready: threading.Event = threading.Event()  # set when the result is available or the rows become leader
+
+
+class _Queue:
+
+    def __init__(self, lock: threading.Lock):
+        self.items: list[_PendingRows] = []
+        self.num_rows: int = 0
+        self.condition: threading.Condition = threading.Condition(lock)
+
+
+class InferenceScheduler:
+    """Groups the model invocations of concurrent predictions on the same context into a single batched invocation.
+
+    There is no dispatcher thread: the first caller finding an empty queue becomes its leader, waits until the queue
+    has max_batch_size rows or its own rows have waited max_wait_ms, and runs the model for everything in the queue on
+    behalf of the other callers. If rows are left in the queue (i.e. the batch was full), the first of them becomes the
+    next leader
+    """
+
+    def __init__(self, max_batch_size: int = 1, max_wait_ms: float = 0):
+        self.lock: threading.Lock = threading.Lock()
+        self.queues: dict[Hashable, _Queue] = {}
+        self.configure(max_batch_size, max_wait_ms)
+
+    def configure(self, max_batch_size: int, max_wait_ms: float):
+        with self.lock:
+            self.max_batch_size: int = max_batch_size  # max number of rows of a batch (1 disables batching)
+            self.max_wait_ms: float = max_wait_ms  # max time rows wait for other rows before the model is run
+            self.batch_sizes: Histogram = Histogram([1, 2, 4, 8, 16, 32, 64, 128, 256])
+            self.queue_waits_ms: Histogram = Histogram([0.1, 0.5, 1, 2, 5, 10, 20, 50, 100])
+
+    def run(self, key: Hashable, rows: np.ndarray, run_model: Callable[[np.ndarray], np.ndarray]) -> np.ndarray:
+        """Returns run_model(rows), running the model once for all the rows of the same key enqueued in the meantime"""
+        if self.max_batch_size <= 1 or self.max_wait_ms <= 0:
+            result: np.ndarray = run_model(rows)
+            with self.lock:
+                self.batch_sizes.observe(len(rows))
+                self.queue_waits_ms.observe(0)
+            return result
+
+        pending: _PendingRows = _PendingRows(rows)
+        with self.lock:
+            queue: _Queue = self.queues.get(key)
+            if queue is None:
+                queue = _Queue(self.lock)
+                self.queues[key] = queue
+            queue.items.append(pending)
+            queue.num_rows += len(rows)
+            if len(queue.items) == 1:
+                pending.leader = True
+            elif queue.num_rows >= self.max_batch_size:
+                queue.condition.notify_all()
+        if not pending.leader:
+            pending.ready.wait()
+        if pending.leader:
+            self.__flush(key, queue, pending, run_model)
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def stats(self) -> dict[str, object]:
+        with self.lock:
+            return {'max_batch_size': self.max_batch_size,
+                    'max_wait_ms': self.max_wait_ms,
+                    'batch_size': self.batch_sizes.to_dict(),
+                    'queue_wait_ms': self.queue_waits_ms.to_dict()}
+
+    def __flush(self, key: Hashable, queue: _Queue, leader: _PendingRows, run_model: Callable[[np.ndarray], np.ndarray]):
+        with self.lock:
+            deadline: float = leader.enqueued_at + self.max_wait_ms / 1000
+            while queue.num_rows < self.max_batch_size:
+                remaining: float = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                queue.condition.wait(remaining)
+            # The leader rows always go in the batch, even if they are more than max_batch_size on their own
+            batch: list[_PendingRows] = [queue.items.pop(0)]
+            batch_rows: int = len(leader.rows)
+            while len(queue.items) > 0 and batch_rows + len(queue.items[0].rows) <= self.max_batch_size:
+                batch_rows += len(queue.items[0].rows)
+                batch.append(queue.items.pop(0))
+            queue.num_rows -= batch_rows
+            if len(queue.items) > 0:
+                queue.items[0].leader = True
+                queue.items[0].ready.set()
+            else:
+                self.queues.pop(key)
+            now: float = time.monotonic()
+            self.batch_sizes.observe(batch_rows)
+            for pending in batch:
+                self.queue_waits_ms.observe(1000 * (now - pending.enqueued_at))
+
+        try:
+            result: np.ndarray = run_model(np.concatenate([pending.rows for pending in batch]))
+            start: int = 0
+            for pending in batch:
+                pending.result = result[start:start + len(pending.rows)]
+                start += len(pending.rows)
+        except Exception as e:
+            for pending in batch:
+                pending.error = e
+        finally:
+            # Even if the leader is interrupted (e.g. KeyboardInterrupt), the other callers must not wait forever
+            for pending in batch:
+                if pending.result is None and pending.error is None:
+                    pending.error = RuntimeError('Batched model invocation interrupted')
+                if pending is not leader:
+                    pending.ready.set()
@@ -0,0 +1,139 @@
+import logging
+import threading
+import time
+import uuid
+from collections import deque, OrderedDict
+from typing import Callable
+
+from xatkitnlu.core.nlp_configuration import NlpConfiguration
+
+
+class JobStatus:
+    """ The enumeration of the states a training job goes through """
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+
+
+class TrainingJob:
+    """A request to train a bot, run in the background by the TrainingJobScheduler"""
+
+    def __init__(self, bot_name: str, configuration: NlpConfiguration):
+        self.job_id: str = str(uuid.uuid4())
+        self.bot_name: str = bot_name
+        self.configuration: NlpConfiguration = configuration  # configuration of the last request merged into the job
+        self.status: str = JobStatus.QUEUED
+        self.requests: int = 1  # number of train requests merged into this job
+        self.created_at: float = time.time()
+        self.started_at: float = None
+        self.finished_at: float = None
+        self.error: str = None
+        self.result: object = None  # whatever the job function returned
+        self.finished: threading.Event = threading.Event()
+
+    def to_dict(self) -> dict[str, object]:
+        queue_time: float = None
+        run_time: float = None
+        if self.started_at is not None:
+            queue_time = self.started_at - self.created_at
+            if self.finished_at is not None:
+                run_time = self.finished_at - self.started_at
+        return {'job_id': self.job_id,
+                'bot': self.bot_name,
+                'status': self.status,
+                'requests': self.requests,
+                'created_at': self.created_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+                'queue_time': queue_time,
+                'run_time': run_time,
+                'error': self.error,
+                'result': self.result}
+
+
+class TrainingJobScheduler:
+    """Runs training jobs one after the other in a background thread.
+
+    There is a single worker thread for all the bots, so a training job waits for the jobs of other bots queued before
+    it (the contexts of a bot can still be trained in parallel, see NlpConfiguration.training_workers).
+
+    A train request for a bot that already has a queued (not yet running) job is merged into that job instead of
+    creating a new one
+    """
+
+    def __init__(self, run_job: Callable[[TrainingJob], object], max_finished_jobs: int = 1000):
+        self.run_job: Callable[[TrainingJob], object] = run_job
+        self.max_finished_jobs: int = max_finished_jobs  # finished jobs kept to be queried, the oldest are forgotten
+        self.jobs: OrderedDict[str, TrainingJob] = OrderedDict()
+        self.queue: deque[TrainingJob] = deque()
+        self.queued_jobs_by_bot: dict[str, TrainingJob] = {}
+        self.condition: threading.Condition = threading.Condition()
+        self.worker: threading.Thread = None
+
+    def submit(self, bot_name: str, configuration: NlpConfiguration) -> TrainingJob:
+        with self.condition:
+            job: TrainingJob = self.queued_jobs_by_bot.get(bot_name)
+            if job is not None:
+                # The last configuration wins, as it would if the jobs were run one after the other
+                job.configuration = configuration
+                job.requests += 1
+                return job
+            job = TrainingJob(bot_name, configuration)
+            self.jobs[job.job_id] = job
+            self.queue.append(job)
+            self.queued_jobs_by_bot[bot_name] = job
+            if self.worker is None:
+                self.worker = threading.Thread(target=self.__work, name='training-jobs', daemon=True)
+                self.worker.start()
+            self.condition.notify()
+            return job
+
+    def cancel(self, bot_name: str) -> TrainingJob:
+        """Cancels the queued job of a bot, if any (a running job cannot be interrupted, it is up to the job function
+        to discard its result)"""
+        with self.condition:
+            job: TrainingJob = self.queued_jobs_by_bot.pop(bot_name, None)
+            if job is None:
+                return None
+            self.queue.remove(job)
+            job.status = JobStatus.CANCELLED
+            job.finished_at = time.time()
+            job.finished.set()
+        self.__forget_finished_jobs()
+        return job
+
+    def get_job(self, job_id: str) -> TrainingJob:
+        with self.condition:
+            return self.jobs.get(job_id)
+
+    def __work(self):
+        while True:
+            with self.condition:
+                while len(self.queue) == 0:
+                    self.condition.wait()
+                job: TrainingJob = self.queue.popleft()
+                self.queued_jobs_by_bot.pop(job.bot_name)
+                job.status = JobStatus.RUNNING
+                job.started_at = time.time()
+            try:
+                result = self.run_job(job)
+                job.result = result
+                job.status = JobStatus.DONE
+            except BaseException as e:
+                # Not only Exception (e.g. a SystemExit raised by a library), as the worker must outlive any job
+                logging.exception(f'Training job {job.job_id} for bot {job.bot_name} failed')
+                job.error = str(e) or repr(e)
+                job.status = JobStatus.FAILED
+            finally:
+                job.finished_at = time.time()
+                job.finished.set()
+                self.__forget_finished_jobs()
+
+    def __forget_finished_jobs(self):
+        with self.condition:
+            finished_jobs: list[str] = [job_id for job_id, job in self.jobs.items() if job.finished.is_set()]
+            for job_id in finished_jobs[:max(0, len(finished_jobs) - self.max_finished_jobs)]:
+                self.jobs.pop(job_id)
@@ -0,0 +1,55 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable
+
+
+class LRUCache:
+    """Thread-safe bounded cache evicting the least recently used (or expired) entries, counting its hits and misses"""
+
+    def __init__(self, max_size: int = 0):
+        self.lock: threading.Lock = threading.Lock()
+        self.entries: OrderedDict[Hashable, tuple[object, float]] = OrderedDict()  # key: (value, expiration time)
+        self.configure(max_size)
+
+    def configure(self, max_size: int):
+        with self.lock:
+            self.max_size: int = max_size  # max number of entries (0 disables the cache)
+            self.entries.clear()
+            self.hits: int = 0
+            self.misses: int = 0
+
+    def get(self, key: Hashable) -> object:
+        """Returns the cached value of the key, or None if it is not cached"""
+        if self.max_size <= 0:
+            return None
+        with self.lock:
+            entry: tuple[object, float] = self.entries.get(key)
+            if entry is not None and entry[1] is not None and entry[1] < time.monotonic():
+                self.entries.pop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: Hashable, value: object, ttl: float = 0):
+        """Caches the value of the key for ttl seconds (0 means until it is evicted)"""
+        if self.max_size <= 0:
+            return
+        expiration: float = time.monotonic() + ttl if ttl > 0 else None
+        with self.lock:
+            self.entries[key] = (value, expiration)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def stats(self) -> dict[str, object]:
+        with self.lock:
+            return {'size': len(self.entries),
+                    'max_size': self.max_size,
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'hit_rate': self.hits / (self.hits + self.misses) if self.hits + self.misses > 0 else None}
@@ -0,0 +1,169 @@
+import json
+import logging
+import os
+import shutil
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, unquote
+
+import numpy as np
+import tensorflow as tf
+
+from xatkitnlu.core.nlp_configuration import NlpConfiguration
+from xatkitnlu.core.prediction_cache import new_model_generation
+from xatkitnlu.core.training import set_context_model, build_exact_match_index, context_fingerprint, \
+    preprocess_entities, set_trained_contexts
+from xatkitnlu.core.vectorizer import Vectorizer
+from xatkitnlu.dsl.dsl import Bot, NLUContext
+from xatkitnlu.dto.dto import BotDTO, ConfigurationDTO, bot_to_botdto, botdto_to_bot, \
+    configuration_to_configurationdto, configurationdto_to_configuration
+
+BOT_FILE = 'bot.json'
+CONTEXTS_DIR = 'contexts'
+TOKENIZER_FILE = 'tokenizer.json'
+WEIGHTS_FILE = 'weights.npz'
+TRAINING_DATA_FILE = 'training_data.npz'
+TRAINING_SENTENCES_FILE = 'training_sentences.json'
+TRAINING_INFO_FILE = 'training_info.json'
+
+
+class ModelStore:
+    """Persists trained bots in a local directory, so they can be restored without training them again.
+
+    Each bot is stored in its own directory containing the bot definition and configuration (bot.json) and, for each
+    trained context, the tokenizer, the model weights and the training data
+    """
+
+    def __init__(self, path: str):
+        self.path: str = path
+        os.makedirs(path, exist_ok=True)
+
+    def save_bot(self, bot: Bot):
+        bot_dir: str = self.__bot_dir(bot.name)
+        # The bot is written in a temporary directory first, so a crash never leaves a half written bot behind
+        tmp_dir: str = bot_dir + '.tmp-' + uuid.uuid4().hex
+        os.makedirs(os.path.join(tmp_dir, CONTEXTS_DIR))
+        with open(os.path.join(tmp_dir, BOT_FILE), 'w', encoding='utf-8') as f:
+            json.dump({'bot_id': str(bot.bot_id),
+                       'bot': bot_to_botdto(bot).dict(),
+                       'configuration': configuration_to_configurationdto(bot.configuration).dict()}, f)
+        for i, context in enumerate(bot.contexts):
+            if context.is_trained():
+                save_context(context, os.path.join(tmp_dir, CONTEXTS_DIR, str(i)))
+        old_dir: str = None
+        if os.path.exists(bot_dir):
+            old_dir = bot_dir + '.old-' + uuid.uuid4().hex
+            os.replace(bot_dir, old_dir)
+        os.replace(tmp_dir, bot_dir)
+        if old_dir is not None:
+            shutil.rmtree(old_dir)
+        logging.info(f'Bot {bot.name} saved in {bot_dir}')
+
+    def delete_bot(self, name: str):
+        bot_dir: str = self.__bot_dir(name)
+        if os.path.exists(bot_dir):
+            shutil.rmtree(bot_dir)
+
+    def get_bot_names(self) -> list[str]:
+        # Escaped names never contain a '.', so this skips the temporary directories of unfinished saves
+        return [unquote(dir_name) for dir_name in sorted(os.listdir(self.path))
+                if '.' not in dir_name and os.path.isfile(os.path.join(self.path, dir_name, BOT_FILE))]
+
+    def load_bot(self, name: str) -> Bot:
+        bot_dir: str = self.__bot_dir(name)
+        with open(os.path.join(bot_dir, BOT_FILE), 'r', encoding='utf-8') as f:
+            stored_bot: dict = json.load(f)
+        bot: Bot = Bot(uuid.UUID(stored_bot['bot_id']), name)
+        botdto_to_bot(BotDTO(**stored_bot['bot']), bot)
+        bot.configuration = configurationdto_to_configuration(ConfigurationDTO(**stored_bot['configuration']))
+        for i, context in enumerate(bot.contexts):
+            context_dir: str = os.path.join(bot_dir, CONTEXTS_DIR, str(i))
+            if os.path.exists(context_dir):
+                load_context(context, context_dir, bot.configuration)
+        preprocess_entities(bot)
+        # The stored bot is the one the contexts were trained with, so their fingerprints can be computed again
+        for context in bot.contexts:
+            if context.is_trained():
+                context.fingerprint = context_fingerprint(context, bot.configuration)
+        set_trained_contexts(bot)
+        return bot
+
+    def load_bots(self, max_workers: int = 4) -> dict[str, Bot]:
+        """Loads all the stored bots, several of them at the same time"""
+        bots: dict[str, Bot] = {}
+        names: list[str] = self.get_bot_names()
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            for name, bot in zip(names, executor.map(self.__load_bot_or_none, names)):
+                if bot is not None:
+                    bots[name] = bot
+        logging.info(f'{len(bots)} bots loaded from {self.path}')
+        return bots
+
+    def __load_bot_or_none(self, name: str) -> Bot:
+        # A corrupted bot must not prevent the rest of bots from being loaded
+        try:
+            return self.load_bot(name)
+        except Exception:
+            logging.exception(f'Bot {name} could not be loaded from {self.path}')
+            return None
+
+    def __bot_dir(self, name: str) -> str:
+        return os.path.join(self.path, quote(name, safe='').replace('.', '%2E'))
+
+
+def save_context(context: NLUContext, context_dir: str):
+    """Writes the trained model of a context (tokenizer, weights and training data) in the given directory"""
+    os.makedirs(context_dir, exist_ok=True)
+    with open(os.path.join(context_dir, TOKENIZER_FILE), 'w', encoding='utf-8') as f:
+        f.write(context.tokenizer.to_json())
+    np.savez(os.path.join(context_dir, WEIGHTS_FILE), *context.get_model_weights())
+    np.savez(os.path.join(context_dir, TRAINING_DATA_FILE),
+             training_sequences=np.asarray(context.training_sequences),
+             training_labels=np.asarray(context.training_labels),
+             exact_match_sequences=np.array([np.frombuffer(sequence, dtype=np.int32)
+                                             for sequence in context.exact_match_index.keys()], dtype=np.int32),
+             exact_match_labels=np.array(list(context.exact_match_index.values()), dtype=np.int32))
+    with open(os.path.join(context_dir, TRAINING_SENTENCES_FILE), 'w', encoding='utf-8') as f:
+        json.dump(context.training_sentences, f)
+    with open(os.path.join(context_dir, TRAINING_INFO_FILE), 'w', encoding='utf-8') as f:
+        json.dump({'epochs': context.training_epochs,
+                   'time': context.training_time,
+                   'samples_per_second': context.training_samples_per_second,
+                   'quantization_report': context.quantization_report}, f)
+
+
+def load_context(context: NLUContext, context_dir: str, configuration: NlpConfiguration):
+    """Restores in the given context the trained model written by save_context"""
+    with open(os.path.join(context_dir, TOKENIZER_FILE), 'r', encoding='utf-8') as f:
+        tokenizer = tf.keras.preprocessing.text.tokenizer_from_json(f.read())
+    with np.load(os.path.join(context_dir, WEIGHTS_FILE)) as weights_file:
+        weights: list[np.ndarray] = [weights_file[f'arr_{i}'] for i in range(len(weights_file.files))]
+    with np.load(os.path.join(context_dir, TRAINING_DATA_FILE)) as training_data_file:
+        training_sequences: np.ndarray = training_data_file['training_sequences']
+        training_labels: list[int] = training_data_file['training_labels'].tolist()
+        if 'exact_match_sequences' in training_data_file.files:
+            exact_match_index: dict[bytes, int] = build_exact_match_index(training_data_file['exact_match_sequences'],
+                                                                          training_data_file['exact_match_labels'].tolist())
+        else:
+            # Stored before the index existed
+            exact_match_index: dict[bytes, int] = build_exact_match_index(training_sequences, training_labels)
+    with open(os.path.join(context_dir, TRAINING_SENTENCES_FILE), 'r', encoding='utf-8') as f:
+        training_sentences: list[str] = json.load(f)
+    training_info: dict[str, object] = {}
+    if os.path.exists(os.path.join(context_dir, TRAINING_INFO_FILE)):
+        with open(os.path.join(context_dir, TRAINING_INFO_FILE), 'r', encoding='utf-8') as f:
+            training_info = json.load(f)
+    context.tokenizer = tokenizer
+    context.vectorizer = Vectorizer.from_tokenizer(tokenizer)
+    context.training_sentences = training_sentences
+    context.training_sequences = training_sequences if configuration.keep_training_sequences else []
+    context.training_labels = training_labels
+    context.exact_match_index = exact_match_index
+    set_context_model(context, weights, configuration)
+    context.training_configuration = configuration
+    context.trained_intent_names = [intent_ref.intent.name for intent_ref in context.intent_refs]
+    context.training_epochs = training_info.get('epochs')
+    context.training_time = training_info.get('time')
+    context.training_samples_per_second = training_info.get('samples_per_second')
+    context.quantization_report = training_info.get('quantization_report')
+    context.model_generation = new_model_generation()
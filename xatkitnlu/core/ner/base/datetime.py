@@ -1,6 +1,8 @@
+import functools
 from datetime import datetime
 from zoneinfo import ZoneInfo
 
+from dateparser.conf import Settings, settings as default_settings
 from dateparser.search import search_dates
 
 from xatkitnlu.utils.utils import replace_value_in_sentence
@@ -10,6 +12,10 @@ from xatkitnlu.core.nlp_configuration import NlpConfiguration
 relative_time_parser = ['relative-time']
 date_parsers = ['custom-formats', 'absolute-time']
 
+# Relative bases used to find out which datetime components are given in a sentence: the ones that are the same in both
+test_datetime_1 = datetime(year=2001, month=1, day=1, hour=1, minute=1, second=1)
+test_datetime_2 = datetime(year=2002, month=2, day=2, hour=2, minute=2, second=2)
+
 
 def ner_datetime(sentence: str, configuration: NlpConfiguration) -> tuple[str, str, dict]:
     matched_frag: str = None
@@ -46,19 +52,24 @@ def ner_datetime(sentence: str, configuration: NlpConfiguration) -> tuple[str, s
 
 
 def set_datetime_params_info_datetime(sentence: str, configuration: NlpConfiguration) -> dict[str, bool]:
-    test_datetime_1 = datetime(year=2001, month=1, day=1, hour=1, minute=1, second=1)
-    test_datetime_2 = datetime(year=2002, month=2, day=2, hour=2, minute=2, second=2)
-    dt1: datetime = search_datetimes(sentence, test_datetime_1, configuration.country, date_parsers)[0][1]
-    dt2: datetime = search_datetimes(sentence, test_datetime_2, configuration.country, date_parsers)[0][1]
+    return set_datetime_params_info(*given_datetime_components(sentence, configuration.country))
+
+
+@functools.lru_cache(maxsize=4096)
+def given_datetime_components(sentence: str, language: str) -> tuple[bool, bool, bool, bool, bool, bool]:
+    # The sentence is parsed with fixed relative bases, so the result only depends on the sentence and can be reused
+    # every time the same sentence is predicted
+    dt1: datetime = search_datetimes(sentence, test_datetime_1, language, date_parsers)[0][1]
+    dt2: datetime = search_datetimes(sentence, test_datetime_2, language, date_parsers)[0][1]
     # Since sometimes the time is set to 00:00:00 by default, we consider that if this happens, it is because the time
     # is not explicitly said in the sentence
     time_is_zero = dt1.hour == 0 and dt1.minute == 0 and dt1.second == 0 and dt2.hour == 0 and dt2.minute == 0 and dt2.second == 0
-    return set_datetime_params_info(dt1.year == dt2.year,
-                                    dt1.month == dt2.month,
-                                    dt1.day == dt2.day,
-                                    dt1.hour == dt2.hour and not time_is_zero,
-                                    dt1.minute == dt2.minute and not time_is_zero,
-                                    dt1.second == dt2.second and not time_is_zero)
+    return (dt1.year == dt2.year,
+            dt1.month == dt2.month,
+            dt1.day == dt2.day,
+            dt1.hour == dt2.hour and not time_is_zero,
+            dt1.minute == dt2.minute and not time_is_zero,
+            dt1.second == dt2.second and not time_is_zero)
 
 
 def set_datetime_params_info_relative_time(date_text: str, configuration: NlpConfiguration) -> dict[str, bool]:
@@ -122,6 +133,25 @@ def set_datetime_params_info(year: bool, month: bool, day: bool, hour: bool, min
 
 
 def search_datetimes(sentence: str, relative_base: datetime, language: str, parsers: list[str]) -> list[tuple[str, datetime]]:
+    matches: list[tuple[str, datetime]] = search_dates(sentence,
+                                                       languages=[language],
+                                                       settings=search_settings(language, relative_base, tuple(parsers)))
+    return matches
+
+
+def search_settings(language: str, relative_base: datetime, parsers: tuple[str, ...]) -> Settings:
+    # A copy of the static settings with the relative base. Not built with Settings.replace, which registers (and
+    # keeps forever) a new Settings instance for each relative base, and makes dateparser build its dictionary caches
+    # again, as they are keyed by the settings instance. The copy keeps the registry key of the static settings
+    settings: Settings = object.__new__(Settings)
+    settings.__dict__.update(static_search_settings(language, parsers).__dict__)
+    settings.RELATIVE_BASE = relative_base
+    return settings
+
+
+@functools.lru_cache(maxsize=None)
+def static_search_settings(language: str, parsers: tuple[str, ...]) -> Settings:
+    # Built as search_dates does with a settings dict, but only once for each language and parsers
     date_order = 'MDY'
     if language == 'es' or language == 'ca':
         date_order = 'DMY'
@@ -129,23 +159,27 @@ def search_datetimes(sentence: str, relative_base: datetime, language: str, pars
     sett = {'PREFER_DAY_OF_MONTH': 'current', # current / first / last
             'PREFER_DATES_FROM': 'current_period', # current_period, past, future
             'RETURN_AS_TIMEZONE_AWARE': True,
-            'RELATIVE_BASE': relative_base,
             'DATE_ORDER': date_order,
-            'PARSERS': parsers}
-    matches: list[tuple[str, datetime]] = search_dates(sentence,
-                                                       languages=[language],
-                                                       settings=sett)
-    return matches
+            'PARSERS': list(parsers)}
+    return default_settings.replace(mod_settings=sett, **sett)
+
+
+datetime_aux_conjunctions = {
+    'en': [' and ', ' annd '],
+    'ca': [' i ', ' ii '],
+    'es': [' y ', ' yy ']
+}
 
 
 def datetime_aux(order: bool, sentence: str, configuration: NlpConfiguration) -> str:
-    d = {
-        'en': [' and ', ' annd '],
-        'ca': [' i ', ' ii '],
-        'es': [' y ', ' yy ']
-    }
+    d = datetime_aux_conjunctions
     if order:
         return sentence.replace(d[configuration.country][0], d[configuration.country][1])
     else:
         return sentence.replace(d[configuration.country][1], d[configuration.country][0])
 
+
+def datetime_aux_applies(sentence: str, configuration: NlpConfiguration) -> bool:
+    # Otherwise datetime_aux(True, ...) does not change the sentence, and nothing would be found again
+    return datetime_aux_conjunctions[configuration.country][0] in sentence
+
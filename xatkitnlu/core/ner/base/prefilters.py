@@ -0,0 +1,113 @@
+import functools
+import re
+
+from dateparser.languages.loader import default_loader
+from text_to_num.lang import LANG
+
+# Words of a sentence, lowercased (hyphenated and apostrophized words are split in their parts)
+word_regex = re.compile(r'\w+')
+
+# Entries of the dateparser locales with the words that make a datetime by themselves (e.g. 'may', 'monday', 'week')
+datetime_locale_entries: list[str] = ['january', 'february', 'march', 'april', 'may', 'june', 'july', 'august',
+                                      'september', 'october', 'november', 'december', 'monday', 'tuesday', 'wednesday',
+                                      'thursday', 'friday', 'saturday', 'sunday', 'decade', 'year', 'month', 'week',
+                                      'day', 'hour', 'minute', 'second']
+# Entries of the dateparser locales with the words that only make a time after a number (e.g. 'ten am')
+meridian_locale_entries: list[str] = ['am', 'pm']
+
+
+class DatetimeWords:
+    """Words of the dateparser locale of a language that can make a datetime in a sentence without any digit"""
+
+    def __init__(self, words: frozenset[str], meridian_words: frozenset[str], numeral_words: frozenset[str]):
+        self.words: frozenset[str] = words  # months, weekdays, units, relative dates (e.g. 'today') and 'noon'...
+        self.meridian_words: frozenset[str] = meridian_words  # 'am' and 'pm' (only after a number)
+        self.numeral_words: frozenset[str] = numeral_words  # number words dateparser turns into digits (e.g. 'ten')
+
+
+def sentence_words(sentence: str) -> set[str]:
+    return set(word_regex.findall(sentence.lower()))
+
+
+def has_digit(sentence: str) -> bool:
+    # Numbers, dates and times written with digits (e.g. -3.5, 1,000, 4/5/2020, 10:30) all have at least one digit
+    return any(c.isdigit() for c in sentence)
+
+
+@functools.lru_cache(maxsize=None)
+def number_words(language: str) -> frozenset[str]:
+    """Returns the words alpha2digit can turn into a number in a language, or None if the language is not supported"""
+    if language not in LANG:
+        return None
+    lang = LANG[language]
+    words: set[str] = set()
+    for word in list(lang.NUMBERS) + list(lang.ZERO):
+        words.update(word_regex.findall(word.lower()))
+    return frozenset(words)
+
+
+@functools.lru_cache(maxsize=None)
+def datetime_words(language: str) -> DatetimeWords:
+    """Returns the datetime words of a language, or None if dateparser does not support the language"""
+    try:
+        info: dict = default_loader.get_locale(language).info
+    except Exception:
+        return None
+    phrases: list[str] = [phrase for entry in datetime_locale_entries for phrase in info.get(entry, [])]
+    # Relative dates (e.g. 'today', 'next week')
+    phrases += [phrase for relative_phrases in info.get('relative-type', {}).values() for phrase in relative_phrases]
+    numeral_words: set[str] = set()
+    for simplification in info.get('simplifications', []):
+        for pattern, replacement in simplification.items():
+            # Without its optional groups, e.g. '(?:12\s+)?noon' is 'noon'
+            phrase: str = re.sub(r'\([^)]*\)\??', '', pattern).strip()
+            if not re.fullmatch(r'[\w\s]+', phrase):
+                continue
+            if re.fullmatch(r'\d+', replacement):
+                # Number words (e.g. 'a' in 'a week ago') need another datetime word, except before 'am' or 'pm'
+                numeral_words.update(word_regex.findall(phrase.lower()))
+            else:
+                phrases.append(phrase)
+
+    words: set[str] = set()
+    multi_word_phrases: list[list[str]] = []
+    for phrase in phrases:
+        phrase_words: list[str] = word_regex.findall(phrase.lower())
+        if len(phrase_words) == 1:
+            words.update(phrase_words)
+        elif len(phrase_words) > 1:
+            multi_word_phrases.append(phrase_words)
+    # A phrase of several words is found if any of its words is. Most already have a datetime word (e.g. 'de gener',
+    # 'next week'), the others (e.g. 'till date') add their longest one, instead of common words like 'de' or 'next'
+    for phrase_words in multi_word_phrases:
+        if not any(word in words for word in phrase_words):
+            words.add(max(phrase_words, key=len))
+    meridian_words: set[str] = {word for entry in meridian_locale_entries for phrase in info.get(entry, [])
+                                for word in word_regex.findall(phrase.lower())}
+    numeral_words.update(number_words(language) or [])
+    return DatetimeWords(frozenset(words), frozenset(meridian_words), frozenset(numeral_words))
+
+
+def number_candidate(sentence: str, language: str) -> bool:
+    """Whether ner_number could find a number in the sentence: it has a digit or a number word of the language"""
+    if has_digit(sentence):
+        return True
+    words: frozenset[str] = number_words(language)
+    if words is None:
+        return True
+    lang = LANG[language]
+    return any(word in words or lang.ord2card(word) is not None for word in sentence_words(sentence))
+
+
+def datetime_candidate(sentence: str, language: str) -> bool:
+    """Whether ner_datetime could find a datetime in the sentence: it has a digit, a datetime word of the language or a
+    number word with 'am' or 'pm'"""
+    if has_digit(sentence):
+        return True
+    vocabulary: DatetimeWords = datetime_words(language)
+    if vocabulary is None:
+        return True
+    words: set[str] = sentence_words(sentence)
+    if not vocabulary.words.isdisjoint(words):
+        return True
+    return not vocabulary.meridian_words.isdisjoint(words) and not vocabulary.numeral_words.isdisjoint(words)
@@ -1,11 +1,37 @@
+import threading
+
 from xatkitnlu.core.ner.base.any import ner_any
 from xatkitnlu.core.ner.base.base_entities import BaseEntityType, ordered_base_entities
-from xatkitnlu.core.ner.base.datetime import ner_datetime, datetime_aux
+from xatkitnlu.core.ner.base.datetime import ner_datetime, datetime_aux, datetime_aux_applies
 from xatkitnlu.core.ner.base.number import ner_number
+from xatkitnlu.core.ner.base.prefilters import number_candidate, datetime_candidate
 from xatkitnlu.core.nlp_configuration import NlpConfiguration
 from xatkitnlu.dsl.dsl import Intent, NLUContext, IntentParameter, MatchedParameter, BaseEntity
-from xatkitnlu.utils.utils import value_in_sentence, replace_value_in_sentence, replace_temp_value_in_sentence, \
-    find_first_temp
+from xatkitnlu.utils.utils import replace_value_in_sentence
+
+
+class BaseEntityNerStats:
+    """Counts the base entity parses run by NER, those saved by reusing the result of another intent and those skipped
+    by the lexical prefilters (included in parses)"""
+
+    def __init__(self):
+        self.lock: threading.Lock = threading.Lock()
+        self.parses: int = 0
+        self.saved_parses: int = 0
+        self.prefiltered: int = 0
+
+    def add(self, parses: int, saved_parses: int, prefiltered: int = 0):
+        with self.lock:
+            self.parses += parses
+            self.saved_parses += saved_parses
+            self.prefiltered += prefiltered
+
+    def stats(self) -> dict[str, int]:
+        with self.lock:
+            return {'parses': self.parses, 'saved_parses': self.saved_parses, 'prefiltered': self.prefiltered}
+
+
+base_entity_ner_stats: BaseEntityNerStats = BaseEntityNerStats()
 
 
 def no_ner_matching(context: NLUContext, sentence: str, configuration: NlpConfiguration) -> dict[Intent, tuple[str, list[MatchedParameter]]]:
@@ -17,6 +43,10 @@ def no_ner_matching(context: NLUContext, sentence: str, configuration: NlpConfig
 
 def ner_matching(context: NLUContext, sentence: str, configuration: NlpConfiguration) -> dict[Intent, tuple[str, list[MatchedParameter]]]:
     result: dict[Intent, tuple[str, list[MatchedParameter]]] = {}
+    # Intents with the same base entities usually get the same sentence after replacing their custom entities, so
+    # each (sentence, base entity) is only parsed once for all the intents
+    base_entity_results: dict[tuple[str, str], tuple[str, str, dict]] = {}
+    saved_parses: int = 0
     for intent in context.get_intents():
         intent_matches: list[MatchedParameter] = []
         ner_sentence: str = sentence
@@ -26,41 +56,41 @@ def ner_matching(context: NLUContext, sentence: str, configuration: NlpConfigura
             preprocessed_values = True
         else:
             preprocessed_values = False
-        all_entity_values: dict[str, tuple[list[IntentParameter], str]] = intent.get_custom_entity_values_dict(preprocessed_values)
-        temps: dict[str, tuple[list[IntentParameter], str]] = {}
-        temp_template = r'/temp{}/'
-        temp_count = 1
-        for value, (entity_refs, entry_value) in sorted(all_entity_values.items(), key=lambda x: (len(x[0]), x[0].casefold()), reverse=True):
-            # TODO: This approach doesn't allow 2 repetitions of the same value in a sentence
-            # entry_value are all entry values of the entity
-            # value can be an entry value (i.e. value == entry_value)
-            # or a synonym of an entry value (i.e. value is a synonym of entry_value)
-            # value can be preprocessed
-            if value_in_sentence(value, ner_sentence):
-                temp_n = temp_template.format(temp_count)
-                temp_count += 1
-                ner_sentence = replace_value_in_sentence(ner_sentence, value, temp_n)
-                temps[temp_n] = (entity_refs, entry_value)
+        entity_values: list[tuple[str, tuple[list[IntentParameter], str]]] = intent.get_entity_value_table(preprocessed_values)
+        # The matched values (as spans of the sentence), longest first (a value is not matched inside a longer one
+        # already matched). A value can be an entry value or a synonym of an entry value, and it can be preprocessed.
+        # Repetitions of a value are matched too, for intents with several parameters of the same entity
+        value_matches: list[tuple[int, int, int]] = intent.get_entity_value_matcher(preprocessed_values).match(ner_sentence, True)
 
         entity_refs_done: list[IntentParameter] = []
-        while len(temps) > 0:
-            # We get the temp that appears first in the sentence,
-            # and replace it by the 1st entity reference, in order of declaration in the bot definition
-            temp = find_first_temp(ner_sentence)
-            (entity_refs, value) = temps[temp]
+        matched_values: set[int] = set()
+        ner_sentence_parts: list[str] = []
+        end_of_previous_match: int = 0
+        # In the order they appear in the sentence, each value is replaced by the 1st entity reference, in order of
+        # declaration in the bot definition
+        for start, end, value_index in sorted(value_matches):
+            (entity_refs, value) = entity_values[value_index][1]
             entity_ref = next(
                 (e for e in entity_refs if e not in entity_refs_done),
                 None
             )
-            if entity_ref is None:
+            ner_sentence_parts.append(ner_sentence[end_of_previous_match:start])
+            if entity_ref is None and value_index in matched_values:
+                # A repetition of a value with no parameter left for it is not an entity value
+                ner_sentence_parts.append(ner_sentence[start:end])
+            elif entity_ref is None:
                 # We found 2 values of the same entity_ref.entity, but there can be only 1
-                ner_sentence = replace_temp_value_in_sentence(ner_sentence, temp, value)
+                ner_sentence_parts.append(value)
                 # VALUE ES EL ORIGINAL (woman => pondrá Femení)
             else:
                 entity_refs_done.append(entity_ref)
-                ner_sentence = replace_temp_value_in_sentence(ner_sentence, temp, entity_ref.entity.name.upper())
+                ner_sentence_parts.append(entity_ref.entity.name.upper())
                 intent_matches.append(MatchedParameter(entity_ref.name, value, {}))
-            temps.pop(temp)
+            end_of_previous_match = end
+            matched_values.add(value_index)
+        if len(value_matches) > 0:
+            ner_sentence_parts.append(ner_sentence[end_of_previous_match:])
+            ner_sentence = ''.join(ner_sentence_parts)
 
         # Match base/system entities (after custom entities)
         intent_base_entity_refs: list[IntentParameter] = [e for e in intent.parameters if isinstance(e.entity, BaseEntity)]
@@ -69,24 +99,35 @@ def ner_matching(context: NLUContext, sentence: str, configuration: NlpConfigura
             for entity_ref in intent_base_entity_refs:
                 if base_entity_name == entity_ref.entity.name:
                     param_name = entity_ref.name
-                    formatted_ner_sentence, formatted_frag, param_info = base_entity_ner(ner_sentence, base_entity_name, configuration)
+                    base_entity_result: tuple[str, str, dict] = base_entity_results.get((ner_sentence, base_entity_name))
+                    if base_entity_result is None:
+                        base_entity_result = base_entity_ner(ner_sentence, base_entity_name, configuration)
+                        base_entity_results[(ner_sentence, base_entity_name)] = base_entity_result
+                    else:
+                        saved_parses += 1
+                    formatted_ner_sentence, formatted_frag, param_info = base_entity_result
                     if formatted_ner_sentence is not None and formatted_frag is not None and param_info is not None:
-                        intent_matches.append(MatchedParameter(param_name, formatted_frag, param_info))
+                        intent_matches.append(MatchedParameter(param_name, formatted_frag, dict(param_info)))
                         ner_sentence = replace_value_in_sentence(formatted_ner_sentence, formatted_frag, base_entity_name.upper())
         matched_params_names = [mp.name for mp in intent_matches]
         for entity_param in intent.parameters:
             if entity_param.name not in matched_params_names:
                 intent_matches.append(MatchedParameter(entity_param.name, None, {}))
         result[intent] = (ner_sentence, intent_matches)
+    base_entity_ner_stats.add(len(base_entity_results), saved_parses)
     return result
 
 
 def base_entity_ner(sentence: str, entity_name: str, configuration: NlpConfiguration) -> tuple[str, str, dict]:
+    if configuration.ner_prefilters and not base_entity_candidate(sentence, entity_name, configuration):
+        base_entity_ner_stats.add(0, 0, 1)
+        return None, None, None
     if entity_name == BaseEntityType.NUMBER:
         return ner_number(sentence, configuration)
     if entity_name == BaseEntityType.DATETIME:
         result = ner_datetime(sentence, configuration)
-        if result == (None, None, None):
+        if result == (None, None, None) and datetime_aux_applies(sentence, configuration):
+            # Dates with a conjunction (e.g. 'in 2 years and 3 months') are tried again with a modified conjunction
             sentence = datetime_aux(True, sentence, configuration)
             sentence, frag, info = ner_datetime(sentence, configuration)
             if sentence is None:
@@ -100,6 +141,15 @@ def base_entity_ner(sentence: str, entity_name: str, configuration: NlpConfigura
     return None, None, None
 
 
+def base_entity_candidate(sentence: str, entity_name: str, configuration: NlpConfiguration) -> bool:
+    # Cheap lexical checks, the number and datetime parsers can only find something in a sentence that passes them
+    if entity_name == BaseEntityType.NUMBER:
+        return number_candidate(sentence, configuration.country)
+    if entity_name == BaseEntityType.DATETIME:
+        return datetime_candidate(sentence, configuration.country)
+    return True
+
+
 def get_base_entity_names(entity_references: list[IntentParameter]) -> dict[str, str]:
     base_entity_names: dict[str, str] = {}
     # {entity_name: param_name}
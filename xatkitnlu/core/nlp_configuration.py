@@ -4,7 +4,15 @@ class NlpConfiguration:
                  lower: bool = True, oov_token="<OOV>",
                  num_epochs: int = 300, embedding_dim: int = 128, input_max_num_tokens: int = 15, stemmer: bool = True,
                  discard_oov_sentences=True, check_exact_prediction_match=True,
-                 use_ner_in_prediction=True, activation_last_layer="sigmoid", activation_hidden_layers="tanh"):
+                 use_ner_in_prediction=True, activation_last_layer="sigmoid", activation_hidden_layers="tanh",
+                 training_workers: int = 1, training_intra_op_threads: int = 1, inference_backend: str = 'keras',
+                 model_quantization: str = None, keep_training_sequences: bool = True,
+                 incremental_training: bool = False, incremental_epochs: int = 30, early_stopping: bool = False,
+                 early_stopping_monitor: str = 'loss', early_stopping_patience: int = 10,
+                 early_stopping_min_delta: float = 0.001, training_time_budget: float = 0,
+                 training_batch_size: int = 32, training_shuffle: bool = True, training_prefetch: bool = False,
+                 training_data_threads: int = 0, word_tokenizer: str = 'nltk',
+                 ner_prefilters: bool = True):
         self.country = country
         self.region = region
         self.timezone = timezone # The timezone to use
@@ -20,3 +28,21 @@ class NlpConfiguration:
         self.use_ner_in_prediction = use_ner_in_prediction  # whether to use NER in the prediction
         self.activation_last_layer = activation_last_layer # The activation function of the last layer
         self.activation_hidden_layers = activation_hidden_layers # The activation function of the hidden layers
+        self.training_workers = training_workers  # Number of worker processes training the contexts of a bot in parallel (1 trains them sequentially)
+        self.training_intra_op_threads = training_intra_op_threads  # Max number of threads used by TensorFlow ops in each training worker process (0 lets TensorFlow decide)
+        self.inference_backend = inference_backend  # Engine running the model in predictions: 'keras' or 'numpy' (same scores, much lower latency)
+        self.model_quantization = model_quantization  # Quantization of the embeddings of the 'numpy' backend: None (float32), 'float16' or 'int8'
+        self.keep_training_sequences = keep_training_sequences  # whether to keep the padded training sequences in memory after training (exact matches use their own index)
+        self.incremental_training = incremental_training  # whether to start training a context from its previous model, instead of from scratch
+        self.incremental_epochs = incremental_epochs  # Number of epochs to be run when training starts from the previous model
+        self.early_stopping = early_stopping  # whether to stop training a context when the monitored metric stops improving
+        self.early_stopping_monitor = early_stopping_monitor  # metric monitored by early stopping: 'loss' or 'accuracy'
+        self.early_stopping_patience = early_stopping_patience  # Number of epochs without improvement after which training is stopped
+        self.early_stopping_min_delta = early_stopping_min_delta  # Min change of the monitored metric to count as an improvement
+        self.training_time_budget = training_time_budget  # Max seconds to train a context, checked after each epoch (0 means no limit)
+        self.training_batch_size = training_batch_size  # Number of training sentences per gradient update
+        self.training_shuffle = training_shuffle  # whether to shuffle the training sentences before each epoch
+        self.training_prefetch = training_prefetch  # whether to feed training through a cached tf.data pipeline that prefetches the next batches
+        self.training_data_threads = training_data_threads  # Number of threads of the tf.data pipeline when training_prefetch is on (0 lets TensorFlow decide)
+        self.word_tokenizer = word_tokenizer  # tokenizer splitting sentences in words before stemming: 'nltk' (English word_tokenize) or 'regex' (faster, language-aware)
+        self.ner_prefilters = ner_prefilters  # whether to skip the number and datetime parsers in sentences without any digit or number/datetime word
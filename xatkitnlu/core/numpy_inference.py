@@ -0,0 +1,112 @@
+import numpy as np
+
+from xatkitnlu.core.nlp_configuration import NlpConfiguration
+
+
+def softmax(x: np.ndarray) -> np.ndarray:
+    e: np.ndarray = np.exp(x - x.max(axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+# NumPy versions of the Keras activation functions that can be set in the configuration
+ACTIVATIONS = {
+    'linear': lambda x: x,
+    'sigmoid': lambda x: 1 / (1 + np.exp(-x)),
+    'tanh': np.tanh,
+    'relu': lambda x: np.maximum(x, 0),
+    'softmax': softmax,
+    'softplus': lambda x: np.logaddexp(x, 0),
+    'softsign': lambda x: x / (1 + np.abs(x)),
+    'elu': lambda x: np.where(x > 0, x, np.expm1(np.minimum(x, 0))),
+    'exponential': np.exp,
+}
+
+
+class NumpyModel:
+    """NumPy implementation of the forward pass of the model created by training.create_model.
+
+    Embedding -> GlobalAveragePooling1D -> Dense layers. It gives the same scores as the Keras model it is built from,
+    without the per call overhead of Keras (and without needing TensorFlow at all).
+
+    The embedding matrix, which holds nearly all the weights of the model, can be quantized to float16 or int8 (with a
+    scale per row) to reduce the memory used by the model. Only the rows of the tokens being predicted are dequantized
+    """
+
+    def __init__(self, embeddings: np.ndarray, dense_layers: list[tuple[np.ndarray, np.ndarray, str]],
+                 embedding_scales: np.ndarray = None):
+        self.embeddings: np.ndarray = embeddings  # (num_words, embedding_dim) embedding matrix
+        self.embedding_scales: np.ndarray = embedding_scales  # scale of each row of an int8 embedding matrix
+        self.dense_layers: list[tuple[np.ndarray, np.ndarray, str]] = dense_layers  # (kernel, bias, activation) of each layer
+        for _, _, activation in dense_layers:
+            if activation not in ACTIVATIONS:
+                raise ValueError(f'Activation function {activation} is not supported by the numpy inference backend')
+
+    @staticmethod
+    def from_weights(weights: list[np.ndarray], configuration: NlpConfiguration) -> 'NumpyModel':
+        """Creates the model from the weights of the Keras model (i.e. model.get_weights())"""
+        num_dense_layers: int = (len(weights) - 1) // 2
+        dense_layers: list[tuple[np.ndarray, np.ndarray, str]] = []
+        for i in range(num_dense_layers):
+            activation: str = configuration.activation_last_layer if i == num_dense_layers - 1 \
+                else configuration.activation_hidden_layers
+            dense_layers.append((weights[1 + 2 * i], weights[2 + 2 * i], activation))
+        return NumpyModel(weights[0], dense_layers)
+
+    @staticmethod
+    def from_keras(model, configuration: NlpConfiguration) -> 'NumpyModel':
+        return NumpyModel.from_weights(model.get_weights(), configuration)
+
+    def quantize(self, quantization: str) -> 'NumpyModel':
+        """Returns a copy of the model with the embedding matrix quantized ('float16' or 'int8')"""
+        embeddings: np.ndarray = self.get_weights()[0]
+        if quantization == 'float16':
+            return NumpyModel(embeddings.astype(np.float16), self.dense_layers)
+        elif quantization == 'int8':
+            # Symmetric quantization with a scale per row, so frequent and rare words keep the same relative precision
+            scales: np.ndarray = np.abs(embeddings).max(axis=1) / 127
+            scales[scales == 0] = 1
+            quantized: np.ndarray = np.clip(np.round(embeddings / scales[:, None]), -127, 127).astype(np.int8)
+            return NumpyModel(quantized, self.dense_layers, scales.astype(np.float32))
+        raise ValueError(f'Quantization {quantization} is not supported, use float16 or int8')
+
+    def get_weights(self) -> list[np.ndarray]:
+        """Returns the (dequantized) weights in the same format as the Keras model"""
+        weights: list[np.ndarray] = [self.__embedding_rows(slice(None))]
+        for kernel, bias, _ in self.dense_layers:
+            weights.extend([kernel, bias])
+        return weights
+
+    def nbytes(self) -> int:
+        size: int = self.embeddings.nbytes + sum(kernel.nbytes + bias.nbytes for kernel, bias, _ in self.dense_layers)
+        if self.embedding_scales is not None:
+            size += self.embedding_scales.nbytes
+        return size
+
+    def predict(self, sequences: np.ndarray) -> np.ndarray:
+        """Returns the scores of a batch of padded sequences, one row per sequence"""
+        # Padding tokens are not masked in the Keras model, so they are part of the average too
+        x: np.ndarray = self.__embedding_rows(np.asarray(sequences)).mean(axis=1)
+        for kernel, bias, activation in self.dense_layers:
+            x = ACTIVATIONS[activation](x @ kernel + bias)
+        return x
+
+    def __embedding_rows(self, indexes) -> np.ndarray:
+        rows: np.ndarray = self.embeddings[indexes]
+        if self.embedding_scales is not None:
+            return rows.astype(np.float32) * self.embedding_scales[indexes][..., None]
+        return rows.astype(np.float32, copy=False)
+
+
+def quantization_report(float_model: NumpyModel, quantized_model: NumpyModel, sequences: np.ndarray,
+                        labels: list[int]) -> dict[str, object]:
+    """Compares a quantized model with the float model it comes from on the given (e.g. training) data"""
+    float_scores: np.ndarray = float_model.predict(sequences)
+    quantized_scores: np.ndarray = quantized_model.predict(sequences)
+    float_accuracy: float = float(np.mean(np.argmax(float_scores, axis=1) == np.asarray(labels)))
+    quantized_accuracy: float = float(np.mean(np.argmax(quantized_scores, axis=1) == np.asarray(labels)))
+    return {'float_accuracy': float_accuracy,
+            'quantized_accuracy': quantized_accuracy,
+            'accuracy_delta': quantized_accuracy - float_accuracy,
+            'max_score_delta': float(np.max(np.abs(quantized_scores - float_scores))),
+            'float_bytes': float_model.nbytes(),
+            'quantized_bytes': quantized_model.nbytes()}
@@ -1,6 +1,9 @@
 import logging
+import re
+from typing import Callable
 
 import nltk
+from nltk import word_tokenize
 from nltk.stem import SnowballStemmer
 
 lang_map = {
@@ -16,6 +19,11 @@ lang_map = {
 
 stemmers: dict[str, SnowballStemmer] = {}
 
+word_tokenizers: dict[tuple[str, str], Callable[[str], list[str]]] = {}
+
+# Languages whose articles and pronouns are elided before a vowel (e.g. "l'homme"), the elided word is a token
+elision_languages: set[str] = {'french', 'italian', 'catalan'}
+
 """
 try:
     nltk.data.find('tokenizers/punkt')
@@ -32,3 +40,59 @@ def create_or_get_stemmer(lang: str = 'english') -> SnowballStemmer:
     stemmers[lang] = stemmer
     logging.info(f'Stemmer added: {lang}')
     return stemmer
+
+
+def create_or_get_word_tokenizer(name: str = 'nltk', lang: str = 'english') -> Callable[[str], list[str]]:
+    """Returns the word tokenizer 'nltk' (NLTK word_tokenize, always in English as it has been so far) or 'regex' (a
+    faster RegexWordTokenizer for the given language)"""
+    key: tuple[str, str] = (name, lang)
+    if key in word_tokenizers:
+        return word_tokenizers[key]
+    if name == 'nltk':
+        tokenizer: Callable[[str], list[str]] = lambda text: word_tokenize(text, language='english')
+    elif name == 'regex':
+        tokenizer = RegexWordTokenizer(lang)
+    else:
+        raise ValueError(f'Unknown word tokenizer: {name}')
+    word_tokenizers[key] = tokenizer
+    logging.info(f'Word tokenizer added: {name} ({lang})')
+    return tokenizer
+
+
+class RegexWordTokenizer:
+    """Splits a text in words, numbers and punctuation signs with a single precompiled regex, following the NLTK
+    (Treebank) conventions where they matter for short utterances: English contractions are split ("don't" -> "do",
+    "n't", "cannot" -> "can", "not"), numbers keep their sign and separators ("-1,000.5", "10:30") and double quotes
+    become `` and ''. Unlike NLTK, it does
+    not split sentences first, so abbreviations like "Mr." are split as any other word followed by a period
+    """
+
+    def __init__(self, lang: str = 'english'):
+        alternatives: list[str] = []
+        if lang == 'english':
+            alternatives += [r"\w+?(?=n't\b)", r"n't\b", r"'(?:s|m|d|ll|re|ve)\b",
+                             r'\b(?:can(?=not\b)|gim(?=me\b)|gon(?=na\b)|got(?=ta\b)|lem(?=me\b)|wan(?=na\b))']
+            # An apostrophe not starting a contraction is part of the word (e.g. "o'clock")
+            apostrophe: str = r"'(?!(?:s|m|d|ll|re|ve)\b)"
+        elif lang in elision_languages:
+            alternatives += [r"\w+'(?=\w)"]
+            apostrophe = r"'(?!\w)"  # never matches a word character after it, so elisions are split
+        else:
+            apostrophe = "'"
+        alternatives += [r'(?<![\w-])-?\d+(?:[.,:]\d+)*\w*(?:-\w+)*',  # numbers (and ordinals, e.g. "4th")
+                         rf'\w+(?:(?:[-.]|{apostrophe})\w+)*',  # words, including hyphenated ones and domains
+                         r'\.\.\.',
+                         r'"',
+                         r'[^\w\s]']  # any other symbol on its own
+        self.pattern: re.Pattern = re.compile('|'.join(alternatives), re.IGNORECASE)
+
+    def __call__(self, text: str) -> list[str]:
+        tokens: list[str] = []
+        for match in self.pattern.finditer(text):
+            token: str = match.group()
+            if token == '"':
+                # Opening quotes are at the beginning of the text or after a space or an opening bracket
+                start: int = match.start()
+                token = '``' if start == 0 or text[start - 1].isspace() or text[start - 1] in '([{<' else "''"
+            tokens.append(token)
+        return tokens
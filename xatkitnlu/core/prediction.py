@@ -2,14 +2,119 @@ import numpy as np
 
 from xatkitnlu.core.ner.ner import ner_matching, no_ner_matching
 from xatkitnlu.core.nlp_configuration import NlpConfiguration
+from xatkitnlu.core.numpy_inference import NumpyModel
+from xatkitnlu.core.inference_scheduler import InferenceScheduler
+from xatkitnlu.core.prediction_cache import PredictionCache
 from xatkitnlu.core.text_preprocessing import preprocess_text
 
 from xatkitnlu.dsl.dsl import NLUContext, Intent, MatchedParameter, Classification, PredictResult
-import tensorflow as tf
+
+# Disabled until configured (see PredictionCache.configure and InferenceScheduler.configure)
+prediction_cache: PredictionCache = PredictionCache()
+inference_scheduler: InferenceScheduler = InferenceScheduler()
 
 
 def predict(context: NLUContext, sentence: str, configuration: NlpConfiguration) -> PredictResult:
-    predict_result: PredictResult = PredictResult(context)
+    return predict_batch([(context, sentence)], configuration)[0]
+
+
+def predict_batch(requests: list[tuple[NLUContext, str]], configuration: NlpConfiguration) -> list[PredictResult]:
+    """Predicts a list of (context, sentence) requests, running a single model invocation per context.
+
+    The results are returned in the same order as the requests and are the same we would get by calling predict() on
+    each request one at a time
+    """
+    predict_results: list[PredictResult] = [None] * len(requests)
+    cache_keys: list[tuple] = [None] * len(requests)
+    requests_by_context: dict[NLUContext, list[int]] = {}
+    for request_index, (context, sentence) in enumerate(requests):
+        cache_keys[request_index] = prediction_cache.get_key(context, sentence, configuration)
+        predict_results[request_index] = prediction_cache.get(cache_keys[request_index])
+        if predict_results[request_index] is not None:
+            continue
+        if requests_by_context.get(context) is None:
+            requests_by_context[context] = []
+        requests_by_context[context].append(request_index)
+
+    for context, request_indexes in requests_by_context.items():
+        sentences: list[str] = [requests[request_index][1] for request_index in request_indexes]
+        context_results: list[PredictResult] = __predict_context_batch(context, sentences, configuration)
+        for request_index, predict_result in zip(request_indexes, context_results):
+            predict_results[request_index] = predict_result
+            prediction_cache.put(cache_keys[request_index], predict_result)
+    return predict_results
+
+
+def __predict_context_batch(context: NLUContext, sentences: list[str], configuration: NlpConfiguration) -> list[PredictResult]:
+    # For each sentence, the NER sentences to be fed to the model and the intents each one of them is evaluated for
+    sentences_ner_results: list[dict[Intent, tuple[str, list[MatchedParameter]]]] = []
+    sentences_intent_sentences: list[dict[str, list[Intent]]] = []
+    for sentence in sentences:
+        ner_matching_result, intent_sentences = __ner_sentences(context, sentence, configuration)
+        sentences_ner_results.append(ner_matching_result)
+        sentences_intent_sentences.append(intent_sentences)
+
+    # All the NER sentences of the batch are tokenized together, so we get one row per (sentence, NER sentence) pair
+    ner_sentences: list[str] = [ner_sentence for intent_sentences in sentences_intent_sentences
+                                for ner_sentence in intent_sentences.keys()]
+    padded, oov_only = context.vectorizer.vectorize(ner_sentences, configuration.input_max_num_tokens)
+
+    predictions: list[np.ndarray] = [None] * len(ner_sentences)
+    full_prediction_rows: list[int] = []
+    for row in range(len(ner_sentences)):
+        prediction = __shortcut_prediction(context, oov_only[row], padded[row], configuration)
+        if prediction is None:
+            full_prediction_rows.append(row)
+        else:
+            predictions[row] = prediction
+
+    if len(full_prediction_rows) > 0:
+        # A single padded matrix with all the rows that need the NN-based prediction
+        # Concurrent predictions on the same context (with the same backend and padding width) may be run together
+        # with these rows
+        full_prediction = inference_scheduler.run((context, configuration.inference_backend, padded.shape[1]),
+                                                  padded[full_prediction_rows],
+                                                  lambda rows: __run_model(context, rows, configuration))
+        for full_prediction_index, row in enumerate(full_prediction_rows):
+            predictions[row] = full_prediction[full_prediction_index]
+
+    predict_results: list[PredictResult] = []
+    row: int = 0
+    for sentence, ner_matching_result, intent_sentences in zip(sentences, sentences_ner_results, sentences_intent_sentences):
+        predict_result: PredictResult = PredictResult(context)
+        for (ner_sentence, intents) in intent_sentences.items():
+            prediction = predictions[row]
+            row += 1
+            for intent in intents:
+                # it is impossible to have a duplicated intent in another ner_sentence
+                intent_index = context.get_intent_index(intent)
+                matched_ners: list[MatchedParameter] = []
+                if configuration.use_ner_in_prediction:
+                    matched_ners = ner_matching_result[intent][1]
+                classification: Classification = predict_result.get_classification(intent)
+                classification.score = prediction[intent_index]
+                classification.matched_utterance = sentence
+                classification.matched_parameters = matched_ners
+        predict_results.append(predict_result)
+    return predict_results
+
+
+def __run_model(context: NLUContext, padded_sequences: np.ndarray, configuration: NlpConfiguration) -> np.ndarray:
+    # A context only keeps the model of the backend it was trained with, the other one is created from it if the
+    # backend is changed afterwards
+    if configuration.inference_backend == 'numpy':
+        if context.numpy_model is None:
+            context.numpy_model = NumpyModel.from_keras(context.nlp_model, configuration)
+        return context.numpy_model.predict(padded_sequences)
+    if context.nlp_model is None:
+        # Imported here, as training loads TensorFlow, which is not needed to predict with the numpy backend
+        from xatkitnlu.core.training import create_model
+        context.nlp_model = create_model(len(context.intent_refs), configuration)
+        context.nlp_model.set_weights(context.numpy_model.get_weights())
+    return context.nlp_model.predict(padded_sequences)
+
+
+def __ner_sentences(context: NLUContext, sentence: str, configuration: NlpConfiguration) -> tuple[dict[Intent, tuple[str, list[MatchedParameter]]], dict[str, list[Intent]]]:
     ner_matching_result: dict[Intent, tuple[str, list[MatchedParameter]]] = {}
     intent_sentences: dict[str, list[Intent]] = {}
     preprocessed_sentence = preprocess_text(sentence, configuration)
@@ -24,48 +129,20 @@ def predict(context: NLUContext, sentence: str, configuration: NlpConfiguration)
     else:
         # ner_matching_result = no_ner_matching(context, sentence, configuration)
         intent_sentences[preprocessed_sentence] = context.get_intents()
+    return ner_matching_result, intent_sentences
+
 
-    for (ner_sentence, intents) in intent_sentences.items():
-        sentences = [ner_sentence]
-        sequences = context.tokenizer.texts_to_sequences(sentences)
-        padded = tf.keras.preprocessing.sequence.pad_sequences(sequences, padding='post',
-                                                               maxlen=configuration.input_max_num_tokens,
-                                                               truncating='post')
-        run_full_prediction: bool = True
-        if configuration.discard_oov_sentences and all(i == 1 for i in sequences[0]):
-            # the sentence to predict consists of only out of vocabulary tokens so we can automatically assign a zero probability to all classes
+def __shortcut_prediction(context: NLUContext, oov_only: bool, padded_sequence: np.ndarray, configuration: NlpConfiguration) -> np.ndarray:
+    """Returns the prediction for a sentence when it can be decided without running the NN, None otherwise"""
+    if configuration.discard_oov_sentences and oov_only:
+        # the sentence to predict consists of only out of vocabulary tokens so we can automatically assign a zero probability to all classes
+        return np.zeros(len(context.intent_refs))
+    elif configuration.check_exact_prediction_match:
+        label: int = context.get_exact_match(padded_sequence)
+        if label is not None:
+            # We set to true the corresponding intent with full confidence and to zero all the
+            # We don't check if there is more than one intent that could be the exact match as this would be an inconsistency in the bot definition anyways
             prediction = np.zeros(len(context.intent_refs))
-            run_full_prediction = False  # no need to go ahead with the full NN-based prediction
-        elif configuration.check_exact_prediction_match:
-            found: bool = False
-            found_intent: int
-            i: int = 0
-            for training_sequence in context.training_sequences:
-                if np.array_equal(padded[0], training_sequence):
-                    found = True
-                    found_intent = context.training_labels[i]
-                    run_full_prediction = False
-                    break
-                i+=1
-            if found:
-                # We set to true the corresponding intent with full confidence and to zero all the
-                # We don't check if there is more than one intent that could be the exact match as this would be an inconsistency in the bot definition anyways
-                prediction = np.zeros(len(context.intent_refs))
-                np.put(prediction, found_intent, 1.0, mode='raise')
-
-        if run_full_prediction:
-            full_prediction = context.nlp_model.predict(padded)
-            prediction = full_prediction[0]  # We return just the a single array with the predictions as we predict for just one sentence
-
-        for intent in intents:
-            # it is impossible to have a duplicated intent in another ner_sentence
-            intent_index = context.get_intents().index(intent)
-            matched_ners: list[MatchedParameter] = []
-            if configuration.use_ner_in_prediction:
-                matched_ners = ner_matching_result[intent][1]
-            classification: Classification = predict_result.get_classification(intent)
-            classification.score = prediction[intent_index]
-            classification.matched_utterance = sentence
-            classification.matched_parameters = matched_ners
-
-    return predict_result
+            np.put(prediction, label, 1.0, mode='raise')
+            return prediction
+    return None
@@ -0,0 +1,68 @@
+import itertools
+
+from xatkitnlu.core.lru_cache import LRUCache
+from xatkitnlu.core.ner.base.base_entities import BaseEntityType
+from xatkitnlu.core.nlp_configuration import NlpConfiguration
+from xatkitnlu.dsl.dsl import NLUContext, PredictResult
+
+# Every trained (or restored) model gets a new generation. Generations are unique across all bots, so cached results
+# of a previous model of a context, or of any other context, can never be returned
+model_generations = itertools.count(1)
+
+
+def new_model_generation() -> int:
+    return next(model_generations)
+
+
+class PredictionCache:
+    """LRU cache of prediction results, keyed by context model generation, utterance and configuration"""
+
+    def __init__(self, max_size: int = 0, ttl: float = 0, datetime_ttl: float = 0):
+        self.results: LRUCache = LRUCache()
+        self.configure(max_size, ttl, datetime_ttl)
+
+    def configure(self, max_size: int, ttl: float, datetime_ttl: float):
+        self.ttl: float = ttl  # seconds a result is kept (0 means until it is evicted)
+        # seconds a result with a matched date-time parameter is kept (0 means it is not cached), as relative dates
+        # (e.g. 'tomorrow') depend on the moment the prediction is done
+        self.datetime_ttl: float = datetime_ttl
+        self.results.configure(max_size)  # max number of cached results (0 disables the cache)
+
+    def get_key(self, context: NLUContext, sentence: str, configuration: NlpConfiguration) -> tuple:
+        """Returns the key of a prediction, or None if the cache is disabled"""
+        if self.results.max_size <= 0:
+            return None
+        # The configuration can change without retraining (e.g. check_exact_prediction_match), so it is part of the key
+        return context.model_generation, context.name, sentence, tuple(sorted(configuration.__dict__.items()))
+
+    def get(self, key: tuple) -> PredictResult:
+        """Returns a copy of the cached result of the key (so callers can modify it), or None if it is not cached"""
+        if key is None:
+            return None
+        predict_result: PredictResult = self.results.get(key)
+        return predict_result.copy() if predict_result is not None else None
+
+    def put(self, key: tuple, predict_result: PredictResult):
+        if self.results.max_size <= 0 or key is None:
+            return
+        ttl: float = self.ttl
+        if has_datetime_parameter(predict_result):
+            if self.datetime_ttl <= 0:
+                return
+            ttl = self.datetime_ttl if ttl <= 0 else min(ttl, self.datetime_ttl)
+        # A copy, as the caller keeps the result and may modify it
+        self.results.put(key, predict_result.copy(), ttl)
+
+    def stats(self) -> dict[str, object]:
+        return self.results.stats()
+
+
+def has_datetime_parameter(predict_result: PredictResult) -> bool:
+    for classification in predict_result.classifications:
+        if classification.matched_parameters is None:
+            continue
+        datetime_parameters: set[str] = {parameter.name for parameter in classification.intent.parameters
+                                         if parameter.entity.name == BaseEntityType.DATETIME}
+        if any(mp.value is not None and mp.name in datetime_parameters for mp in classification.matched_parameters):
+            return True
+    return False
@@ -0,0 +1,240 @@
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+
+from xatkitnlu.core.model_store import save_context, load_context
+from xatkitnlu.dsl.dsl import Bot, NLUContext
+
+
+class ResidencyManager:
+    """Keeps the memory used by the trained contexts of all bots under a budget.
+
+    When the budget is exceeded, the least recently used contexts are evicted: their trained model is written to disk
+    and released from memory. An evicted context is reloaded transparently the next time it is used.
+
+    The manager lock only guards its own state. Contexts are written to and read from disk holding a lock of their own,
+    so evicting or reloading a context never blocks the predictions on other contexts
+    """
+
+    def __init__(self, memory_budget: int = 0, eviction_path: str = None):
+        self.memory_budget: int = memory_budget  # max bytes used by resident contexts (0 means no limit)
+        self.eviction_path: str = eviction_path  # directory where evicted contexts are written
+        self.resident: OrderedDict[NLUContext, int] = OrderedDict()  # resident contexts (and their size) in LRU order
+        self.evicted: set[NLUContext] = set()  # evicted contexts (their model may not have been released yet)
+        self.context_bots: dict[NLUContext, Bot] = {}
+        self.bot_contexts: dict[str, list[NLUContext]] = {}
+        # directory where each context has been written, if any, with the model generation written in it
+        self.artifacts: dict[NLUContext, tuple[str, int]] = {}
+        self.in_use: dict[NLUContext, int] = {}
+        self.context_locks: weakref.WeakKeyDictionary[NLUContext, threading.Lock] = weakref.WeakKeyDictionary()
+        self.lock: threading.RLock = threading.RLock()
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.reload_time_total: float = 0
+        self.reload_time_max: float = 0
+
+    def track(self, bot: Bot):
+        """Starts tracking the trained contexts of a bot (including the previous ones kept to be reused by the next
+        training), replacing the contexts previously tracked for the same bot.
+
+        The contexts that are still tracked keep their state, so an evicted one can still be reloaded
+        """
+        contexts: list[NLUContext] = list({context: None for context in bot.contexts + list(bot.trained_contexts.values())})
+        with self.lock:
+            contexts = [context for context in contexts if context.is_trained() or context in self.evicted]
+            untracked: list[tuple[NLUContext, str]] = self.__untrack([context for context in self.bot_contexts.get(bot.name, [])
+                                                                      if context not in contexts])
+            self.bot_contexts[bot.name] = contexts
+            for context in contexts:
+                self.context_bots[context] = bot
+                if context not in self.evicted:
+                    self.resident[context] = context_memory_size(context)
+                    self.resident.move_to_end(context)
+            victims: list[NLUContext] = self.__select_victims()
+        self.__remove_artifacts(untracked)
+        self.__evict_all(victims)
+
+    def forget(self, bot_name: str):
+        """Stops tracking the contexts of a bot (e.g. because it has been deleted)"""
+        with self.lock:
+            untracked: list[tuple[NLUContext, str]] = self.__untrack(self.bot_contexts.pop(bot_name, []))
+        self.__remove_artifacts(untracked)
+
+    @contextmanager
+    def use(self, contexts: list[NLUContext]):
+        """Makes sure the given contexts are in memory, and prevents their eviction, while the block is running"""
+        contexts_to_reload: list[NLUContext] = []
+        with self.lock:
+            for context in contexts:
+                self.in_use[context] = self.in_use.get(context, 0) + 1
+                if context in self.resident:
+                    self.hits += 1
+                    self.resident.move_to_end(context)
+                elif context in self.evicted:
+                    self.misses += 1
+                    contexts_to_reload.append(context)
+        try:
+            for context in contexts_to_reload:
+                self.__reload(context)
+            with self.lock:
+                victims: list[NLUContext] = self.__select_victims()
+            self.__evict_all(victims)
+            yield
+        finally:
+            with self.lock:
+                for context in contexts:
+                    self.in_use[context] -= 1
+                    if self.in_use[context] == 0:
+                        self.in_use.pop(context)
+                victims: list[NLUContext] = self.__select_victims()
+            self.__evict_all(victims)
+
+    def stats(self) -> dict[str, object]:
+        with self.lock:
+            reloads: int = self.misses
+            return {'memory_budget': self.memory_budget,
+                    'resident_memory': sum(self.resident.values()),
+                    'resident_contexts': len(self.resident),
+                    'evicted_contexts': len(self.evicted),
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'hit_rate': self.hits / (self.hits + self.misses) if self.hits + self.misses > 0 else None,
+                    'evictions': self.evictions,
+                    'reload_time_avg_ms': 1000 * self.reload_time_total / reloads if reloads > 0 else None,
+                    'reload_time_max_ms': 1000 * self.reload_time_max}
+
+    def __context_lock(self, context: NLUContext) -> threading.Lock:
+        with self.lock:
+            return self.context_locks.setdefault(context, threading.Lock())
+
+    def __untrack(self, contexts: list[NLUContext]) -> list[tuple[NLUContext, str]]:
+        # Must be called with the manager lock, returns the artifacts to be removed (see __remove_artifacts)
+        untracked: list[tuple[NLUContext, str]] = []
+        for context in contexts:
+            self.resident.pop(context, None)
+            self.evicted.discard(context)
+            self.context_bots.pop(context, None)
+            artifact: tuple[str, int] = self.artifacts.pop(context, None)
+            if artifact is not None:
+                untracked.append((context, artifact[0]))
+        return untracked
+
+    def __remove_artifacts(self, artifacts: list[tuple[NLUContext, str]]):
+        for context, context_dir in artifacts:
+            # Not while the context is being reloaded from them
+            with self.__context_lock(context):
+                shutil.rmtree(context_dir, ignore_errors=True)
+
+    def __select_victims(self) -> list[NLUContext]:
+        # Must be called with the manager lock. The victims are marked as evicted right away, but their model is only
+        # written and released by __evict_all, out of the manager lock
+        if self.memory_budget <= 0:
+            return []
+        victims: list[NLUContext] = []
+        resident_memory: int = sum(self.resident.values())
+        for context in list(self.resident.keys()):
+            if resident_memory <= self.memory_budget:
+                break
+            if context in self.in_use:
+                continue
+            resident_memory -= self.resident.pop(context)
+            self.evicted.add(context)
+            self.evictions += 1
+            victims.append(context)
+        return victims
+
+    def __evict_all(self, contexts: list[NLUContext]):
+        for context in contexts:
+            self.__evict(context)
+
+    def __evict(self, context: NLUContext):
+        with self.__context_lock(context):
+            with self.lock:
+                if context not in self.evicted or context in self.in_use or not context.is_trained():
+                    # Reloaded or forgotten in the meantime (a context being used keeps its model, and it is marked as
+                    # resident again by the reload of whoever is using it)
+                    return
+                artifact: tuple[str, int] = self.artifacts.get(context)
+                if self.eviction_path is None:
+                    self.eviction_path = tempfile.mkdtemp(prefix='xatkit-nlu-evicted-')
+                bot_name: str = self.context_bots[context].name
+            stale_dirs: list[str] = []
+            if artifact is None or artifact[1] != context.model_generation:
+                # Once written, the artifacts are kept until the context is forgotten (or trained again), so evicting
+                # it again is free
+                context_dir: str = os.path.join(self.eviction_path, uuid.uuid4().hex)
+                save_context(context, context_dir)
+                if artifact is not None:
+                    stale_dirs.append(artifact[0])
+                artifact = (context_dir, context.model_generation)
+            with self.lock:
+                if context in self.context_bots:
+                    self.artifacts[context] = artifact
+                else:
+                    stale_dirs.append(artifact[0])
+                if context in self.evicted and context not in self.in_use:
+                    context.nlp_model = None
+                    context.numpy_model = None
+                    context.tokenizer = None
+                    context.vectorizer = None
+                    context.training_sentences = []
+                    context.training_sequences = []
+                    context.training_labels = []
+                    context.exact_match_index = {}
+                    logging.info(f'Context {context.name} of bot {bot_name} evicted')
+            for stale_dir in stale_dirs:
+                shutil.rmtree(stale_dir, ignore_errors=True)
+
+    def __reload(self, context: NLUContext):
+        with self.__context_lock(context):
+            with self.lock:
+                if context not in self.evicted:
+                    # Reloaded by another caller in the meantime (or forgotten)
+                    return
+                artifact: tuple[str, int] = self.artifacts.get(context)
+            reload_time: float = None
+            # The context may not have been released yet, in that case the model in memory is kept
+            if not context.is_trained() and artifact is not None:
+                start: float = time.perf_counter()
+                # With the configuration of the evicted model, the bot may have been trained with another one since then
+                load_context(context, artifact[0], context.training_configuration)
+                reload_time = time.perf_counter() - start
+            with self.lock:
+                if reload_time is not None:
+                    self.reload_time_total += reload_time
+                    self.reload_time_max = max(self.reload_time_max, reload_time)
+                    if self.artifacts.get(context) is artifact:
+                        # The reloaded model gets a new generation, but it is still the one written in the artifacts
+                        self.artifacts[context] = (artifact[0], context.model_generation)
+                if context in self.evicted:
+                    self.evicted.discard(context)
+                    self.resident[context] = context_memory_size(context)
+
+
+def context_memory_size(context: NLUContext) -> int:
+    """Approximate number of bytes used by the trained model of a context"""
+    size: int = 0
+    if context.nlp_model is not None:
+        size += sum(weights.nbytes for weights in context.nlp_model.get_weights())
+    if context.numpy_model is not None:
+        size += context.numpy_model.nbytes()
+    size += np.asarray(context.training_sequences).nbytes
+    size += 8 * len(context.training_labels)
+    size += sum(len(sequence) + 64 for sequence in context.exact_match_index.keys())
+    size += sum(len(sentence) for sentence in context.training_sentences)
+    if context.tokenizer is not None:
+        # word_index, index_word, word_counts and word_docs entries, each with the word and a number
+        size += sum(4 * (len(word) + 16) for word in context.tokenizer.word_index.keys())
+    if context.vectorizer is not None:
+        size += sum(len(word) + 16 for word in context.vectorizer.vocabulary.keys())
+    return size
@@ -0,0 +1,54 @@
+import os
+
+
+class ServerConfiguration:
+    """Options of the NLU server itself, shared by all the bots it hosts (bot options are in NlpConfiguration)"""
+
+    def __init__(self, model_store_path: str = None, model_store_load_workers: int = 4, memory_budget_mb: int = 0,
+                 eviction_path: str = None, prediction_cache_size: int = 10000, prediction_cache_ttl: float = 3600,
+                 prediction_cache_datetime_ttl: float = 0, inference_batch_max_size: int = 1,
+                 inference_batch_max_wait_ms: float = 2, preprocessing_cache_size: int = 10000,
+                 stem_cache_size: int = 50000, warmup_languages: list[str] = None):
+        self.model_store_path = model_store_path  # directory where trained bots are persisted (None disables persistence)
+        self.model_store_load_workers = model_store_load_workers  # number of threads loading the stored bots at startup
+        self.memory_budget_mb = memory_budget_mb  # max memory used by trained contexts before evicting them to disk (0 means no limit)
+        self.eviction_path = eviction_path  # directory where evicted contexts are written (None uses a temporary directory)
+        self.prediction_cache_size = prediction_cache_size  # max number of cached prediction results (0 disables the cache)
+        self.prediction_cache_ttl = prediction_cache_ttl  # seconds a prediction result is cached (0 means no expiration)
+        self.prediction_cache_datetime_ttl = prediction_cache_datetime_ttl  # seconds a result with a date-time parameter is cached (0 means never cached)
+        self.inference_batch_max_size = inference_batch_max_size  # max rows of a batched model invocation for concurrent predictions (1 disables batching)
+        self.inference_batch_max_wait_ms = inference_batch_max_wait_ms  # max time a prediction waits for others to be batched with
+        self.preprocessing_cache_size = preprocessing_cache_size  # max number of cached preprocessed sentences (0 disables the cache)
+        self.stem_cache_size = stem_cache_size  # max number of cached stemmed words, for all languages (0 disables the cache)
+        self.warmup_languages = warmup_languages if warmup_languages is not None else ['en']  # languages whose resources are loaded at startup
+
+
+def server_configuration_from_env() -> ServerConfiguration:
+    """Creates the server configuration from the XATKIT_NLU_* environment variables"""
+    configuration: ServerConfiguration = ServerConfiguration()
+    if os.environ.get('XATKIT_NLU_MODEL_STORE_PATH'):
+        configuration.model_store_path = os.environ['XATKIT_NLU_MODEL_STORE_PATH']
+    if os.environ.get('XATKIT_NLU_MODEL_STORE_LOAD_WORKERS'):
+        configuration.model_store_load_workers = int(os.environ['XATKIT_NLU_MODEL_STORE_LOAD_WORKERS'])
+    if os.environ.get('XATKIT_NLU_MEMORY_BUDGET_MB'):
+        configuration.memory_budget_mb = int(os.environ['XATKIT_NLU_MEMORY_BUDGET_MB'])
+    if os.environ.get('XATKIT_NLU_EVICTION_PATH'):
+        configuration.eviction_path = os.environ['XATKIT_NLU_EVICTION_PATH']
+    if os.environ.get('XATKIT_NLU_PREDICTION_CACHE_SIZE'):
+        configuration.prediction_cache_size = int(os.environ['XATKIT_NLU_PREDICTION_CACHE_SIZE'])
+    if os.environ.get('XATKIT_NLU_PREDICTION_CACHE_TTL'):
+        configuration.prediction_cache_ttl = float(os.environ['XATKIT_NLU_PREDICTION_CACHE_TTL'])
+    if os.environ.get('XATKIT_NLU_PREDICTION_CACHE_DATETIME_TTL'):
+        configuration.prediction_cache_datetime_ttl = float(os.environ['XATKIT_NLU_PREDICTION_CACHE_DATETIME_TTL'])
+    if os.environ.get('XATKIT_NLU_INFERENCE_BATCH_MAX_SIZE'):
+        configuration.inference_batch_max_size = int(os.environ['XATKIT_NLU_INFERENCE_BATCH_MAX_SIZE'])
+    if os.environ.get('XATKIT_NLU_INFERENCE_BATCH_MAX_WAIT_MS'):
+        configuration.inference_batch_max_wait_ms = float(os.environ['XATKIT_NLU_INFERENCE_BATCH_MAX_WAIT_MS'])
+    if os.environ.get('XATKIT_NLU_PREPROCESSING_CACHE_SIZE'):
+        configuration.preprocessing_cache_size = int(os.environ['XATKIT_NLU_PREPROCESSING_CACHE_SIZE'])
+    if os.environ.get('XATKIT_NLU_STEM_CACHE_SIZE'):
+        configuration.stem_cache_size = int(os.environ['XATKIT_NLU_STEM_CACHE_SIZE'])
+    if os.environ.get('XATKIT_NLU_WARMUP_LANGUAGES') is not None:
+        configuration.warmup_languages = [language.strip() for language in os.environ['XATKIT_NLU_WARMUP_LANGUAGES'].split(',')
+                                          if language.strip() != '']
+    return configuration
@@ -1,17 +1,26 @@
-from nltk import word_tokenize
-
+from xatkitnlu.core.lru_cache import LRUCache
 from xatkitnlu.core.nlp_configuration import NlpConfiguration
-from xatkitnlu.core.pipelines import create_or_get_stemmer, lang_map
+from xatkitnlu.core.pipelines import create_or_get_stemmer, create_or_get_word_tokenizer, lang_map
 from xatkitnlu.dsl.dsl import Intent, CustomEntity
 from xatkitnlu.utils.utils import replace_value_in_sentence
 
+# Disabled until configured (see LRUCache.configure)
+# Preprocessed sentences, keyed by sentence and the options the stemming depends on
+preprocessing_cache: LRUCache = LRUCache()
+# Stemmed words, keyed by stemmer language and word. Bots share a small vocabulary, so most words are already there
+stem_cache: LRUCache = LRUCache()
+
 
 def preprocess_text(text: str, configuration: NlpConfiguration) -> str:
-    preprocessed_sentence: str = text
-    preprocessed_sentence = preprocessed_sentence.replace('_', ' ')
-    if configuration.stemmer:
+    if not configuration.stemmer:
+        return text.replace('_', ' ')
+    key: tuple = (text, configuration.country, configuration.word_tokenizer)
+    preprocessed_sentence: str = preprocessing_cache.get(key)
+    if preprocessed_sentence is None:
+        preprocessed_sentence = text.replace('_', ' ')
         # TODO: remove punctuation signs
         preprocessed_sentence = stem_text(preprocessed_sentence, configuration)
+        preprocessing_cache.put(key, preprocessed_sentence)
     return preprocessed_sentence
 
 
@@ -44,11 +53,11 @@ def replace_ner_in_training_sentence(sentence: str, intent: Intent, configuratio
 
 
 def stem_text(text: str, configuration: NlpConfiguration) -> str:
-    tokens: list[str] = word_tokenize(text, language='english')
     # print(Stemmer.algorithms()) # Names of the languages supported by the stemmer
     stemmer_language: str = 'en'
     if configuration.country in lang_map:
         stemmer_language = lang_map[configuration.country]
+    tokens: list[str] = create_or_get_word_tokenizer(configuration.word_tokenizer, stemmer_language)(text)
 
     stemmer = create_or_get_stemmer(stemmer_language)
     stemmed_sentence: list[str] = []
@@ -57,7 +66,10 @@ def stem_text(text: str, configuration: NlpConfiguration) -> str:
     for word in tokens:
         stemmed_word: str = word
         if not word.isupper():
-            stemmed_word = stemmer.stem(word)
+            stemmed_word = stem_cache.get((stemmer_language, word))
+            if stemmed_word is None:
+                stemmed_word = stemmer.stem(word)
+                stem_cache.put((stemmer_language, word), stemmed_word)
         stemmed_sentence.append(stemmed_word)
 
     # stemmed_sentence: list[str] = stemmer.stemWords(tokens)
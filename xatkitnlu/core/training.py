@@ -1,7 +1,18 @@
 # import keras_preprocessing.text
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 from xatkitnlu.core.nlp_configuration import NlpConfiguration
+from xatkitnlu.core.numpy_inference import NumpyModel, quantization_report
+from xatkitnlu.core.prediction_cache import new_model_generation
 from xatkitnlu.core.text_preprocessing import preprocess_training_sentences, preprocess_custom_entity_entries
-from xatkitnlu.dsl.dsl import Bot, NLUContext, CustomEntity
+from xatkitnlu.core.vectorizer import Vectorizer
+from xatkitnlu.dsl.dsl import Bot, NLUContext, CustomEntity, Entity, Intent
 import tensorflow as tf
 import matplotlib
 matplotlib.use('Agg')
@@ -9,52 +20,397 @@ import matplotlib.pyplot as plt
 import numpy as np
 
 
-def train(bot: Bot):
-    for context in bot.contexts:
-        __train_context(context, bot.configuration)
-    for entity in bot.entities:
+# Options only used when predicting (or about how training is run), changing them does not require retraining
+PREDICTION_ONLY_OPTIONS: set[str] = {'region', 'timezone', 'discard_oov_sentences', 'check_exact_prediction_match',
+                                     'training_workers', 'training_intra_op_threads', 'incremental_training',
+                                     'incremental_epochs', 'training_prefetch', 'training_data_threads',
+                                     'ner_prefilters'}
+
+
+def train(bot: Bot, configuration: NlpConfiguration = None) -> dict[str, list[str]]:
+    """Trains the contexts of a bot, reusing the model of the previous training for the contexts that have not changed.
+
+    If a configuration is given, the bot is trained with it and it only becomes the configuration of the bot once all
+    the contexts are trained, so predictions running in the meantime keep using the previous configuration with the
+    previous models (and a failed training leaves the bot as it was).
+
+    Returns the names of the contexts that have been retrained and of those whose previous model has been reused
+    """
+    if configuration is None:
+        configuration = bot.configuration
+    # The bot may be initialized again while it is being trained (e.g. in a background training job), so it is trained
+    # as it was when the training started
+    with bot.lock:
+        contexts: list[NLUContext] = list(bot.contexts)
+        intents: list[Intent] = list(bot.intents)
+        entities: list[Entity] = list(bot.entities)
+        previous_trained_contexts: dict[str, NLUContext] = dict(bot.trained_contexts)
+    contexts_to_train: list[NLUContext] = []
+    reused_contexts: list[NLUContext] = []
+    fingerprints: dict[NLUContext, str] = {}
+    for context in contexts:
+        if len(context.intent_refs) == 0:
+            continue
+        fingerprints[context] = context_fingerprint(context, configuration)
+        trained_context: NLUContext = previous_trained_contexts.get(context.name)
+        if trained_context is not None and trained_context.fingerprint == fingerprints[context] and trained_context.is_trained():
+            reused_contexts.append(context)
+        else:
+            contexts_to_train.append(context)
+    warm_starts: dict[NLUContext, tuple[dict[str, int], list[np.ndarray], list[int]]] = {}
+    if configuration.incremental_training:
+        for context in contexts_to_train:
+            warm_start = __get_warm_start(context, previous_trained_contexts.get(context.name), configuration)
+            if warm_start is not None:
+                warm_starts[context] = warm_start
+    num_workers: int = min(configuration.training_workers, len(contexts_to_train), os.cpu_count() or 1)
+    trained_models: list[tuple] = []
+    if num_workers > 1:
+        trained_models = __train_contexts_in_parallel(contexts_to_train, configuration, num_workers, warm_starts)
+    else:
+        for context in contexts_to_train:
+            trained_models.append(__train_context(context, configuration, warm_starts.get(context)))
+    # The new models and the configuration they have been trained with are only attached to the bot once all the
+    # contexts are trained (and not while the bot is being initialized again)
+    with bot.lock:
+        bot.configuration = configuration
+        for trained_model in trained_models:
+            __set_trained_model(*trained_model)
+        for context in reused_contexts:
+            __reuse_trained_model(context, previous_trained_contexts.get(context.name))
+        preprocess_entities(bot, entities, intents)
+        # Only set once the contexts are trained, so a failed training is never taken as up to date
+        for context, fingerprint in fingerprints.items():
+            context.fingerprint = fingerprint
+        # If the bot has been initialized again in the meantime, these are the contexts the next training can reuse
+        set_trained_contexts(bot, contexts)
+    return {'retrained_contexts': [context.name for context in contexts_to_train],
+            'reused_contexts': [context.name for context in reused_contexts]}
+
+
+def preprocess_entities(bot: Bot, entities: list[Entity] = None, intents: list[Intent] = None):
+    """Preprocesses the custom entity entries and builds the entity value table (and matcher) of each intent used by NER
+    (of the given entities and intents, those of the bot by default)"""
+    for entity in entities if entities is not None else bot.entities:
         if isinstance(entity, CustomEntity):
             preprocess_custom_entity_entries(entity, bot.configuration)
+    for intent in intents if intents is not None else bot.intents:
+        # The preprocessed values may have changed (e.g. another language)
+        intent.clear_entity_value_tables()
+        intent.get_entity_value_matcher(bot.configuration.stemmer)
 
 
-def __train_context(context: NLUContext, configuration: NlpConfiguration):
-    if len(context.intent_refs) == 0:
+def set_trained_contexts(bot: Bot, contexts: list[NLUContext] = None):
+    """Keeps the trained contexts of the bot (or the given ones), so the next training can reuse them even if the bot
+    is initialized again"""
+    bot.trained_contexts = {}
+    for context in contexts if contexts is not None else bot.contexts:
+        if context.is_trained():
+            bot.trained_contexts.setdefault(context.name, context)
+
+
+def context_fingerprint(context: NLUContext, configuration: NlpConfiguration) -> str:
+    """Hash of everything the trained model of a context depends on: the training sentences and parameters of its
+    intents (in order, as it determines the output of the model), the entries of the custom entities they refer to and
+    the training options of the configuration"""
+    intents: list = []
+    for intent_ref in context.intent_refs:
+        parameters: list = []
+        for parameter in intent_ref.intent.parameters:
+            entries: list = None
+            if isinstance(parameter.entity, CustomEntity):
+                entries = [[entry.value, entry.synonyms] for entry in parameter.entity.entries]
+            parameters.append([parameter.name, parameter.fragment, parameter.entity.name, entries])
+        intents.append([intent_ref.intent.name, intent_ref.intent.training_sentences, parameters])
+    # Numbers are hashed as floats, as a configuration that went through a ConfigurationDTO may have 1.0 instead of 1
+    options: dict[str, object] = {option: float(value) if isinstance(value, int) and not isinstance(value, bool) else value
+                                  for option, value in configuration.__dict__.items()
+                                  if option not in PREDICTION_ONLY_OPTIONS}
+    fingerprint_data: str = json.dumps({'intents': intents, 'configuration': options}, sort_keys=True)
+    return hashlib.sha256(fingerprint_data.encode('utf-8')).hexdigest()
+
+
+def __reuse_trained_model(context: NLUContext, trained_context: NLUContext):
+    if context is trained_context:
         return
-    tokenizer = tf.keras.preprocessing.text.Tokenizer(num_words=configuration.num_words, lower=configuration.lower, oov_token=configuration.oov_token)
+    context.tokenizer = trained_context.tokenizer
+    context.vectorizer = trained_context.vectorizer
+    context.training_sentences = trained_context.training_sentences
+    context.training_sequences = trained_context.training_sequences
+    context.training_labels = trained_context.training_labels
+    context.exact_match_index = trained_context.exact_match_index
+    context.nlp_model = trained_context.nlp_model
+    context.numpy_model = trained_context.numpy_model
+    context.quantization_report = trained_context.quantization_report
+    context.training_epochs = trained_context.training_epochs
+    context.training_time = trained_context.training_time
+    context.training_samples_per_second = trained_context.training_samples_per_second
+    context.training_configuration = trained_context.training_configuration
+    context.trained_intent_names = trained_context.trained_intent_names
+    # The model is the same, but the intents of the new context are different objects
+    context.model_generation = new_model_generation()
+
+
+def __train_context(context: NLUContext, configuration: NlpConfiguration,
+                    warm_start: tuple[dict[str, int], list[np.ndarray], list[int]] = None) -> tuple:
+    """Trains the model of a context, returning the arguments of __set_trained_model to attach it to the context"""
+    total_training_sentences, total_labels_training_sentences = __get_training_data(context, configuration)
+    tokenizer, training_sequences, model, training_info = fit_context_model(total_training_sentences,
+                                                                            total_labels_training_sentences,
+                                                                            len(context.intent_refs), configuration, warm_start)
+    return (context, tokenizer, total_training_sentences, training_sequences, total_labels_training_sentences,
+            model.get_weights(), model, training_info, configuration)
+
+
+def __train_contexts_in_parallel(contexts: list[NLUContext], configuration: NlpConfiguration, num_workers: int,
+                                 warm_starts: dict[NLUContext, tuple[dict[str, int], list[np.ndarray], list[int]]]) -> list[tuple]:
+    """Trains each context in a separate worker process.
+
+    Contexts do not share any state, so the only work done here is preprocessing the training sentences (which updates
+    the intents) and rebuilding the results of the workers, returned as the arguments of __set_trained_model
+    """
+    trained_models: list[tuple] = []
+    training_data: list[tuple[list[str], list[int]]] = [__get_training_data(context, configuration) for context in contexts]
+    # Forking a process with a running TensorFlow runtime is not safe, so workers start from a clean interpreter
+    with ProcessPoolExecutor(max_workers=num_workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=__init_training_worker,
+                             initargs=(configuration.training_intra_op_threads,)) as executor:
+        futures = [executor.submit(__train_context_worker, sentences, labels, len(context.intent_refs), configuration,
+                                   warm_starts.get(context))
+                   for context, (sentences, labels) in zip(contexts, training_data)]
+        for context, (sentences, labels), future in zip(contexts, training_data, futures):
+            tokenizer_json, training_sequences, weights, training_info = future.result()
+            tokenizer = tf.keras.preprocessing.text.tokenizer_from_json(tokenizer_json)
+            trained_models.append((context, tokenizer, sentences, training_sequences, labels, weights, None, training_info,
+                                   configuration))
+    logging.info(f'{len(contexts)} contexts trained with {num_workers} workers')
+    return trained_models
+
+
+def __init_training_worker(intra_op_threads: int):
+    # Must be set before the TensorFlow runtime is initialized, i.e. before anything is trained in the worker
+    if intra_op_threads > 0:
+        tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+
+
+def __train_context_worker(training_sentences: list[str], training_labels: list[int], num_intents: int,
+                           configuration: NlpConfiguration,
+                           warm_start: tuple[dict[str, int], list[np.ndarray], list[int]]) -> tuple[str, np.ndarray, list[np.ndarray], dict[str, object]]:
+    # Keras objects are sent back in a serializable form and rebuilt in the parent process
+    tokenizer, training_sequences, model, training_info = fit_context_model(training_sentences, training_labels, num_intents,
+                                                                            configuration, warm_start)
+    return tokenizer.to_json(), training_sequences, model.get_weights(), training_info
+
+
+def __get_training_data(context: NLUContext, configuration: NlpConfiguration) -> tuple[list[str], list[int]]:
     total_training_sentences: list[str] = []
     total_labels_training_sentences: list[int] = []
-    for intent_ref in context.intent_refs:
+    for index_intent, intent_ref in enumerate(context.intent_refs):
         intent = intent_ref.intent
         preprocess_training_sentences(intent, configuration)
-        index_intent = context.intent_refs.index(intent_ref)
         total_training_sentences.extend(intent.processed_training_sentences)
         total_labels_training_sentences.extend([index_intent for i in range(len(intent.processed_training_sentences))])
+    return total_training_sentences, total_labels_training_sentences
+
 
-    tokenizer.fit_on_texts(total_training_sentences)
+def __set_trained_model(context: NLUContext, tokenizer: tf.keras.preprocessing.text.Tokenizer, training_sentences: list[str],
+                        training_sequences: np.ndarray, training_labels: list[int], weights: list[np.ndarray],
+                        model: tf.keras.models, training_info: dict[str, object], configuration: NlpConfiguration):
+    # The context is only updated once the model is trained, so predictions running in the meantime (e.g. while a
+    # background training job is running) keep using the previous model
     context.tokenizer = tokenizer
-    context.training_sentences = total_training_sentences
-    context.training_sequences = tf.keras.preprocessing.sequence.pad_sequences(tokenizer.texts_to_sequences(total_training_sentences),
-                                                                               padding='post', truncating='post', maxlen=configuration.input_max_num_tokens)
-    context.training_labels = total_labels_training_sentences
+    context.vectorizer = Vectorizer.from_tokenizer(tokenizer)
+    context.training_sentences = training_sentences
+    context.training_sequences = training_sequences if configuration.keep_training_sequences else []
+    context.training_labels = training_labels
+    context.exact_match_index = build_exact_match_index(training_sequences, training_labels)
+    set_context_model(context, weights, configuration, model)
+    context.training_configuration = configuration
+    context.trained_intent_names = [intent_ref.intent.name for intent_ref in context.intent_refs]
+    context.training_epochs = training_info['epochs']
+    context.training_time = training_info['time']
+    context.training_samples_per_second = training_info['samples_per_second']
+    context.quantization_report = None
+    if context.numpy_model is not None and configuration.model_quantization is not None:
+        # Only the quantized model is kept, so this is the only chance to compare it with the float one
+        context.quantization_report = quantization_report(NumpyModel.from_weights(weights, configuration),
+                                                          context.numpy_model, training_sequences, training_labels)
+        logging.info(f'Context {context.name} quantized: {context.quantization_report}')
+    context.model_generation = new_model_generation()
 
+
+def set_context_model(context: NLUContext, weights: list[np.ndarray], configuration: NlpConfiguration,
+                      model: tf.keras.models = None):
+    """Sets the trained model of a context in the form used by the inference backend of the configuration.
+
+    Only one copy of the model is kept in memory: the (optionally quantized) NumPy model with the 'numpy' backend, the
+    Keras model otherwise. The Keras model is created from the weights when it is not given
+    """
+    if configuration.inference_backend == 'numpy':
+        numpy_model: NumpyModel = NumpyModel.from_weights(weights, configuration)
+        if configuration.model_quantization is not None:
+            numpy_model = numpy_model.quantize(configuration.model_quantization)
+        context.numpy_model = numpy_model
+        context.nlp_model = None
+    else:
+        if model is None:
+            model = create_model(len(context.intent_refs), configuration)
+            model.set_weights(weights)
+        context.nlp_model = model
+        context.numpy_model = None
+
+
+def build_exact_match_index(training_sequences: np.ndarray, training_labels: list[int]) -> dict[bytes, int]:
+    """Maps each padded training sequence to its label, so predictions can check for an exact match in O(1)"""
+    exact_match_index: dict[bytes, int] = {}
+    for training_sequence, label in zip(training_sequences, training_labels):
+        # If two training sentences have the same sequence, the first one wins (as it did in a sequential search)
+        exact_match_index.setdefault(np.asarray(training_sequence, dtype=np.int32).tobytes(), int(label))
+    return exact_match_index
+
+
+def create_model(num_intents: int, configuration: NlpConfiguration) -> tf.keras.models:
     model: tf.keras.models = tf.keras.Sequential([
         tf.keras.layers.Embedding(input_dim=configuration.num_words, output_dim=configuration.embedding_dim, input_length=configuration.input_max_num_tokens),
         tf.keras.layers.GlobalAveragePooling1D(),
         tf.keras.layers.Dense(24, activation=configuration.activation_hidden_layers),  # tanh is also a valid alternative for these intermediate layers
         tf.keras.layers.Dense(24, activation=configuration.activation_hidden_layers),
-        tf.keras.layers.Dense(len(context.intent_refs), activation=configuration.activation_last_layer)  # choose sigmoid if, in your scenario, a sentence could possibly match several intents
+        tf.keras.layers.Dense(num_intents, activation=configuration.activation_last_layer)  # choose sigmoid if, in your scenario, a sentence could possibly match several intents
     ])
     model.compile(loss=tf.keras.losses.SparseCategoricalCrossentropy(), optimizer='adam', metrics=['accuracy'])
-    context.nlp_model = model
+    return model
+
+
+def fit_context_model(training_sentences: list[str], training_labels: list[int], num_intents: int,
+                      configuration: NlpConfiguration,
+                      warm_start: tuple[dict[str, int], list[np.ndarray], list[int]] = None) -> tuple[tf.keras.preprocessing.text.Tokenizer, np.ndarray, tf.keras.models, dict[str, object]]:
+    """Fits a tokenizer and a model on the training data, returning them with the number of epochs run, the time taken
+    by the fit and its throughput.
+
+    With a warm start (see __get_warm_start), the model starts from the weights of the previous model of the context and
+    is only fine-tuned for incremental_epochs, unless the new vocabulary does not fit in the previous one
+    """
+    tokenizer = tf.keras.preprocessing.text.Tokenizer(num_words=configuration.num_words, lower=configuration.lower, oov_token=configuration.oov_token)
+    tokenizer.fit_on_texts(training_sentences)
+    initial_weights: list[np.ndarray] = None
+    if warm_start is not None:
+        initial_weights = __warm_start_weights(tokenizer, num_intents, configuration, *warm_start)
+    training_sequences = tf.keras.preprocessing.sequence.pad_sequences(tokenizer.texts_to_sequences(training_sentences),
+                                                                       padding='post', truncating='post', maxlen=configuration.input_max_num_tokens)
+
+    model: tf.keras.models = create_model(num_intents, configuration)
+    epochs: int = configuration.num_epochs
+    if initial_weights is not None:
+        model.set_weights(initial_weights)
+        epochs = configuration.incremental_epochs
 
     # print("Model summary: ")
     # model.summary()
 
+    callbacks: list[tf.keras.callbacks.Callback] = []
+    if configuration.early_stopping:
+        callbacks.append(tf.keras.callbacks.EarlyStopping(monitor=configuration.early_stopping_monitor,
+                                                          patience=configuration.early_stopping_patience,
+                                                          min_delta=configuration.early_stopping_min_delta))
+    if configuration.training_time_budget > 0:
+        callbacks.append(TrainingTimeBudget(configuration.training_time_budget))
+
     # np conversion is needed to get it to work with TensorFlow 2.x
-    history = model.fit(np.array(context.training_sequences), np.array(context.training_labels), epochs=configuration.num_epochs, verbose=0)
+    x: np.ndarray = np.asarray(training_sequences, dtype=np.int32)
+    y: np.ndarray = np.asarray(training_labels, dtype=np.int32)
+    start: float = time.perf_counter()
+    if configuration.training_prefetch:
+        history = model.fit(__training_dataset(x, y, configuration), epochs=epochs, verbose=0, callbacks=callbacks)
+    else:
+        history = model.fit(x, y, batch_size=configuration.training_batch_size, shuffle=configuration.training_shuffle,
+                            epochs=epochs, verbose=0, callbacks=callbacks)
+    training_time: float = time.perf_counter() - start
+    epochs_run: int = len(history.history['loss'])
+    training_info: dict[str, object] = {'epochs': epochs_run,
+                                        'time': training_time,
+                                        'samples_per_second': len(x) * epochs_run / training_time if training_time > 0 else None}
 
     # plot_training_graphs_without_validation(history, "accuracy")
     # plot_training_graphs_without_validation(history, "loss")
+    return tokenizer, training_sequences, model, training_info
+
+
+def __training_dataset(x: np.ndarray, y: np.ndarray, configuration: NlpConfiguration) -> tf.data.Dataset:
+    # The training data is small, so it is cached in memory and the next batch is prepared while one is being trained
+    dataset: tf.data.Dataset = tf.data.Dataset.from_tensor_slices((x, y)).cache()
+    if configuration.training_shuffle:
+        dataset = dataset.shuffle(len(x), reshuffle_each_iteration=True)
+    dataset = dataset.batch(configuration.training_batch_size).prefetch(tf.data.AUTOTUNE)
+    if configuration.training_data_threads > 0:
+        options: tf.data.Options = tf.data.Options()
+        options.threading.private_threadpool_size = configuration.training_data_threads
+        dataset = dataset.with_options(options)
+    return dataset
+
+
+class TrainingTimeBudget(tf.keras.callbacks.Callback):
+    """Stops the training once an epoch ends after the given number of seconds since the training started"""
+
+    def __init__(self, time_budget: float):
+        super().__init__()
+        self.time_budget: float = time_budget
+        self.start: float = None
+
+    def on_train_begin(self, logs=None):
+        self.start = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        if time.perf_counter() - self.start > self.time_budget:
+            self.model.stop_training = True
+
+
+def __get_warm_start(context: NLUContext, trained_context: NLUContext,
+                     configuration: NlpConfiguration) -> tuple[dict[str, int], list[np.ndarray], list[int]]:
+    """Returns what is needed to start training a context from its previous model (i.e. the vocabulary and weights of
+    the previous model and, for each intent of the context, its output unit in the previous model), or None if there
+    is no previous model to start from"""
+    if trained_context is None or not trained_context.is_trained() or trained_context.tokenizer is None:
+        return None
+    if trained_context.tokenizer.oov_token != configuration.oov_token or trained_context.tokenizer.lower != configuration.lower:
+        return None
+    output_units: list[int] = [trained_context.trained_intent_names.index(intent_ref.intent.name)
+                               if intent_ref.intent.name in trained_context.trained_intent_names else None
+                               for intent_ref in context.intent_refs]
+    return dict(trained_context.tokenizer.word_index), trained_context.get_model_weights(), output_units
+
+
+def __warm_start_weights(tokenizer: tf.keras.preprocessing.text.Tokenizer, num_intents: int,
+                         configuration: NlpConfiguration, previous_word_index: dict[str, int],
+                         previous_weights: list[np.ndarray], output_units: list[int]) -> list[np.ndarray]:
+    """Adapts the tokenizer and the previous weights to the new training data, or returns None if they cannot be reused.
+
+    Words keep the index (i.e. the embedding row) they had, new words are added after them. The hidden layers are kept
+    as they are, and so are the output units of the intents that were already in the previous model. Everything else
+    starts from the initial weights of a new model
+    """
+    weights: list[np.ndarray] = create_model(num_intents, configuration).get_weights()
+    if [w.shape for w in previous_weights[:-2]] != [w.shape for w in weights[:-2]]:
+        # The model has a different architecture (e.g. embedding_dim has changed)
+        return None
+    word_index: dict[str, int] = dict(previous_word_index)
+    for word in tokenizer.word_index.keys():
+        if word not in word_index:
+            word_index[word] = len(word_index) + 1
+            if word_index[word] >= configuration.num_words:
+                # New words would be out of vocabulary, only a full training can make room for them
+                return None
+    tokenizer.word_index = word_index
+    tokenizer.index_word = {index: word for word, index in word_index.items()}
+
+    previous_rows: int = min(len(previous_word_index) + 1, configuration.num_words)
+    weights[0][:previous_rows] = previous_weights[0][:previous_rows]
+    weights[1:-2] = previous_weights[1:-2]
+    for unit, previous_unit in enumerate(output_units):
+        if previous_unit is not None:
+            weights[-2][:, unit] = previous_weights[-2][:, previous_unit]
+            weights[-1][unit] = previous_weights[-1][previous_unit]
+    logging.info(f'Training started from the previous model, with {len(word_index) - len(previous_word_index)} new words')
+    return weights
 
 
 def plot_training_graphs_with_validation(history, metric: str):
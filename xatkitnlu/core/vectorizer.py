@@ -0,0 +1,56 @@
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import tensorflow as tf
+
+
+class Vectorizer:
+    """Turns texts into the padded sequences fed to the model, as texts_to_sequences followed by a post padding and
+    truncating pad_sequences would do with the fitted tokenizer, but in a single pass and without the Keras overhead.
+
+    The vocabulary is compiled once (words beyond num_words are already mapped to the OOV index), so vectorizing a text
+    is a translate, a split and a dict lookup per word
+    """
+
+    def __init__(self, word_index: dict[str, int], num_words: int = None, oov_token: str = None, lower: bool = True,
+                 filters: str = '!"#$%&()*+,-./:;<=>?@[\\]^_`{|}~\t\n', split: str = ' '):
+        self.oov_index: int = word_index.get(oov_token) if oov_token is not None else None
+        self.vocabulary: dict[str, int] = {}
+        for word, index in word_index.items():
+            if num_words and index >= num_words:
+                # Keras replaces the words out of the num_words most frequent ones by the OOV token (if any)
+                if self.oov_index is not None:
+                    self.vocabulary[word] = self.oov_index
+            else:
+                self.vocabulary[word] = index
+        self.lower: bool = lower
+        self.split: str = split
+        self.translation: dict[int, str] = str.maketrans({c: split for c in filters})
+
+    @staticmethod
+    def from_tokenizer(tokenizer: 'tf.keras.preprocessing.text.Tokenizer') -> 'Vectorizer':
+        return Vectorizer(tokenizer.word_index, tokenizer.num_words, tokenizer.oov_token, tokenizer.lower,
+                          tokenizer.filters, tokenizer.split)
+
+    def text_to_sequence(self, text: str) -> list[int]:
+        if self.lower:
+            text = text.lower()
+        get = self.vocabulary.get
+        oov_index: int = self.oov_index
+        return [index for index in (get(word, oov_index) for word in text.translate(self.translation).split(self.split) if word)
+                if index is not None]
+
+    def vectorize(self, texts: list[str], maxlen: int) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the padded int32 sequences of the texts, and for each text whether all its tokens (before
+        truncating) have index 1, i.e. the text only has out of vocabulary words (or no words at all)
+        """
+        padded: np.ndarray = np.zeros((len(texts), maxlen), dtype=np.int32)
+        oov_only: np.ndarray = np.zeros(len(texts), dtype=bool)
+        for row, text in enumerate(texts):
+            sequence: list[int] = self.text_to_sequence(text)
+            oov_only[row] = all(i == 1 for i in sequence)
+            sequence = sequence[:maxlen]
+            padded[row, :len(sequence)] = sequence
+        return padded, oov_only
@@ -0,0 +1,63 @@
+import logging
+import threading
+import time
+
+from xatkitnlu.core.ner.base.datetime import ner_datetime
+from xatkitnlu.core.ner.base.number import ner_number
+from xatkitnlu.core.nlp_configuration import NlpConfiguration
+from xatkitnlu.core.pipelines import create_or_get_word_tokenizer, lang_map
+from xatkitnlu.core.text_preprocessing import preprocess_text
+
+
+def warm_up_language(language: str):
+    """Loads the resources of a language (stemmer, NLTK tokenizer, number and date parsers) by preprocessing a dummy
+    sentence and running the base entity NER on it"""
+    configuration: NlpConfiguration = NlpConfiguration(country=language)
+    preprocess_text('warming up 1 2 3', configuration)
+    create_or_get_word_tokenizer('regex', lang_map.get(language, 'english'))
+    ner_number('one two three', configuration)
+    ner_datetime('warming up 1 2 3', configuration)
+
+
+class WarmUp:
+    """Warms up a list of languages in a background thread, so the first predictions in these languages do not have to
+    wait for their resources to be loaded"""
+
+    def __init__(self):
+        self.lock: threading.Lock = threading.Lock()
+        self.languages: list[str] = []
+        self.timings: dict[str, float] = {}  # seconds taken to warm up each language
+        self.errors: dict[str, str] = {}
+        self.done: threading.Event = threading.Event()
+
+    def start(self, languages: list[str]) -> threading.Thread:
+        self.languages = languages
+        thread: threading.Thread = threading.Thread(target=self.run, args=(languages,), name='warm-up', daemon=True)
+        thread.start()
+        return thread
+
+    def run(self, languages: list[str]):
+        self.languages = languages
+        for language in languages:
+            start: float = time.perf_counter()
+            try:
+                warm_up_language(language)
+            except Exception as e:
+                # A language that fails to warm up is loaded on its first prediction, as if it was not configured
+                logging.warning(f'Warm up of language {language} failed: {e}')
+                with self.lock:
+                    self.errors[language] = str(e)
+            with self.lock:
+                self.timings[language] = time.perf_counter() - start
+            logging.info(f'Language {language} warmed up in {self.timings[language]:.2f} seconds')
+        self.done.set()
+
+    def is_ready(self) -> bool:
+        return self.done.is_set()
+
+    def stats(self) -> dict[str, object]:
+        with self.lock:
+            return {'ready': self.done.is_set(),
+                    'languages': self.languages,
+                    'timings': dict(self.timings),
+                    'errors': dict(self.errors)}
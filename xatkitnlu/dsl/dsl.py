@@ -1,7 +1,17 @@
+import copy
+import threading
 import uuid
-import tensorflow as tf
+from typing import TYPE_CHECKING
+import numpy as np
 
 from xatkitnlu.core.nlp_configuration import NlpConfiguration
+from xatkitnlu.core.numpy_inference import NumpyModel
+from xatkitnlu.core.vectorizer import Vectorizer
+from xatkitnlu.utils.value_matcher import ValueMatcher
+
+if TYPE_CHECKING:
+    # Only for the annotations, so predicting with the numpy backend does not need to load TensorFlow
+    import tensorflow as tf
 
 
 class Entity:
@@ -59,12 +69,16 @@ class Intent:
         # list of references to entities used in the Intent
         # we are going to assume that two intents in the same context do not have parameters with the same name unless they refer to the same entity type
         self.parameters: list[IntentParameter] = []
+        # get_custom_entity_values_dict items sorted as NER checks them, for preprocessed and original values
+        self.entity_value_tables: dict[bool, list[tuple[str, tuple[list[IntentParameter], str]]]] = {}
+        self.entity_value_matchers: dict[bool, ValueMatcher] = {}  # matcher of the values of each table
 
     def add_training_sentence(self, sentence: str):
         self.training_sentences.append(sentence)
 
     def add_parameter(self, parameter: IntentParameter):
         self.parameters.append(parameter)
+        self.clear_entity_value_tables()
 
     def get_custom_entity_values_dict(self, preprocessed_values: bool = False) -> dict[str, tuple[list[IntentParameter], str]]:
         # {value/synonym: ([entity_refs], value)}
@@ -111,6 +125,27 @@ class Intent:
                         all_entity_values[v] = (entity_refs.copy(), value)
         return all_entity_values
 
+    def get_entity_value_table(self, preprocessed_values: bool = False) -> list[tuple[str, tuple[list[IntentParameter], str]]]:
+        # The custom entity values, longest first, so that NER matches the longest value when values overlap
+        # Built once (at training time) as it only depends on the entity entries
+        table: list[tuple[str, tuple[list[IntentParameter], str]]] = self.entity_value_tables.get(preprocessed_values)
+        if table is None:
+            table = sorted(self.get_custom_entity_values_dict(preprocessed_values).items(),
+                           key=lambda x: (len(x[0]), x[0].casefold()), reverse=True)
+            self.entity_value_tables[preprocessed_values] = table
+        return table
+
+    def get_entity_value_matcher(self, preprocessed_values: bool = False) -> ValueMatcher:
+        matcher: ValueMatcher = self.entity_value_matchers.get(preprocessed_values)
+        if matcher is None:
+            matcher = ValueMatcher([value for value, _ in self.get_entity_value_table(preprocessed_values)])
+            self.entity_value_matchers[preprocessed_values] = matcher
+        return matcher
+
+    def clear_entity_value_tables(self):
+        self.entity_value_tables = {}
+        self.entity_value_matchers = {}
+
     def __repr__(self):
         return f'Intent({self.name},{self.training_sentences},{self.parameters})'
 
@@ -128,18 +163,47 @@ class NLUContext:
     def __init__(self, name: str):
         self.name: str = name
         self.intent_refs: list[IntentReference] = []
-        self.tokenizer: tf.keras.preprocessing.text.Tokenizer = None
+        self.tokenizer: 'tf.keras.preprocessing.text.Tokenizer' = None
+        self.vectorizer: Vectorizer = None  # compiled from the tokenizer, turns the sentences to predict into model inputs
         self.training_sentences: list[str] = []
         self.training_sequences: list[int] = []
         self.training_labels: list[int] = []
-        self.nlp_model: tf.keras.models = None
+        self.exact_match_index: dict[bytes, int] = {}  # label of each padded training sequence (as bytes)
+        self.nlp_model: 'tf.keras.models' = None
+        self.numpy_model: NumpyModel = None  # model used by the 'numpy' inference backend (instead of nlp_model)
+        self.quantization_report: dict[str, object] = None  # accuracy of the quantized numpy_model vs the float one
+        self.fingerprint: str = None  # hash of the training data and options of the model (see training.context_fingerprint)
+        self.training_configuration: NlpConfiguration = None  # configuration the model has been trained (or restored) with
+        self.trained_intent_names: list[str] = []  # name of the intent of each output unit of the model
+        self.training_epochs: int = None  # number of epochs run by the last training (less than num_epochs if stopped early)
+        self.training_time: float = None  # seconds taken by the last training
+        self.training_samples_per_second: float = None  # training throughput of the last training (samples x epochs / time)
+        self.model_generation: int = None  # changes every time a new model is attached to the context
+        self.intent_indexes: dict[Intent, int] = {}  # position of each intent in intent_refs (i.e. in the model output)
 
     def add_intent_ref(self, intent_ref: IntentReference):
         self.intent_refs.append(intent_ref)
+        self.intent_indexes.setdefault(intent_ref.intent, len(self.intent_refs) - 1)
 
     def get_intents(self):
         return [intent_ref.intent for intent_ref in self.intent_refs]
 
+    def get_intent_index(self, intent: Intent) -> int:
+        return self.intent_indexes[intent]
+
+    def get_exact_match(self, padded_sequence) -> int:
+        # Returns the label of the training sentence with the same padded sequence, if any
+        return self.exact_match_index.get(np.asarray(padded_sequence, dtype=np.int32).tobytes())
+
+    def is_trained(self) -> bool:
+        return self.nlp_model is not None or self.numpy_model is not None
+
+    def get_model_weights(self) -> list:
+        # Weights in the Keras format, whatever the model kept by the context
+        if self.nlp_model is not None:
+            return self.nlp_model.get_weights()
+        return self.numpy_model.get_weights()
+
     def __repr__(self):
         return f'Context({self.name},{self.intent_refs})'
 
@@ -154,34 +218,48 @@ class Bot:
         self.intents: list[Intent] = []
         self.contexts: list[NLUContext] = []
         self.configuration: NlpConfiguration = configuration
+        # Indexes to find elements by name, if 2 elements have the same name the first one added is returned
+        self.contexts_by_name: dict[str, NLUContext] = {}
+        self.intents_by_name: dict[str, Intent] = {}
+        self.entities_by_name: dict[str, Entity] = {}
+        # Contexts of the last training by name, kept when the bot is initialized again so unchanged contexts do not
+        # need to be retrained
+        self.trained_contexts: dict[str, NLUContext] = {}
+        # Held while the bot is initialized and while the result of a training is attached to it, so a training
+        # running in the background never mixes the contexts of 2 initializations
+        self.lock: threading.RLock = threading.RLock()
 
     def add_context(self, context: NLUContext):
         self.contexts.append(context)
+        self.contexts_by_name.setdefault(context.name, context)
 
     def add_intent(self, intent: Intent):
         self.intents.append(intent)
+        self.intents_by_name.setdefault(intent.name, intent)
 
     def add_entity(self, entity: Entity):
         self.entities.append(entity)
+        self.entities_by_name.setdefault(entity.name, entity)
 
-    # For testing
-    def get_context(self, name: str):
-        for context in self.contexts:
-            if context.name == name:
-                return context
-        return None
-
-    def get_intent(self, name: str):
+    def clear(self):
+        """Removes all the contexts, intents and entities of the bot"""
         for intent in self.intents:
-            if intent.name == name:
-                return intent
-        return None
+            intent.clear_entity_value_tables()
+        self.contexts = []
+        self.intents = []
+        self.entities = []
+        self.contexts_by_name = {}
+        self.intents_by_name = {}
+        self.entities_by_name = {}
+
+    def get_context(self, name: str) -> NLUContext:
+        return self.contexts_by_name.get(name)
+
+    def get_intent(self, name: str) -> Intent:
+        return self.intents_by_name.get(name)
 
-    def get_entity(self, name: str):
-        for entity in self.entities:
-            if entity.name == name:
-                return entity
-        return None
+    def get_entity(self, name: str) -> Entity:
+        return self.entities_by_name.get(name)
 
     def __repr__(self):
         return f'Bot({self.bot_id},{self.name},{self.contexts})'
@@ -194,6 +272,9 @@ class MatchedParameter:
         self.value = value
         self.info = info
 
+    def copy(self) -> 'MatchedParameter':
+        return MatchedParameter(self.name, self.value, dict(self.info))
+
 
 class Classification:
 
@@ -206,15 +287,33 @@ class Classification:
         # if matched_parameters is None:
         #     self.matched_parameters: list[MatchedParameter] = []
 
+    def copy(self) -> 'Classification':
+        matched_parameters: list[MatchedParameter] = None
+        if self.matched_parameters is not None:
+            matched_parameters = [matched_parameter.copy() for matched_parameter in self.matched_parameters]
+        return Classification(self.intent, self.score, self.matched_utterance, matched_parameters)
+
 
 class PredictResult:
 
     def __init__(self, context: NLUContext):
         self.classifications: list[Classification] = []
+        self.classifications_by_intent: dict[Intent, Classification] = {}
         for intent in context.get_intents():
-            self.classifications.append(Classification(intent))
+            classification: Classification = Classification(intent)
+            self.classifications.append(classification)
+            self.classifications_by_intent.setdefault(intent, classification)
 
     def get_classification(self, intent: Intent) -> Classification:
+        return self.classifications_by_intent.get(intent)
+
+    def copy(self) -> 'PredictResult':
+        """Returns a copy of the result (and its classifications) that can be modified without changing this one"""
+        predict_result: PredictResult = copy.copy(self)
+        predict_result.classifications = []
+        predict_result.classifications_by_intent = {}
         for classification in self.classifications:
-            if classification.intent == intent:
-                return classification
+            classification = classification.copy()
+            predict_result.classifications.append(classification)
+            predict_result.classifications_by_intent.setdefault(classification.intent, classification)
+        return predict_result
@@ -2,7 +2,7 @@ from pydantic import BaseModel
 from typing import Optional
 from xatkitnlu.core.nlp_configuration import NlpConfiguration
 from xatkitnlu.dsl.dsl import Bot, NLUContext, Intent, Entity, CustomEntity, CustomEntityEntry, IntentParameter, \
-    BaseEntity, IntentReference
+    BaseEntity, IntentReference, PredictResult
 
 
 class OurBaseModel(BaseModel):
@@ -85,6 +85,15 @@ class PredictResultDTO(BaseModel):
     classifications: list[ClassificationDTO] = []
 
 
+class PredictBatchRequestDTO(BaseModel):
+    requests: list[PredictRequestDTO] = []
+
+
+class PredictBatchResultDTO(BaseModel):
+    # results are in the same order as the requests
+    results: list[PredictResultDTO] = []
+
+
 class ConfigurationDTO(BaseModel):
     country: Optional[str]
     region: Optional[str]
@@ -101,12 +110,28 @@ class ConfigurationDTO(BaseModel):
     use_ner_in_prediction: Optional[bool]  # whether to use NER in the prediction
     activation_last_layer: Optional[str] # The activation function of the last layer
     activation_hidden_layers: Optional[str]  # The activation function of the hidden layers
+    training_workers: Optional[int]  # Number of worker processes training the contexts of a bot in parallel
+    training_intra_op_threads: Optional[int]  # Max number of threads used by TensorFlow ops in each training worker process
+    inference_backend: Optional[str]  # Engine running the model in predictions: 'keras' or 'numpy'
+    model_quantization: Optional[str]  # Quantization of the embeddings of the 'numpy' backend: 'float16' or 'int8'
+    keep_training_sequences: Optional[bool]  # whether to keep the padded training sequences in memory after training
+    incremental_training: Optional[bool]  # whether to start training a context from its previous model
+    incremental_epochs: Optional[int]  # Number of epochs to be run when training starts from the previous model
+    early_stopping: Optional[bool]  # whether to stop training a context when the monitored metric stops improving
+    early_stopping_monitor: Optional[str]  # metric monitored by early stopping: 'loss' or 'accuracy'
+    early_stopping_patience: Optional[int]  # Number of epochs without improvement after which training is stopped
+    early_stopping_min_delta: Optional[float]  # Min change of the monitored metric to count as an improvement
+    training_time_budget: Optional[float]  # Max seconds to train a context (0 means no limit)
+    training_batch_size: Optional[int]  # Number of training sentences per gradient update
+    training_shuffle: Optional[bool]  # whether to shuffle the training sentences before each epoch
+    training_prefetch: Optional[bool]  # whether to feed training through a tf.data pipeline that prefetches the next batches
+    training_data_threads: Optional[int]  # Number of threads of the tf.data pipeline when training_prefetch is on
+    word_tokenizer: Optional[str]  # tokenizer splitting sentences in words before stemming: 'nltk' or 'regex'
+    ner_prefilters: Optional[bool]  # whether to skip the number and datetime parsers in sentences that cannot have them
 
 def botdto_to_bot(botdto: BotDTO, bot: Bot):
     """Creates an internal bot representation from a botDTO object """
-    bot.contexts = []
-    bot.intents = []
-    bot.entities = []
+    bot.clear()
     for entity in botdto.entities:
         bot.add_entity(entitydto_to_entity(entity))
     for intent in botdto.intents:
@@ -115,6 +140,24 @@ def botdto_to_bot(botdto: BotDTO, bot: Bot):
         bot.add_context(contextdto_to_context(context, bot))
 
 
+def bot_to_botdto(bot: Bot) -> BotDTO:
+    """Creates a botDTO object from an internal bot representation (the reverse of botdto_to_bot)"""
+    botdto: BotDTO = BotDTO(name=bot.name)
+    for entity in bot.entities:
+        entries: list[CustomEntityEntryDTO] = []
+        if isinstance(entity, CustomEntity):
+            entries = [CustomEntityEntryDTO(value=entry.value, synonyms=entry.synonyms) for entry in entity.entries]
+        botdto.entities.append(EntityDTO(name=entity.name, entries=entries))
+    for intent in bot.intents:
+        parameters: list[IntentParameterDTO] = [IntentParameterDTO(name=parameter.name, fragment=parameter.fragment, entity=parameter.entity.name)
+                                                for parameter in intent.parameters]
+        botdto.intents.append(IntentDTO(name=intent.name, training_sentences=intent.training_sentences, parameters=parameters))
+    for context in bot.contexts:
+        intent_refs: list[IntentReferenceDTO] = [IntentReferenceDTO(intent=intent_ref.intent.name) for intent_ref in context.intent_refs]
+        botdto.contexts.append(NLUContextDTO(name=context.name, intent_refs=intent_refs))
+    return botdto
+
+
 def contextdto_to_context(contextdto: NLUContextDTO, bot: Bot) -> NLUContext:
     context: NLUContext = NLUContext(contextdto.name)
     for intentrefdto in contextdto.intent_refs:
@@ -162,17 +205,11 @@ def intent_parameterdto_to_intent_parameter(parameterdto: IntentParameterDTO, bo
 
 
 def find_entity_in_bot_by_name(name: str, bot: Bot) -> Entity:
-    for entity in bot.entities:
-        if entity.name == name:
-            return entity
-    return None
+    return bot.get_entity(name)
 
 
 def find_intent_in_bot_by_name(name: str, bot: Bot) -> Intent:
-    for intent in bot.intents:
-        if intent.name == name:
-            return intent
-    return None
+    return bot.get_intent(name)
 
 
 def configurationdto_to_configuration(configurationdto: ConfigurationDTO) -> NlpConfiguration:
@@ -207,4 +244,57 @@ def configurationdto_to_configuration(configurationdto: ConfigurationDTO) -> Nlp
         configuration.activation_last_layer = configurationdto.activation_last_layer
     if configurationdto.activation_hidden_layers is not None:
         configuration.activation_hidden_layers = configurationdto.activation_hidden_layers
+    if configurationdto.training_workers is not None:
+        configuration.training_workers = configurationdto.training_workers
+    if configurationdto.training_intra_op_threads is not None:
+        configuration.training_intra_op_threads = configurationdto.training_intra_op_threads
+    if configurationdto.inference_backend is not None:
+        configuration.inference_backend = configurationdto.inference_backend
+    if configurationdto.model_quantization is not None:
+        configuration.model_quantization = configurationdto.model_quantization
+    if configurationdto.keep_training_sequences is not None:
+        configuration.keep_training_sequences = configurationdto.keep_training_sequences
+    if configurationdto.incremental_training is not None:
+        configuration.incremental_training = configurationdto.incremental_training
+    if configurationdto.incremental_epochs is not None:
+        configuration.incremental_epochs = configurationdto.incremental_epochs
+    if configurationdto.early_stopping is not None:
+        configuration.early_stopping = configurationdto.early_stopping
+    if configurationdto.early_stopping_monitor is not None:
+        configuration.early_stopping_monitor = configurationdto.early_stopping_monitor
+    if configurationdto.early_stopping_patience is not None:
+        configuration.early_stopping_patience = configurationdto.early_stopping_patience
+    if configurationdto.early_stopping_min_delta is not None:
+        configuration.early_stopping_min_delta = configurationdto.early_stopping_min_delta
+    if configurationdto.training_time_budget is not None:
+        configuration.training_time_budget = configurationdto.training_time_budget
+    if configurationdto.training_batch_size is not None:
+        configuration.training_batch_size = configurationdto.training_batch_size
+    if configurationdto.training_shuffle is not None:
+        configuration.training_shuffle = configurationdto.training_shuffle
+    if configurationdto.training_prefetch is not None:
+        configuration.training_prefetch = configurationdto.training_prefetch
+    if configurationdto.training_data_threads is not None:
+        configuration.training_data_threads = configurationdto.training_data_threads
+    if configurationdto.word_tokenizer is not None:
+        configuration.word_tokenizer = configurationdto.word_tokenizer
+    if configurationdto.ner_prefilters is not None:
+        configuration.ner_prefilters = configurationdto.ner_prefilters
     return configuration
+
+
+def predict_result_to_predict_resultdto(prediction: PredictResult) -> PredictResultDTO:
+    # order of prediction values (classifications) matches order of intents.
+    prediction_dto: PredictResultDTO = PredictResultDTO()
+    for classification in prediction.classifications:
+        classification_dto: ClassificationDTO = ClassificationDTO(intent=classification.intent.name,
+                                                                  score=classification.score,
+                                                                  matched_utterance=classification.matched_utterance,
+                                                                  matched_parameters=[MatchedParameterDTO(name=mp.name, value=mp.value, info=mp.info) for mp in classification.matched_parameters])
+        prediction_dto.classifications.append(classification_dto)
+    return prediction_dto
+
+
+def configuration_to_configurationdto(configuration: NlpConfiguration) -> ConfigurationDTO:
+    # Both classes use the same attribute names
+    return ConfigurationDTO(**configuration.__dict__)
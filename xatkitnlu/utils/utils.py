@@ -15,13 +15,3 @@ def replace_value_in_sentence(sentence: str, frag: str, repl: str) -> str:
     else:
         regex = re.compile(r'\b' + re.escape(frag) + r'\b', re.IGNORECASE)
     return regex.sub(repl=repl, string=sentence, count=1)
-
-
-def replace_temp_value_in_sentence(sentence: str, frag: str, repl: str) -> str:
-    regex = re.compile(frag, re.IGNORECASE)
-    return regex.sub(repl=repl, string=sentence, count=1)
-
-
-def find_first_temp(sentence: str) -> str:
-    regex = re.compile(r'/temp[0-9]+/')
-    return regex.search(sentence).group()
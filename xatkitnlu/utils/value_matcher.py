@@ -0,0 +1,107 @@
+def is_word_char(c: str) -> bool:
+    # Same as \w in Python regular expressions
+    return c.isalnum() or c == '_'
+
+
+def lower_chars(text: str) -> str:
+    # Lowercases the text without changing its length, so positions in the result are positions in the text
+    return ''.join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+
+class ValueMatcher:
+    """Aho-Corasick automaton finding all the (case-insensitive) occurrences of a list of values in a single pass.
+
+    match() emulates checking the values one by one, in order, with value_in_sentence and replacing the first
+    occurrence of each found value by a temp placeholder with replace_value_in_sentence (i.e. what NER does with custom
+    entity values, longest first), without ever building the intermediate sentences
+    """
+
+    def __init__(self, values: list[str]):
+        self.values: list[str] = values
+        self.lengths: list[int] = [len(value) for value in values]
+        self.goto: list[dict[str, int]] = [{}]  # transitions of each node (node 0 is the root)
+        self.outputs: list[list[int]] = [[]]  # indexes of the values ending at each node (including suffixes)
+        for value_index, value in enumerate(values):
+            if len(value) == 0:
+                continue
+            node: int = 0
+            for c in lower_chars(value):
+                next_node: int = self.goto[node].get(c)
+                if next_node is None:
+                    next_node = len(self.goto)
+                    self.goto.append({})
+                    self.outputs.append([])
+                    self.goto[node][c] = next_node
+                node = next_node
+            self.outputs[node].append(value_index)
+
+        # Failure links, computed breadth first so the failure node of a node is always computed before it
+        self.fail: list[int] = [0] * len(self.goto)
+        queue: list[int] = list(self.goto[0].values())
+        for node in queue:
+            for c, child in self.goto[node].items():
+                fail_node: int = self.fail[node]
+                while fail_node != 0 and c not in self.goto[fail_node]:
+                    fail_node = self.fail[fail_node]
+                self.fail[child] = self.goto[fail_node].get(c, 0)
+                self.outputs[child] = self.outputs[child] + self.outputs[self.fail[child]]
+                queue.append(child)
+
+    def find_all(self, text: str) -> dict[int, list[int]]:
+        """Returns the start positions of all the occurrences (overlapping or not) of each value found in the text"""
+        occurrences: dict[int, list[int]] = {}
+        node: int = 0
+        goto: list[dict[str, int]] = self.goto
+        fail: list[int] = self.fail
+        for position, c in enumerate(lower_chars(text)):
+            while node != 0 and c not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(c, 0)
+            for value_index in self.outputs[node]:
+                occurrences.setdefault(value_index, []).append(position - self.lengths[value_index] + 1)
+        for starts in occurrences.values():
+            starts.sort()
+        return occurrences
+
+    def match(self, sentence: str, repetitions: bool = False) -> list[tuple[int, int, int]]:
+        """Returns the (start, end, value index) of the value occurrences replaced in the sentence, in value order.
+
+        With repetitions, the later occurrences of a value that would be replaced if the sentence was checked again are
+        returned too (right after the first one)
+        """
+        occurrences: dict[int, list[int]] = self.find_all(sentence)
+        if len(occurrences) == 0:
+            return []
+        # Replaced characters, their neighbours see the '/' of the placeholder, i.e. a non-word character
+        replaced: bytearray = bytearray(len(sentence))
+
+        def is_word_at(position: int) -> bool:
+            return 0 <= position < len(sentence) and not replaced[position] and is_word_char(sentence[position])
+
+        def boundary(position: int) -> bool:
+            return is_word_at(position - 1) != is_word_at(position)
+
+        matches: list[tuple[int, int, int]] = []
+        lower_sentence: str = sentence.lower()
+        # Only the values found in the sentence need to be checked, in the same order
+        for value_index in sorted(occurrences.keys()):
+            value: str = self.values[value_index]
+            if len(matches) == 0 and value.lower() == lower_sentence:
+                matches.append((0, len(sentence), value_index))
+                replaced[:] = b'\x01' * len(sentence)
+                continue
+            length: int = self.lengths[value_index]
+            starts: list[int] = [start for start in occurrences[value_index]
+                                 if not any(replaced[start:start + length])]
+            if not any(boundary(start) and boundary(start + length) for start in starts):
+                continue
+            # Negative numbers are replaced without checking the boundary before the '-'
+            for start in starts:
+                if any(replaced[start:start + length]):
+                    continue
+                if (value[0] == '-' or boundary(start)) and boundary(start + length):
+                    matches.append((start, start + length, value_index))
+                    replaced[start:start + length] = b'\x01' * length
+                    if not repetitions:
+                        break
+        return matches